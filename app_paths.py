@@ -0,0 +1,22 @@
+import os
+
+APP_DIR_NAME = 'ComfyDependencyInstaller'
+
+
+def get_app_data_dir():
+    """获取工具的数据目录，可通过环境变量 COMFY_DEP_INSTALLER_HOME 覆盖"""
+    base = os.environ.get('COMFY_DEP_INSTALLER_HOME')
+    if base:
+        return base
+    if os.name == 'nt':
+        root = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(root, APP_DIR_NAME)
+
+
+def get_cache_dir(*parts):
+    """获取（并创建）数据目录下的缓存子目录"""
+    path = os.path.join(get_app_data_dir(), *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
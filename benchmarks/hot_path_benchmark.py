@@ -0,0 +1,298 @@
+"""热点路径基准测试
+
+使用合成数据在当前进程中分别测量：
+  parse  - 解析 100 / 1k / 10k 条的需求文件（覆盖各种版本要求写法、extras、环境标记、
+           URL、git+、-e、注释、续行和 --hash）
+  scan   - 扫描含 100 / 1000 / 5000 个 dist-info 目录的 site-packages（冷缓存、热缓存），
+           以及由 Requires-Dist 构建依赖关系图
+  rows   - 按已安装索引计算每条依赖的状态（build_row）
+  table  - 在 Qt offscreen 平台下把行分块填入依赖表格（首次填充、再次刷新）
+  output - 伪造的pip向 stdout/stderr 大量输出时，CommandJob 读取并解析输出的吞吐量
+
+每项重复若干次取中位数，结果以JSON输出；用 --output 保存后可以比较不同版本的结果。
+
+    python benchmarks/hot_path_benchmark.py --repeat 5 --output result.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REQUIREMENT_SIZES = (100, 1000, 10000)
+SITE_PACKAGES_SIZES = (100, 1000, 5000)
+
+# 需求文件中轮流使用的写法；{i} 为序号，{m} 为次版本号，{h} 为哈希
+REQUIREMENT_TEMPLATES = (
+    'pkg{i}',
+    'pkg{i}==1.{m}.0',
+    'pkg{i}>=1.{m}',
+    'pkg{i}>=1.0,<2.{m}',
+    'pkg{i}~=1.{m}',
+    'pkg{i}!=1.{m}.1',
+    'pkg{i}===1.{m}.0',
+    'Pkg_{i}[extra1,extra2]>=0.{m}',
+    'pkg{i}>=1.{m}; python_version >= "3.8"',
+    'pkg{i}; sys_platform == "win32" and platform_machine == "AMD64"',
+    'pkg{i} @ https://example.com/packages/pkg{i}-1.{m}.0-py3-none-any.whl',
+    'git+https://github.com/example/pkg{i}.git@v1.{m}#egg=pkg{i}',
+    '-e git+https://github.com/example/pkg{i}.git#egg=pkg{i}',
+    '# 注释: pkg{i}',
+    'pkg{i}>=1.{m} \\\n    ,<3',
+    'pkg{i}==1.{m}.0 --hash=sha256:{h}',
+    'pkg{i}==1.{m}.0 \\\n    --hash=sha256:{h} \\\n    --hash=sha256:{h}',
+    'pkg{i}>=1.{m}  # 行尾注释',
+)
+
+# 伪造的pip：交替向 stdout 和 stderr 输出解析、下载和安装阶段的典型行
+FAKE_PIP_SCRIPT = r'''
+import sys
+count = int(sys.argv[1])
+out, err = sys.stdout, sys.stderr
+for i in range(count):
+    if i % 10 == 0:
+        err.write(f"WARNING: pkg{i} 的某个警告\n")
+    elif i % 3 == 0:
+        out.write(f"Collecting pkg{i}>=1.0\n")
+    elif i % 3 == 1:
+        out.write(f"  Downloading pkg{i}-1.0.0-py3-none-any.whl (1.{i % 10} MB)\n")
+    else:
+        out.write(f"Requirement already satisfied: dep{i} in /site-packages (from pkg{i}) (2.0)\n")
+out.write("Installing collected packages: pkg1, pkg2\n")
+out.write("Successfully installed pkg1-1.0.0 pkg2-1.0.0\n")
+'''
+
+
+def write_requirements(path, count):
+    lines = []
+    for i in range(count):
+        template = REQUIREMENT_TEMPLATES[i % len(REQUIREMENT_TEMPLATES)]
+        lines.append(template.format(i=i, m=i % 20, h=f'{i:064x}'))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('--index-url https://pypi.org/simple\n')
+        f.write('\n'.join(lines) + '\n')
+
+
+def write_site_packages(site_dir, count):
+    """生成 count 个 dist-info 目录；每个包依赖若干个序号更小的包，部分带环境标记和 extra"""
+    os.makedirs(site_dir, exist_ok=True)
+    for i in range(count):
+        dist_dir = os.path.join(site_dir, f'pkg{i}-1.{i % 20}.0.dist-info')
+        os.makedirs(dist_dir)
+        headers = ['Metadata-Version: 2.1', f'Name: pkg{i}', f'Version: 1.{i % 20}.0', 'Summary: 合成测试包']
+        for offset in (1, 7, 31)[:i % 4]:
+            if i - offset >= 0:
+                headers.append(f'Requires-Dist: pkg{i - offset}>=1.0')
+        if i % 5 == 0:
+            headers.append('Requires-Dist: colorama; sys_platform == "win32"')
+        if i % 9 == 0:
+            headers.append('Provides-Extra: test')
+            headers.append('Requires-Dist: pytest; extra == "test"')
+        with open(os.path.join(dist_dir, 'METADATA'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(headers) + '\n\n' + '说明文字\n' * 20)
+        if i % 3 == 0:
+            open(os.path.join(dist_dir, 'REQUESTED'), 'w').close()
+
+
+def timed(func, repeat, setup=None):
+    """重复执行 func，返回 (耗时列表, 最后一次的返回值)；setup 在每次计时前执行"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def stats(times, items=None):
+    result = {
+        'median': round(statistics.median(times), 5),
+        'min': round(min(times), 5),
+        'max': round(max(times), 5),
+    }
+    if items:
+        result['items'] = items
+        result['items_per_second'] = round(items / statistics.median(times)) if statistics.median(times) else None
+    return result
+
+
+def bench_parse(tmp, repeat):
+    from req_parser import parse_requirements
+
+    results = {}
+    parsed = {}
+    for size in REQUIREMENT_SIZES:
+        path = os.path.join(tmp, f'requirements_{size}.txt')
+        write_requirements(path, size)
+        times, result = timed(lambda: parse_requirements(path, use_cache=False), repeat)
+        results[str(size)] = stats(times, size)
+        results[str(size)]['errors'] = len(result.errors)
+        parsed[size] = result
+    return results, parsed
+
+
+def bench_scan(tmp, repeat):
+    from dep_graph import DependencyGraph, _requirement_cache
+    from env_scanner import InstalledIndexCache
+
+    results = {}
+    distributions = {}
+    for size in SITE_PACKAGES_SIZES:
+        site_dir = os.path.join(tmp, f'env_{size}', 'site-packages')
+        write_site_packages(site_dir, size)
+        cache_dir = os.path.join(tmp, f'index_cache_{size}')
+        os.makedirs(cache_dir)
+
+        def scan():
+            cache = InstalledIndexCache(os.path.dirname(site_dir), cache_dir=cache_dir)
+            cache.load()
+            result = cache.refresh([site_dir])
+            cache.save()
+            return result
+
+        def clear_cache():
+            for name in os.listdir(cache_dir):
+                os.remove(os.path.join(cache_dir, name))
+
+        cold, _ = timed(scan, repeat, setup=clear_cache)
+        warm, result = timed(scan, repeat)
+        # 依赖字符串的解析结果在进程内缓存，每次都从空缓存开始
+        graph, _ = timed(lambda: DependencyGraph.build(result), repeat, setup=_requirement_cache.clear)
+        results[str(size)] = {
+            'cold': stats(cold, size),
+            'warm': stats(warm, size),
+            'graph': stats(graph, size),
+        }
+        distributions[size] = result
+    return results, distributions
+
+
+def bench_rows(parsed, distributions, repeat):
+    from packaging.markers import default_environment
+
+    from installer_core import build_row
+
+    index = {key: info['version'] for key, info in distributions[max(distributions)].items()}
+    marker_env = default_environment()
+    results = {}
+    rows = {}
+    for size, result in parsed.items():
+        times, rows[size] = timed(
+            lambda: [build_row(req, index, marker_env) for req in result.requirements], repeat
+        )
+        results[str(size)] = stats(times, len(result.requirements))
+    return results, rows
+
+
+def bench_table(rows, repeat):
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication, QTableView
+
+    from comfy_dependency_installer import DependencyTableModel
+    from installer_core import RefreshJob
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    chunk_size = RefreshJob.CHUNK_SIZE
+
+    def fill(model, size):
+        # 与渐进刷新相同：按块覆盖，最后截掉多余的行
+        for start in range(0, len(rows[size]), chunk_size):
+            model.apply_chunk(start, rows[size][start:start + chunk_size])
+            app.processEvents()
+        model.truncate(len(rows[size]))
+        app.processEvents()
+
+    results = {}
+    for size in rows:
+        model = None
+        view = QTableView()
+        view.resize(900, 600)
+        view.show()
+
+        def new_model():
+            nonlocal model
+            model = DependencyTableModel()
+            view.setModel(model)
+
+        first, _ = timed(lambda: fill(model, size), repeat, setup=new_model)
+        # 再次刷新：行结构相同，只做原地更新
+        again, _ = timed(lambda: fill(model, size), repeat)
+        view.close()
+        results[str(size)] = {
+            'first': stats(first, len(rows[size])),
+            'refresh': stats(again, len(rows[size])),
+        }
+    return results
+
+
+def bench_output(tmp, repeat, line_count):
+    from job_queue import CommandJob
+    from pip_output import PipChangeCollector, PipPhaseTracker
+
+    script = os.path.join(tmp, 'fake_pip.py')
+    with open(script, 'w', encoding='utf-8') as f:
+        f.write(FAKE_PIP_SCRIPT)
+    cmd = [sys.executable, script, str(line_count)]
+
+    def run():
+        collector = PipChangeCollector()
+        tracker = PipPhaseTracker()
+        received = [0, 0]
+
+        def emit_output(job, lines):
+            received[0] += len(lines)
+            received[1] += sum(len(line) + 1 for line in lines)
+            collector.feed(lines)
+            tracker.feed(lines)
+
+        success, message = CommandJob('benchmark', cmd, 'benchmark').run(emit_output)
+        if not success:
+            raise RuntimeError(f'伪造的pip执行失败: {message}')
+        tracker.finish()
+        return received
+
+    times, (lines, size) = timed(run, repeat)
+    result = stats(times, lines)
+    result['bytes'] = size
+    result['megabytes_per_second'] = round(size / statistics.median(times) / 1000 ** 2, 2)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='用合成数据测量解析、扫描、表格填充和输出读取的耗时')
+    parser.add_argument('--repeat', type=int, default=5, help='每项重复次数，取中位数')
+    parser.add_argument('--output-lines', type=int, default=200000, help='伪造的pip输出的行数')
+    parser.add_argument('--skip-gui', action='store_true', help='不测量表格填充（没有安装PyQt5时）')
+    parser.add_argument('--output', help='结果另存为JSON文件')
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, REPO_DIR)
+    with tempfile.TemporaryDirectory() as tmp:
+        # 使用独立的数据目录，避免读写本机的缓存
+        os.environ['COMFY_DEP_INSTALLER_HOME'] = os.path.join(tmp, 'home')
+
+        results = {'python': sys.executable, 'repeat': args.repeat}
+        results['parse'], parsed = bench_parse(tmp, args.repeat)
+        results['scan'], distributions = bench_scan(tmp, args.repeat)
+        results['rows'], rows = bench_rows(parsed, distributions, args.repeat)
+        if not args.skip_gui:
+            results['table'] = bench_table(rows, args.repeat)
+        results['output'] = bench_output(tmp, args.repeat, args.output_lines)
+
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
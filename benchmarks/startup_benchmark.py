@@ -0,0 +1,117 @@
+"""启动时间基准测试
+
+在全新的子进程中分别测量：
+  gui  - 导入主模块、创建 QApplication、构建主窗口并完成首次绘制
+  cli  - 命令行入口 dep_cli.py 执行一次 snapshot
+
+每项重复若干次取中位数，结果以JSON输出；超过阈值时退出码为 1，可用于回归检查。
+
+    python benchmarks/startup_benchmark.py --repeat 5 --max-gui 1.0 --max-cli 0.5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子进程中执行：各阶段耗时以JSON打印到标准输出，首次绘制后立即退出
+GUI_SCRIPT = r'''
+import json, os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {repo!r})
+from PyQt5.QtCore import QSettings
+QSettings.setDefaultFormat(QSettings.IniFormat)
+QSettings.setPath(QSettings.IniFormat, QSettings.UserScope, {settings_dir!r})
+import comfy_dependency_installer as gui
+imported = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv)
+created = time.perf_counter()
+window = gui.DependencyInstaller()
+built = time.perf_counter()
+window.show()
+window.repaint()
+app.processEvents()
+shown = time.perf_counter()
+print(json.dumps({{
+    'import': imported - start,
+    'app': created - imported,
+    'window': built - created,
+    'first_paint': shown - built,
+}}))
+sys.stdout.flush()
+# 不等待后台任务（镜像测速等）结束
+os._exit(0)
+'''
+
+
+def run_once(cmd, env):
+    start = time.perf_counter()
+    result = subprocess.run(cmd, capture_output=True, text=True, env=env, cwd=REPO_DIR)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f'{cmd[1:3]} 执行失败:\n{result.stderr.strip()}')
+    return wall, result.stdout
+
+
+def measure(name, cmd, env, repeat):
+    walls = []
+    phases = {}
+    for _ in range(repeat):
+        wall, stdout = run_once(cmd, env)
+        walls.append(wall)
+        if name == 'gui':
+            for key, value in json.loads(stdout.strip().splitlines()[-1]).items():
+                phases.setdefault(key, []).append(value)
+    result = {
+        'median': round(statistics.median(walls), 4),
+        'min': round(min(walls), 4),
+        'max': round(max(walls), 4),
+    }
+    if phases:
+        result['phases'] = {key: round(statistics.median(values), 4) for key, values in phases.items()}
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='测量图形界面和命令行的启动时间')
+    parser.add_argument('--repeat', type=int, default=5, help='每项重复次数，取中位数')
+    parser.add_argument('--max-gui', type=float, default=1.0, help='图形界面启动时间阈值（秒）')
+    parser.add_argument('--max-cli', type=float, default=0.5, help='命令行启动时间阈值（秒）')
+    parser.add_argument('--skip-gui', action='store_true', help='不测量图形界面（没有安装PyQt5时）')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        # 使用独立的数据目录，避免受本机缓存和上次使用路径的影响
+        env['COMFY_DEP_INSTALLER_HOME'] = os.path.join(tmp, 'home')
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+        results = {'python': sys.executable, 'repeat': args.repeat}
+        failed = []
+        if not args.skip_gui:
+            script = GUI_SCRIPT.format(repo=REPO_DIR, settings_dir=os.path.join(tmp, 'settings'))
+            results['gui'] = measure('gui', [sys.executable, '-c', script], env, args.repeat)
+            results['gui']['threshold'] = args.max_gui
+            if results['gui']['median'] > args.max_gui:
+                failed.append('gui')
+
+        cli = [sys.executable, os.path.join(REPO_DIR, 'dep_cli.py'), 'snapshot',
+               '-p', sys.executable, '-o', os.path.join(tmp, 'snapshot.json')]
+        results['cli'] = measure('cli', cli, env, args.repeat)
+        results['cli']['threshold'] = args.max_cli
+        if results['cli']['median'] > args.max_cli:
+            failed.append('cli')
+
+    results['failed'] = failed
+    print(json.dumps(results, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,73 +1,134 @@
 import sys
 import os
+import tempfile
+import time
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                            QHBoxLayout, QPushButton, QLineEdit, QLabel, 
-                           QComboBox, QTableWidget, QTableWidgetItem, QHeaderView,
-                           QFileDialog, QMessageBox, QProgressDialog, QDialog, QTextEdit)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
-import subprocess
-import pkg_resources
+                           QComboBox, QTableView, QHeaderView, QStyledItemDelegate,
+                           QFileDialog, QMessageBox, QDialog, QPlainTextEdit,
+                           QDockWidget, QTreeWidget, QTreeWidgetItem, QInputDialog, QCheckBox, QListWidget,
+                           QProgressBar)
+from PyQt5.QtCore import (Qt, QObject, pyqtSignal, QTimer, QUrl, QEvent,
+                          QAbstractTableModel, QModelIndex, QSettings, QFileSystemWatcher)
+from PyQt5.QtGui import QDesktopServices, QColor, QFont
+from app_paths import get_cache_dir
+from env_scanner import diff_index, find_site_packages, normalize_name
+from installer_core import (PENDING_REQUIREMENTS, STATE_CONFLICTING, STATE_MISSING, STATE_OUTDATED, STATE_SATISFIED,
+                            UNSATISFIED_STATES, InstalledIndexJob, InterpreterProbeJob, RefreshJob, build_row,
+                            find_python_exe,
+                            install_command, install_file_command, mirror_args, pip_command, uninstall_command,
+                            write_requirements_file)
+from install_plan import (ACTION_DOWNGRADE, ACTION_KEEP, ACTION_LABELS, ACTION_UPGRADE, PlanJob, format_size,
+                          supports_report)
+from interpreter_probe import cached_interpreter
+from job_queue import CANCELLED, FAILED, RUNNING, STATE_LABELS, SUCCEEDED, CommandJob, JobScheduler
+from mirror_probe import DEFAULT_MIRRORS, PYPI_SIMPLE_URL, MirrorProbeJob
+from operation_log import OperationTimer, get_operation_log, summarize
+from pip_output import PipChangeCollector, PipPhaseTracker, PipProgress, progress_command, strip_progress_lines
+from process_runner import format_command
 
-class InstallThread(QThread):
-    output_received = pyqtSignal(str)
-    finished = pyqtSignal(bool, str)
+# custom_nodes、req_parser（依赖 packaging）、wheelhouse 和 git_cache 在首次使用时才导入，缩短启动时间
 
-    def __init__(self, cmd):
-        super().__init__()
-        self.cmd = cmd
+class JobBridge(QObject):
+    """把调度器工作线程中的回调转成Qt信号，在界面线程中处理"""
+
+    job_updated_signal = pyqtSignal(object)
+    job_output_signal = pyqtSignal(object, str)
+    job_rows_signal = pyqtSignal(object, int, object)
+
+    def job_updated(self, job):
+        self.job_updated_signal.emit(job)
+
+    def job_output(self, job, lines):
+        self.job_output_signal.emit(job, '\n'.join(lines))
+
+    def job_rows(self, job, start, rows):
+        self.job_rows_signal.emit(job, start, rows)
+
+class LogView(QPlainTextEdit):
+    """大吞吐量日志视图：合并追加、限制行数，完整日志写入缓存目录下的 logs"""
+
+    # 界面中最多保留的行数，更早的内容只保存在日志文件中
+    MAX_BLOCKS = 5000
+    # 合并刷新的间隔（毫秒）
+    FLUSH_INTERVAL = 100
+    # logs 目录中保留的日志文件数，更早的在创建新日志时删除
+    KEEP_LOG_FILES = 50
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setUndoRedoEnabled(False)
+        self.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.setMaximumBlockCount(self.MAX_BLOCKS)
+
+        self.pending = []
+        self.pending_count = 0
+        log_dir = get_cache_dir('logs')
+        self.prune_logs(log_dir)
+        self.log_file = tempfile.NamedTemporaryFile(
+            'w', encoding='utf-8', prefix='pip_log_', suffix='.log', dir=log_dir, delete=False
+        )
+        self.log_path = self.log_file.name
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(self.FLUSH_INTERVAL)
+        self.flush_timer.timeout.connect(self.flush)
 
-    def run(self):
+    @classmethod
+    def prune_logs(cls, log_dir):
+        """只保留最近的日志文件"""
         try:
-            # 设置环境变量以禁用输出缓冲
-            env = os.environ.copy()
-            env['PYTHONUNBUFFERED'] = '1'
-
-            process = subprocess.Popen(
-                self.cmd,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True,
-                env=env
-            )
+            paths = [os.path.join(log_dir, name) for name in os.listdir(log_dir) if name.endswith('.log')]
+            paths.sort(key=os.path.getmtime, reverse=True)
+        except OSError:
+            return
+        for path in paths[cls.KEEP_LOG_FILES - 1:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
 
-            # 实时读取输出
-            while True:
-                # 读取一个字符
-                char = process.stdout.read(1)
-                if char:
-                    # 收集字符直到遇到换行符
-                    line = char
-                    while char and char != '\n':
-                        char = process.stdout.read(1)
-                        line += char if char else ''
-                    if line.strip():
-                        self.output_received.emit(line.strip())
-
-                # 读取错误输出
-                error_char = process.stderr.read(1)
-                if error_char:
-                    # 收集字符直到遇到换行符
-                    error_line = error_char
-                    while error_char and error_char != '\n':
-                        error_char = process.stderr.read(1)
-                        error_line += error_char if error_char else ''
-                    if error_line.strip():
-                        self.output_received.emit(error_line.strip())
-
-                # 检查进程是否结束
-                if process.poll() is not None and not char and not error_char:
-                    break
-
-            if process.returncode == 0:
-                self.finished.emit(True, "安装成功")
-            else:
-                stderr = process.stderr.read()
-                self.finished.emit(False, f"安装失败:\n{stderr}")
-        except Exception as e:
-            self.finished.emit(False, f"安装过程出错: {str(e)}")
+    def append_text(self, text):
+        """追加一段输出（可包含多行），实际写入界面在定时器中合并完成"""
+        if self.log_file:
+            self.log_file.write(text + '\n')
+        self.pending.append(text)
+        self.pending_count += text.count('\n') + 1
+        # 待刷新的内容超过界面上限时，丢弃最早的部分（日志文件中仍保留）
+        while self.pending_count > self.MAX_BLOCKS and len(self.pending) > 1:
+            dropped = self.pending.pop(0)
+            self.pending_count -= dropped.count('\n') + 1
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        if not self.pending:
+            self.flush_timer.stop()
+            return
+        scrollbar = self.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 4
+        self.appendPlainText('\n'.join(self.pending))
+        self.pending = []
+        self.pending_count = 0
+        if self.log_file:
+            self.log_file.flush()
+        # 只有用户没有向上翻看时才自动滚动到底部
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def finish(self):
+        """输出结束：刷新剩余内容并关闭日志文件"""
+        self.flush()
+        self.flush_timer.stop()
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+
+    def open_log_file(self):
+        if self.log_file:
+            self.log_file.flush()
+        QDesktopServices.openUrl(QUrl.fromLocalFile(self.log_path))
 
 class InstallDialog(QDialog):
     def __init__(self, package_name, cmd, parent=None):
@@ -95,46 +156,658 @@ class InstallDialog(QDialog):
         output_label = QLabel("安装输出:")
         layout.addWidget(output_label)
         
-        self.output_text = QTextEdit()
-        self.output_text.setReadOnly(True)
+        self.output_text = LogView()
         # 设置等宽字体以更好地显示命令输出
         font = self.output_text.font()
         font.setFamily("Consolas")
         self.output_text.setFont(font)
         layout.addWidget(self.output_text)
 
+        # 进度条：有下载大小时按已下载的字节显示，总量未知时为忙碌状态
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setTextVisible(False)
+        layout.addWidget(self.progress_bar)
+        self.progress_label = QLabel()
+        layout.addWidget(self.progress_label)
+
         # 状态标签
         self.status_label = QLabel("正在安装...")
         self.status_label.setStyleSheet("font-weight: bold;")
         layout.addWidget(self.status_label)
 
-        # 关闭按钮（初始隐藏）
+        # 底部按钮：打开完整日志 / 关闭（任务在后台运行，随时可以关闭窗口）
+        button_layout = QHBoxLayout()
+        self.log_button = QPushButton("打开完整日志")
+        self.log_button.clicked.connect(self.output_text.open_log_file)
+        button_layout.addWidget(self.log_button)
         self.close_button = QPushButton("关闭")
         self.close_button.clicked.connect(self.accept)
-        self.close_button.hide()
-        layout.addWidget(self.close_button)
+        button_layout.addWidget(self.close_button)
+        layout.addLayout(button_layout)
 
     def append_output(self, text):
-        self.output_text.append(text)
-        # 强制立即更新显示
-        QApplication.processEvents()
-        # 滚动到底部
-        scrollbar = self.output_text.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
+        self.output_text.append_text(text)
+
+    def update_progress(self, progress):
+        """progress 为 pip_output.PipProgress"""
+        fraction = progress.fraction()
+        if fraction is None:
+            self.progress_bar.setRange(0, 0)
+        else:
+            self.progress_bar.setRange(0, 1000)
+            self.progress_bar.setValue(int(fraction * 1000))
+        self.progress_label.setText(progress.describe())
 
     def set_finished(self, success, message):
+        self.output_text.finish()
+        self.progress_bar.setRange(0, 1)
+        self.progress_bar.setValue(1 if success else 0)
+        self.progress_label.clear()
         if success:
             self.status_label.setText("✅ " + message)
             self.status_label.setStyleSheet("color: green;")
         else:
             self.status_label.setText("❌ " + message)
             self.status_label.setStyleSheet("color: red;")
-        self.close_button.show()
+
+class InstallPlanDialog(QDialog):
+    """显示pip试运行得到的变更计划，确认后才真正安装"""
+
+    HEADERS = ["包", "当前版本", "计划版本", "操作", "下载大小"]
+    ACTION_COLORS = {ACTION_DOWNGRADE: "#d9534f", ACTION_UPGRADE: "#f0ad4e", ACTION_KEEP: "#888888"}
+    # 降级最容易造成意外的大量下载，排在最前面
+    ACTION_ORDER = [ACTION_DOWNGRADE, ACTION_UPGRADE]
+
+    def __init__(self, title, plan, parent=None):
+        super().__init__(parent)
+        self.plan = plan
+        self.setWindowTitle(f"安装计划 - {title}")
+        self.setMinimumSize(640, 400)
+
+        layout = QVBoxLayout(self)
+        summary_label = QLabel(plan.summary())
+        summary_label.setWordWrap(True)
+        layout.addWidget(summary_label)
+
+        downgrades = plan.by_action(ACTION_DOWNGRADE)
+        if downgrades:
+            details = "、".join(f"{item.name} {item.installed_version} → {item.version}" for item in downgrades[:5])
+            if len(downgrades) > 5:
+                details += f" 等 {len(downgrades)} 个包"
+            warning_label = QLabel(f"注意：将降级 {details}")
+            warning_label.setWordWrap(True)
+            warning_label.setStyleSheet("color: #d9534f; font-weight: bold;")
+            layout.addWidget(warning_label)
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(self.HEADERS)
+        self.tree.setRootIsDecorated(False)
+        items = sorted(plan.items, key=lambda item: (
+            self.ACTION_ORDER.index(item.action) if item.action in self.ACTION_ORDER else len(self.ACTION_ORDER)
+        ))
+        for item in items:
+            row = QTreeWidgetItem([
+                item.name,
+                item.installed_version or "-",
+                item.version,
+                ACTION_LABELS[item.action],
+                "-" if item.action == ACTION_KEEP else format_size(item.size),
+            ])
+            color = self.ACTION_COLORS.get(item.action)
+            if color:
+                for column in range(len(self.HEADERS)):
+                    row.setForeground(column, QColor(color))
+            self.tree.addTopLevelItem(row)
+        for column in range(len(self.HEADERS)):
+            self.tree.resizeColumnToContents(column)
+        layout.addWidget(self.tree)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        install_button = QPushButton("确认安装")
+        install_button.clicked.connect(self.accept)
+        cancel_button = QPushButton("取消")
+        cancel_button.clicked.connect(self.reject)
+        button_layout.addWidget(install_button)
+        button_layout.addWidget(cancel_button)
+        layout.addLayout(button_layout)
+
+class StatsDialog(QDialog):
+    """根据操作日志显示各操作、各阶段的耗时分布和各镜像的下载速度"""
+
+    HEADERS = ["操作 / 阶段", "次数", "P50", "P90", "最大"]
+
+    def __init__(self, records, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("性能统计")
+        self.setMinimumSize(640, 480)
+        summary = summarize(records)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"最近 {len(records)} 次操作（日志: {get_operation_log().path}）"))
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(self.HEADERS)
+        for name, data in sorted(summary['operations'].items()):
+            item = QTreeWidgetItem(self.stats_row(name, data['total']))
+            for phase, stats in sorted(data['phases'].items(), key=lambda entry: -(entry[1]['p50'] or 0)):
+                item.addChild(QTreeWidgetItem(self.stats_row(phase, stats)))
+            self.tree.addTopLevelItem(item)
+        env_root = QTreeWidgetItem(["按环境"])
+        for env, stats in sorted(summary['environments'].items()):
+            env_root.addChild(QTreeWidgetItem(self.stats_row(env, stats)))
+        if env_root.childCount():
+            self.tree.addTopLevelItem(env_root)
+        self.tree.expandAll()
+        for column in range(len(self.HEADERS)):
+            self.tree.resizeColumnToContents(column)
+        layout.addWidget(self.tree)
+
+        self.mirror_tree = QTreeWidget()
+        self.mirror_tree.setHeaderLabels(["镜像", "下载次数", "速度（中位数）"])
+        self.mirror_tree.setRootIsDecorated(False)
+        for mirror, data in sorted(summary['mirrors'].items()):
+            self.mirror_tree.addTopLevelItem(QTreeWidgetItem([
+                mirror, str(data['downloads']), f"{format_size(data['bytes_per_second'])}/s"
+            ]))
+        self.mirror_tree.resizeColumnToContents(0)
+        self.mirror_tree.setMaximumHeight(140)
+        layout.addWidget(self.mirror_tree)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        close_button = QPushButton("关闭")
+        close_button.clicked.connect(self.accept)
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+
+    @staticmethod
+    def stats_row(name, stats):
+        def seconds(value):
+            return "-" if value is None else f"{value:.3f}s"
+        return [name, str(stats['count']), seconds(stats['p50']), seconds(stats['p90']), seconds(stats['max'])]
+
+class CompareDialog(QDialog):
+    """多环境比较：并行扫描多个Python环境，每列一个环境显示各包的安装版本，并可让一个环境与另一个一致"""
+
+    DRIFT_COLOR = "#fff3cd"
+    STATE_COLORS = {STATE_OUTDATED: "#f0ad4e", STATE_CONFLICTING: "#d9534f", STATE_MISSING: "#d9534f"}
+
+    def __init__(self, installer):
+        super().__init__(installer)
+        self.installer = installer
+        self.comparison = None
+        self.scan_job = None
+        self.setWindowTitle("多环境比较")
+        self.setMinimumSize(900, 600)
+
+        layout = QVBoxLayout(self)
+        env_layout = QHBoxLayout()
+        self.env_list = QListWidget()
+        self.env_list.setMaximumHeight(110)
+        self.env_list.addItems(self.saved_environments())
+        env_layout.addWidget(self.env_list)
+        env_buttons = QVBoxLayout()
+        add_btn = QPushButton("添加环境")
+        add_btn.clicked.connect(self.add_environment)
+        remove_btn = QPushButton("移除")
+        remove_btn.clicked.connect(self.remove_environment)
+        self.scan_btn = QPushButton("扫描比较")
+        self.scan_btn.clicked.connect(self.start_scan)
+        env_buttons.addWidget(add_btn)
+        env_buttons.addWidget(remove_btn)
+        env_buttons.addWidget(self.scan_btn)
+        env_buttons.addStretch()
+        env_layout.addLayout(env_buttons)
+        layout.addLayout(env_layout)
+
+        option_layout = QHBoxLayout()
+        self.requirements_check = QCheckBox("只比较当前依赖列表")
+        self.requirements_check.setChecked(bool(installer.requirements))
+        self.drift_check = QCheckBox("只显示有差异的包")
+        self.drift_check.toggled.connect(self.populate)
+        option_layout.addWidget(self.requirements_check)
+        option_layout.addWidget(self.drift_check)
+        option_layout.addStretch()
+        layout.addLayout(option_layout)
+
+        self.tree = QTreeWidget()
+        self.tree.setRootIsDecorated(False)
+        self.tree.setSortingEnabled(True)
+        layout.addWidget(self.tree)
+
+        sync_layout = QHBoxLayout()
+        sync_layout.addWidget(QLabel("让"))
+        self.target_combo = QComboBox()
+        sync_layout.addWidget(self.target_combo)
+        sync_layout.addWidget(QLabel("与"))
+        self.source_combo = QComboBox()
+        sync_layout.addWidget(self.source_combo)
+        sync_layout.addWidget(QLabel("一致"))
+        self.remove_extra_check = QCheckBox("卸载多出来的包")
+        sync_layout.addWidget(self.remove_extra_check)
+        self.sync_btn = QPushButton("同步")
+        self.sync_btn.setEnabled(False)
+        self.sync_btn.clicked.connect(self.sync_environments)
+        sync_layout.addWidget(self.sync_btn)
+        sync_layout.addStretch()
+        layout.addLayout(sync_layout)
+
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+    def saved_environments(self):
+        paths = self.installer.settings.value("compare/environments", [])
+        if isinstance(paths, str):
+            paths = [paths]
+        paths = [path for path in paths if path]
+        current = self.installer.python_path.text()
+        if current and current not in paths:
+            paths.insert(0, current)
+        return paths
+
+    def environments(self):
+        return [self.env_list.item(i).text() for i in range(self.env_list.count())]
+
+    def add_environment(self):
+        folder_path = QFileDialog.getExistingDirectory(self, "选择Python环境目录")
+        if not folder_path:
+            return
+        if find_python_exe(folder_path) is None:
+            QMessageBox.warning(self, "警告", "所选目录中未找到Python解释器")
+            return
+        if folder_path not in self.environments():
+            self.env_list.addItem(folder_path)
+            self.installer.settings.setValue("compare/environments", self.environments())
+
+    def remove_environment(self):
+        row = self.env_list.currentRow()
+        if row >= 0:
+            self.env_list.takeItem(row)
+            self.installer.settings.setValue("compare/environments", self.environments())
+
+    def start_scan(self):
+        paths = self.environments()
+        if len(paths) < 2:
+            QMessageBox.information(self, "提示", "请至少添加两个Python环境")
+            return
+        if self.scan_job is not None and not self.scan_job.finished:
+            return
+        from env_compare import CompareJob
+        requirements = list(self.installer.requirements) if self.requirements_check.isChecked() else None
+        self.scan_job = CompareJob(paths, requirements)
+        self.scan_job.context['on_finished'] = self.handle_scan_finished
+        self.installer.scheduler.submit(self.scan_job)
+        self.scan_btn.setEnabled(False)
+        self.status_label.setText(f"正在并行扫描 {len(paths)} 个环境...")
+
+    def handle_scan_finished(self, job):
+        if job is not self.scan_job:
+            return
+        self.scan_btn.setEnabled(True)
+        self.status_label.setText(job.message)
+        if job.state != SUCCEEDED:
+            return
+        self.comparison = job.comparison
+        labels = [result['label'] for result in self.comparison.results]
+        for combo in (self.target_combo, self.source_combo):
+            combo.clear()
+            for i in self.comparison.scanned():
+                combo.addItem(labels[i], i)
+        self.source_combo.setCurrentIndex(min(1, self.source_combo.count() - 1))
+        self.sync_btn.setEnabled(len(self.comparison.scanned()) >= 2)
+        self.populate()
+
+    def populate(self):
+        if self.comparison is None:
+            return
+        results = self.comparison.results
+        headers = ["依赖项", "要求版本"] + [result['label'] for result in results]
+        self.tree.setSortingEnabled(False)
+        self.tree.clear()
+        self.tree.setHeaderLabels(headers)
+        for column, result in enumerate(results, 2):
+            self.tree.headerItem().setToolTip(column, result['error'] or f"{result['python']}  Python {result['version']}")
+        drift_only = self.drift_check.isChecked()
+        for row in self.comparison.rows:
+            if drift_only and not row['drift']:
+                continue
+            texts = [row['name'], row['required'] or "-"]
+            for cell in row['cells']:
+                if cell is None:
+                    texts.append("扫描失败")
+                else:
+                    texts.append(cell['version'] or "-")
+            item = QTreeWidgetItem(texts)
+            for column, cell in enumerate(row['cells'], 2):
+                color = self.STATE_COLORS.get(cell['state']) if cell else None
+                if color:
+                    item.setForeground(column, QColor(color))
+            if row['drift']:
+                for column in range(len(headers)):
+                    item.setBackground(column, QColor(self.DRIFT_COLOR))
+            self.tree.addTopLevelItem(item)
+        self.tree.setSortingEnabled(True)
+        for column in range(len(headers)):
+            self.tree.resizeColumnToContents(column)
+
+    def sync_environments(self):
+        source = self.comparison.results[self.source_combo.currentData()]
+        target = self.comparison.results[self.target_combo.currentData()]
+        if source is target:
+            QMessageBox.information(self, "提示", "请选择两个不同的环境")
+            return
+        from env_compare import SyncDiffJob
+        job = SyncDiffJob(source, target, self.remove_extra_check.isChecked())
+        job.context['on_finished'] = self.confirm_sync
+        # 任务可能在 submit 中就完成并调用 confirm_sync，按钮和提示需要先设置
+        self.sync_btn.setEnabled(False)
+        self.status_label.setText(f"正在比较 {target['label']} 与 {source['label']} 的已安装包...")
+        self.installer.scheduler.submit(job)
+
+    def confirm_sync(self, job):
+        self.sync_btn.setEnabled(self.comparison is not None and len(self.comparison.scanned()) >= 2)
+        self.status_label.setText(job.message)
+        if job.state != SUCCEEDED:
+            return
+        source, target, diff = job.source, job.target, job.diff
+        if diff.is_empty():
+            QMessageBox.information(self, "提示", f"{target['label']} 的已安装包与 {source['label']} 一致")
+            return
+        box = QMessageBox(QMessageBox.Question, "同步环境",
+                          f"让 {target['label']} 与 {source['label']} 一致: {diff.summary()}",
+                          QMessageBox.Yes | QMessageBox.No, self)
+        details = diff.describe()
+        informative = "\n".join(details[:10])
+        if len(details) > 10:
+            informative += f"\n... 等共 {len(details)} 项"
+        if source['version'] != target['version']:
+            informative += f"\n\n注意：两个环境的Python版本不同（{source['version']} / {target['version']}）"
+        box.setInformativeText(informative)
+        box.setDetailedText("\n".join(details))
+        if box.exec_() != QMessageBox.Yes:
+            return
+        self.installer.submit_restore_job(
+            target['python'], diff, f"同步 {target['label']} ← {source['label']}: {diff.summary()}",
+            on_finished=lambda job: self.start_scan(), operation='sync_env', tags=target['tags']
+        )
+
+class JobPanel(QDockWidget):
+    """任务面板：显示后台任务队列的实时状态，支持查看输出和取消"""
+
+    COLUMNS = ["任务", "环境", "状态", "耗时"]
+
+    def __init__(self, scheduler, parent=None):
+        super().__init__("任务队列", parent)
+        self.scheduler = scheduler
+        self.items = {}  # 任务ID -> (任务, 列表项)
+
+        container = QWidget()
+        layout = QVBoxLayout(container)
+        layout.setContentsMargins(4, 4, 4, 4)
+
+        self.tree = QTreeWidget()
+        self.tree.setColumnCount(len(self.COLUMNS))
+        self.tree.setHeaderLabels(self.COLUMNS)
+        self.tree.setRootIsDecorated(False)
+        self.tree.header().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.tree.itemDoubleClicked.connect(lambda item, column: self.show_output())
+        layout.addWidget(self.tree)
+
+        button_layout = QHBoxLayout()
+        output_btn = QPushButton("查看输出")
+        output_btn.clicked.connect(self.show_output)
+        cancel_btn = QPushButton("取消任务")
+        cancel_btn.clicked.connect(self.cancel_selected)
+        clear_btn = QPushButton("清除已完成")
+        clear_btn.clicked.connect(self.clear_finished)
+        stats_btn = QPushButton("性能统计")
+        stats_btn.clicked.connect(self.show_stats)
+        button_layout.addWidget(output_btn)
+        button_layout.addWidget(cancel_btn)
+        button_layout.addWidget(clear_btn)
+        button_layout.addWidget(stats_btn)
+        button_layout.addStretch()
+        layout.addLayout(button_layout)
+        self.setWidget(container)
+
+        # 定时刷新运行中任务的耗时
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.update_elapsed)
+
+    def update_job(self, job):
+        entry = self.items.get(job.id)
+        if entry is None:
+            item = QTreeWidgetItem([job.title, job.env_key or "", "", ""])
+            self.tree.addTopLevelItem(item)
+            self.items[job.id] = (job, item)
+        else:
+            item = entry[1]
+        item.setText(2, STATE_LABELS[job.state])
+        item.setText(3, f"{job.elapsed():.0f}s" if job.started_at else "")
+        if job.message and job.finished:
+            item.setToolTip(2, job.message)
+        if job.state == RUNNING and not self.timer.isActive():
+            self.timer.start()
+
+    def update_elapsed(self):
+        running = False
+        for job, item in self.items.values():
+            if job.state == RUNNING:
+                running = True
+                item.setText(3, f"{job.elapsed():.0f}s")
+        if not running:
+            self.timer.stop()
+
+    def selected_job(self):
+        item = self.tree.currentItem()
+        for job, job_item in self.items.values():
+            if job_item is item:
+                return job
+        return None
+
+    def show_output(self):
+        job = self.selected_job()
+        if job is None:
+            return
+        dialog = job.context.get('dialog')
+        if dialog is not None:
+            dialog.show()
+            dialog.raise_()
+
+    def cancel_selected(self):
+        job = self.selected_job()
+        if job is None or job.finished:
+            return
+        reply = QMessageBox.question(
+            self,
+            "取消任务",
+            f"确定要取消任务“{job.title}”吗？正在运行的pip进程会被结束。",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply == QMessageBox.Yes:
+            self.scheduler.cancel(job.id)
+
+    def show_stats(self):
+        StatsDialog(get_operation_log().recent(), self).exec_()
+
+    def clear_finished(self):
+        for job_id, (job, item) in list(self.items.items()):
+            if job.finished:
+                self.tree.takeTopLevelItem(self.tree.indexOfTopLevelItem(item))
+                del self.items[job_id]
+                dialog = job.context.get('dialog')
+                if dialog is not None:
+                    dialog.deleteLater()
+        self.scheduler.remove_finished()
+
+class DependencyTableModel(QAbstractTableModel):
+    """依赖列表数据模型
+
+    每行是一个字典：name/required/status/installed，以及聚合模式下的
+    sources（需要该包的节点包列表）和 conflict（版本冲突说明）。
+    """
+
+    HEADERS = ["依赖项", "要求版本", "安装状态", "来源", "操作"]
+    ACTION_COLUMN = 4
+    # 按行状态显示的操作；版本不满足要求时按钮会把包安装到满足要求的版本
+    ACTION_LABELS = {STATE_SATISFIED: "卸载", STATE_OUTDATED: "升级", STATE_CONFLICTING: "重新安装"}
+    STATE_COLORS = {STATE_OUTDATED: "#f0ad4e", STATE_CONFLICTING: "#d9534f"}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return row['name']
+            if column == 1:
+                return row['required']
+            if column == 2:
+                return row['status']
+            if column == 3:
+                return ", ".join(row.get('sources', ()))
+            return self.ACTION_LABELS.get(row['state'], "安装")
+        if column == 2 and role == Qt.ForegroundRole and row['state'] in self.STATE_COLORS:
+            return QColor(self.STATE_COLORS[row['state']])
+        # 版本冲突的行：版本列标红并在提示中给出各来源的要求
+        if column == 1 and row.get('conflict'):
+            if role == Qt.ForegroundRole:
+                return QColor("#d9534f")
+            if role == Qt.ToolTipRole:
+                return row['conflict']
+        if column == 3 and role == Qt.ToolTipRole and row.get('sources'):
+            return "\n".join(row['sources'])
+        return None
+
+    def row_data(self, row):
+        return self.rows[row]
+
+    def clear(self):
+        self.set_rows([])
+
+    def set_rows(self, rows):
+        """设置全部行；行结构不变时只对变化的行发出 dataChanged"""
+        same_layout = len(rows) == len(self.rows) and all(
+            (old['name'], old['required']) == (new['name'], new['required'])
+            for old, new in zip(self.rows, rows)
+        )
+        if not same_layout:
+            self.beginResetModel()
+            self.rows = rows
+            self.endResetModel()
+            return
+        for i, new in enumerate(rows):
+            if new != self.rows[i]:
+                self.rows[i] = new
+                self.dataChanged.emit(self.index(i, 0), self.index(i, self.columnCount() - 1))
+
+    def update_row(self, row, **changes):
+        self.rows[row].update(changes)
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    def apply_chunk(self, start, rows):
+        """渐进刷新：用新的一块行覆盖 start 开始的位置
+
+        结构相同的行原地更新（保留选中状态和滚动位置），遇到不同的行时
+        截掉后面的旧行再追加，返回更新后的总行数。
+        """
+        for offset, new in enumerate(rows):
+            i = start + offset
+            if i < len(self.rows):
+                old = self.rows[i]
+                if (old['name'], old['required']) == (new['name'], new['required']):
+                    if new != old:
+                        self.rows[i] = new
+                        self.dataChanged.emit(self.index(i, 0), self.index(i, self.columnCount() - 1))
+                    continue
+                self.truncate(i)
+            self.beginInsertRows(QModelIndex(), i, start + len(rows) - 1)
+            self.rows.extend(rows[offset:])
+            self.endInsertRows()
+            break
+        return len(self.rows)
+
+    def truncate(self, count):
+        """只保留前 count 行"""
+        if count < len(self.rows):
+            self.beginRemoveRows(QModelIndex(), count, len(self.rows) - 1)
+            del self.rows[count:]
+            self.endRemoveRows()
+
+class ActionButtonDelegate(QStyledItemDelegate):
+    """在操作列中绘制安装/卸载按钮并处理点击"""
+
+    clicked = pyqtSignal(int)
+
+    INSTALL_COLORS = (QColor("#337ab7"), QColor("#286090"))
+    UNINSTALL_COLORS = (QColor("#d9534f"), QColor("#c9302c"))
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.hover_row = -1
+        self.font = QFont("Microsoft YaHei", 12)
+
+    def paint(self, painter, option, index):
+        installed = index.data() == "卸载"
+        normal, hover = self.UNINSTALL_COLORS if installed else self.INSTALL_COLORS
+        painter.save()
+        painter.fillRect(option.rect, hover if index.row() == self.hover_row else normal)
+        painter.setPen(Qt.white)
+        painter.setFont(self.font)
+        painter.drawText(option.rect, Qt.AlignCenter, index.data())
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        event_type = event.type()
+        if event_type == QEvent.MouseMove:
+            if self.hover_row != index.row():
+                self.hover_row = index.row()
+                self.parent().viewport().update()
+        elif event_type == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            if option.rect.contains(event.pos()):
+                self.clicked.emit(index.row())
+                return True
+        return False
+
+class DependencyTableView(QTableView):
+    """依赖表格视图，鼠标离开时清除按钮悬停状态"""
+
+    def leaveEvent(self, event):
+        delegate = self.itemDelegateForColumn(DependencyTableModel.ACTION_COLUMN)
+        if delegate is not None and delegate.hover_row != -1:
+            delegate.hover_row = -1
+            self.viewport().update()
+        super().leaveEvent(event)
 
 class DependencyInstaller(QMainWindow):
+    # 合并连续刷新请求的等待时间（毫秒）
+    REFRESH_DEBOUNCE = 150
+    # site-packages 变化后等待写入平静下来再更新索引（毫秒），pip安装时会连续产生大量变化
+    INDEX_DEBOUNCE = 500
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Python依赖安装工具")
+        self.settings = QSettings("ComfyDependencyInstaller", "DependencyInstaller")
         self.setGeometry(100, 100, 1000, 600)
         
         # 主布局
@@ -145,12 +818,15 @@ class DependencyInstaller(QMainWindow):
         # 依赖文件选择区域
         req_layout = QHBoxLayout()
         self.req_path = QLineEdit()
-        self.req_path.setPlaceholderText("选择requirements.txt文件路径")
+        self.req_path.setPlaceholderText("选择requirements.txt文件或ComfyUI根目录")
         req_btn = QPushButton("选择文件")
         req_btn.clicked.connect(self.select_requirements)
+        comfy_btn = QPushButton("选择ComfyUI目录")
+        comfy_btn.clicked.connect(self.select_comfy_root)
         req_layout.addWidget(QLabel("依赖文件:"))
         req_layout.addWidget(self.req_path)
         req_layout.addWidget(req_btn)
+        req_layout.addWidget(comfy_btn)
         layout.addLayout(req_layout)
         
         # Python环境选择区域
@@ -167,46 +843,181 @@ class DependencyInstaller(QMainWindow):
         # 镜像源选择
         mirror_layout = QHBoxLayout()
         self.mirror_combo = QComboBox()
-        self.mirror_combo.addItems([
-            "默认源",
-            "阿里云 https://mirrors.aliyun.com/pypi/simple/",
-            "清华源 https://pypi.tuna.tsinghua.edu.cn/simple",
-            "豆瓣源 https://pypi.doubanio.com/simple/"
-        ])
+        self.mirror_combo.addItem("默认源", "")
+        for name, url in DEFAULT_MIRRORS:
+            self.mirror_combo.addItem(f"{name} {url}", url)
+        for url in self.custom_mirrors():
+            self.mirror_combo.addItem(f"自定义 {url}", url)
+        # 用户手动选择过镜像后，测速结果不再自动切换
+        self.mirror_user_selected = False
+        self.mirror_combo.activated.connect(self.handle_mirror_activated)
+        add_mirror_btn = QPushButton("添加镜像")
+        add_mirror_btn.clicked.connect(self.add_custom_mirror)
+        probe_btn = QPushButton("测速")
+        probe_btn.clicked.connect(lambda: self.probe_mirrors(force=True))
         mirror_layout.addWidget(QLabel("pip镜像源:"))
-        mirror_layout.addWidget(self.mirror_combo)
+        mirror_layout.addWidget(self.mirror_combo, 1)
+        mirror_layout.addWidget(add_mirror_btn)
+        mirror_layout.addWidget(probe_btn)
         layout.addLayout(mirror_layout)
         
         # 依赖列表
-        self.dep_table = QTableWidget()
-        self.dep_table.setColumnCount(4)
-        self.dep_table.setHorizontalHeaderLabels(["依赖项", "要求版本", "安装状态", "操作"])
+        self.dep_model = DependencyTableModel(self)
+        self.dep_table = DependencyTableView()
+        self.dep_table.setModel(self.dep_model)
+        self.dep_table.setMouseTracking(True)
+        self.dep_table.setSelectionBehavior(QTableView.SelectRows)
+        self.dep_table.setSelectionMode(QTableView.ExtendedSelection)  # 支持Ctrl/Shift多选
+        self.dep_table.verticalHeader().setDefaultSectionSize(30)
+        self.action_delegate = ActionButtonDelegate(self.dep_table)
+        self.action_delegate.clicked.connect(self.handle_package_action)
+        self.dep_table.setItemDelegateForColumn(DependencyTableModel.ACTION_COLUMN, self.action_delegate)
         # 设置列宽比例
         self.dep_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)  # 依赖项列自适应
-        self.dep_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)  # 版本列适应内容
-        self.dep_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)  # 状态列适应内容
-        self.dep_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Fixed)  # 操作列固定宽度
-        self.dep_table.setColumnWidth(3, 150)  # 增加操作列宽度到150像素
+        # 版本列和状态列在每次刷新完成后按内容调整一次；ResizeToContents 会在逐块插入行时反复重算
+        self.dep_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Interactive)
+        self.dep_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Interactive)
+        self.dep_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Interactive)  # 来源列可手动调整
+        self.dep_table.setColumnWidth(3, 160)
+        self.dep_table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Fixed)  # 操作列固定宽度
+        self.dep_table.setColumnWidth(4, 150)  # 增加操作列宽度到150像素
+        # 自适应列宽只采样部分行，避免大列表时逐行计算宽度
+        self.dep_table.horizontalHeader().setResizeContentsPrecision(200)
         layout.addWidget(self.dep_table)
         
         # 操作按钮
         btn_layout = QHBoxLayout()
         refresh_btn = QPushButton("刷新")
         refresh_btn.clicked.connect(self.do_refresh)
+        install_selected_btn = QPushButton("安装选中")
+        uninstall_selected_btn = QPushButton("卸载选中")
         install_all_btn = QPushButton("全部安装")
         uninstall_all_btn = QPushButton("全部卸载")
         
+        install_selected_btn.clicked.connect(self.install_selected)
+        uninstall_selected_btn.clicked.connect(self.uninstall_selected)
         install_all_btn.clicked.connect(self.install_all)
         uninstall_all_btn.clicked.connect(self.uninstall_all)
         
         btn_layout.addWidget(refresh_btn)
+        btn_layout.addWidget(install_selected_btn)
+        btn_layout.addWidget(uninstall_selected_btn)
         btn_layout.addWidget(install_all_btn)
         btn_layout.addWidget(uninstall_all_btn)
+        prefetch_btn = QPushButton("预取到本地")
+        prefetch_btn.clicked.connect(self.prefetch_requirements)
+        wheelhouse_btn = QPushButton("本地缓存")
+        wheelhouse_btn.clicked.connect(self.show_wheelhouse_usage)
+        btn_layout.addWidget(prefetch_btn)
+        btn_layout.addWidget(wheelhouse_btn)
+        check_btn = QPushButton("依赖检查")
+        check_btn.clicked.connect(self.show_consistency_report)
+        orphans_btn = QPushButton("清理孤立包")
+        orphans_btn.clicked.connect(self.cleanup_orphans)
+        btn_layout.addWidget(check_btn)
+        btn_layout.addWidget(orphans_btn)
+        save_snapshot_btn = QPushButton("保存快照")
+        save_snapshot_btn.clicked.connect(self.save_snapshot)
+        restore_snapshot_btn = QPushButton("恢复快照")
+        restore_snapshot_btn.clicked.connect(self.restore_snapshot)
+        btn_layout.addWidget(save_snapshot_btn)
+        btn_layout.addWidget(restore_snapshot_btn)
+        compare_btn = QPushButton("多环境比较")
+        compare_btn.clicked.connect(self.show_compare_dialog)
+        btn_layout.addWidget(compare_btn)
+        # 安装前先用pip试运行列出将要新增、升级、降级的包，确认后再安装
+        self.preview_check = QCheckBox("安装前预览变更")
+        self.preview_check.setChecked(self.settings.value("install/preview_plan", True, type=bool))
+        self.preview_check.toggled.connect(lambda checked: self.settings.setValue("install/preview_plan", checked))
+        btn_layout.addWidget(self.preview_check)
         layout.addLayout(btn_layout)
         
         self.status_label = QLabel()
         layout.addWidget(self.status_label)
 
+        # 表格每一行对应的结构化依赖（ParsedRequirement 或合并模式下的 AggregatedRequirement）
+        self.requirements = []
+
+        # 目标环境已安装包索引（规范化包名 -> 版本），每次刷新时重建
+        self.installed_index = {}
+        # 已安装包之间的依赖关系图（dep_graph.DependencyGraph），刷新时构建，之后随索引增量更新
+        self.dep_graph = None
+
+        # 本地wheel仓库，首次使用时创建
+        self._wheelhouse = None
+        # git 依赖的wheel构建缓存，首次使用时创建
+        self._git_wheel_cache = None
+        # 多环境比较窗口，首次打开时创建
+        self.compare_dialog = None
+
+        # 刷新在后台任务中进行；连续触发时合并为一次，新的刷新会取消仍在进行的旧刷新
+        self.refresh_job = None
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(self.REFRESH_DEBOUNCE)
+        self.refresh_timer.timeout.connect(self.start_refresh)
+
+        # 已安装的包变化时只更新受影响的行：解析pip输出中的结果，
+        # 并监视需求文件和 site-packages（覆盖在其他终端中执行的pip操作）
+        self.marker_env = None
+        self.site_dirs = []
+        self.index_job = None
+        self.fs_watcher = QFileSystemWatcher(self)
+        self.fs_watcher.fileChanged.connect(self.handle_requirements_changed)
+        self.fs_watcher.directoryChanged.connect(self.handle_directory_changed)
+        self.index_timer = QTimer(self)
+        self.index_timer.setSingleShot(True)
+        self.index_timer.setInterval(self.INDEX_DEBOUNCE)
+        self.index_timer.timeout.connect(self.start_index_update)
+
+        # 后台任务队列：pip操作不再阻塞主窗口，可排队、可取消
+        self.job_bridge = JobBridge(self)
+        self.job_bridge.job_updated_signal.connect(self.handle_job_updated)
+        self.job_bridge.job_output_signal.connect(self.handle_job_output)
+        self.job_bridge.job_rows_signal.connect(self.handle_refresh_rows)
+        self.scheduler = JobScheduler(self.job_bridge)
+        self.job_panel = JobPanel(self.scheduler, self)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.job_panel)
+
+        # 恢复上次使用的路径；校验和扫描等窗口显示后在后台进行
+        self.req_path.setText(self.settings.value("paths/requirements", "", type=str))
+        self.python_path.setText(self.settings.value("paths/python", "", type=str))
+        QTimer.singleShot(0, self.restore_last_session)
+
+        # 启动后在后台测速镜像（缓存未过期时不会访问网络），并预选最快的镜像
+        QTimer.singleShot(0, self.probe_mirrors)
+
+    def remember_paths(self):
+        self.settings.setValue("paths/requirements", self.req_path.text())
+        self.settings.setValue("paths/python", self.python_path.text())
+
+    def restore_last_session(self):
+        """在后台校验上次使用的Python环境并扫描依赖，不阻塞窗口显示"""
+        req_source = self.req_path.text()
+        python_dir = self.python_path.text()
+        if not req_source or not python_dir:
+            return
+        if not os.path.exists(req_source) or not os.path.exists(os.path.join(python_dir, "python.exe")):
+            self.status_label.setText("上次使用的路径已不存在，请重新选择")
+            return
+        self.start_refresh()
+
+    @property
+    def wheelhouse(self):
+        if self._wheelhouse is None:
+            from wheelhouse import DEFAULT_MAX_BYTES, Wheelhouse
+            # 容量上限可在设置中调整（GB）
+            max_gb = float(self.settings.value("wheelhouse/max_gb", DEFAULT_MAX_BYTES / 1024 ** 3))
+            self._wheelhouse = Wheelhouse(max_bytes=int(max_gb * 1024 ** 3))
+        return self._wheelhouse
+
+    @property
+    def git_wheel_cache(self):
+        if self._git_wheel_cache is None:
+            from git_cache import GitWheelCache
+            self._git_wheel_cache = GitWheelCache()
+        return self._git_wheel_cache
+
     def do_refresh(self):
         """处理刷新按钮点击事件"""
         # 检查是否选择了requirements.txt文件
@@ -227,28 +1038,8 @@ class DependencyInstaller(QMainWindow):
             QMessageBox.warning(self, "警告", "所选目录不包含python.exe文件")
             return
             
-        # 测试Python环境
-        try:
-            cmd = f'"{python_exe}" -c "import sys; print(sys.executable)"'
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-            if result.returncode != 0:
-                QMessageBox.warning(
-                    self,
-                    "警告",
-                    "所选Python环境可能无法正常工作，请检查是否选择了正确的Python目录"
-                )
-                return
-        except Exception as e:
-            QMessageBox.warning(
-                self,
-                "警告",
-                f"测试Python环境时出错: {str(e)}"
-            )
-            return
-            
-        # 所有检查都通过，执行刷新
+        # 刷新任务会先测试Python环境（结果有缓存），失败时给出提示
         self.refresh_dependencies()
-        self.status_label.setText("刷新完成")
 
     def select_requirements(self):
         file_path, _ = QFileDialog.getOpenFileName(
@@ -259,12 +1050,32 @@ class DependencyInstaller(QMainWindow):
         )
         if file_path:
             self.req_path.setText(file_path)
+            self.remember_paths()
             if self.python_path.text() and os.path.exists(os.path.join(self.python_path.text(), "python.exe")):
                 self.refresh_dependencies()
             else:
                 QMessageBox.information(self, "提示", "请选择Python环境目录")
-                self.dep_table.setRowCount(0)  # 清空依赖列表
+                self.dep_model.clear()  # 清空依赖列表
             
+    def select_comfy_root(self):
+        folder_path = QFileDialog.getExistingDirectory(
+            self,
+            "选择ComfyUI根目录"
+        )
+        if not folder_path:
+            return
+        from custom_nodes import find_requirement_files
+        if not find_requirement_files(folder_path):
+            QMessageBox.warning(self, "警告", "所选目录及其custom_nodes中没有找到requirements.txt文件")
+            return
+        self.req_path.setText(folder_path)
+        self.remember_paths()
+        if self.python_path.text() and os.path.exists(os.path.join(self.python_path.text(), "python.exe")):
+            self.refresh_dependencies()
+        else:
+            QMessageBox.information(self, "提示", "请选择Python环境目录")
+            self.dep_model.clear()  # 清空依赖列表
+
     def select_python_path(self):
         folder_path = QFileDialog.getExistingDirectory(
             self,
@@ -274,24 +1085,9 @@ class DependencyInstaller(QMainWindow):
             python_exe = os.path.join(folder_path, "python.exe")
             if os.path.exists(python_exe):
                 self.python_path.setText(folder_path)
-                # 测试Python环境
-                try:
-                    cmd = f'"{python_exe}" -c "import sys; print(sys.executable)"'
-                    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-                    if result.returncode == 0:
-                        self.refresh_dependencies()
-                    else:
-                        QMessageBox.warning(
-                            self,
-                            "警告",
-                            "所选Python环境可能无法正常工作，请检查是否选择了正确的Python目录"
-                        )
-                except Exception as e:
-                    QMessageBox.warning(
-                        self,
-                        "警告",
-                        f"测试Python环境时出错: {str(e)}"
-                    )
+                self.remember_paths()
+                # 刷新任务会先测试Python环境（结果有缓存），失败时给出提示
+                self.refresh_dependencies()
             else:
                 QMessageBox.warning(
                     self,
@@ -308,8 +1104,8 @@ class DependencyInstaller(QMainWindow):
             else:
                 # 如果包名包含可选依赖（如 package[extra]），只取基础包名
                 package_name = package_name.split('[')[0]
-            return pkg_resources.get_distribution(package_name).version
-        except (pkg_resources.DistributionNotFound, Exception):
+            return self.installed_index.get(normalize_name(package_name.strip()))
+        except Exception:
             return None
         
     def refresh_dependencies(self):
@@ -319,111 +1115,150 @@ class DependencyInstaller(QMainWindow):
             
         if not self.python_path.text() or not os.path.exists(os.path.join(self.python_path.text(), "python.exe")):
             QMessageBox.warning(self, "警告", "请先选择有效的Python环境目录")
-            self.dep_table.setRowCount(0)  # 清空依赖列表
+            self.dep_model.clear()  # 清空依赖列表
             return
             
-        try:
-            with open(self.req_path.text(), 'r') as f:
-                requirements = [line.strip() for line in f if line.strip() and not line.startswith('#')]
-            
-            self.dep_table.setRowCount(len(requirements))
-            
-            for i, req in enumerate(requirements):
-                # 解析包名和版本要求
-                if req.startswith('git+'):
-                    # 处理git仓库格式的依赖
-                    package_name = req
-                    required_version = "git仓库"
-                else:
-                    # 处理带环境标记的依赖
-                    if ';' in req:
-                        package_spec, env_marker = req.split(';', 1)
-                        package_spec = package_spec.strip()
-                        env_marker = env_marker.strip()
-                    else:
-                        package_spec = req
-                        env_marker = ""
-
-                    # 处理标准pip包格式的依赖
-                    if '==' in package_spec:
-                        package_name, required_version = package_spec.split('==', 1)
-                    else:
-                        # 处理其他格式的版本要求（如 >=, <=, ~=, > 等）
-                        package_name = package_spec
-                        for op in ['>=', '<=', '~=', '>', '<', '=']:
-                            if op in package_spec:
-                                package_name = package_spec.split(op)[0].strip()
-                                required_version = package_spec[len(package_name):].strip()
-                                break
-                        else:
-                            required_version = "任意"
-                    
-                    # 如果有环境标记，添加到版本信息中
-                    if env_marker:
-                        required_version = f"{required_version} ; {env_marker}" if required_version != "任意" else f"; {env_marker}"
-                
-                # 获取已安装版本
-                try:
-                    installed_version = self.get_installed_version(package_name.split('/')[-1].replace('.git', '') if package_name.startswith('git+') else package_name)
-                    status = f"已安装 ({installed_version})" if installed_version else "未安装"
-                except:
-                    installed_version = None
-                    status = "未安装"
-                
-                # 设置表格内容
-                self.dep_table.setItem(i, 0, QTableWidgetItem(package_name.strip()))
-                self.dep_table.setItem(i, 1, QTableWidgetItem(required_version.strip()))
-                self.dep_table.setItem(i, 2, QTableWidgetItem(status))
-                
-                # 添加安装/卸载按钮
-                is_installed = installed_version is not None
-                btn = QPushButton("卸载" if is_installed else "安装")
-                
-                # 设置按钮样式
-                if is_installed:
-                    btn.setStyleSheet("""
-                        QPushButton {
-                            background-color: #d9534f;
-                            color: white;
-                            border: none;
-                            border-radius: 0px;
-                            padding: 0px;
-                            margin: 0px;
-                            font-size: 12pt;
-                            font-family: "Microsoft YaHei";
-                            text-align: center;
-                            width: 100%;
-                            height: 100%;
-                        }
-                        QPushButton:hover {
-                            background-color: #c9302c;
-                        }
-                    """)
-                else:
-                    btn.setStyleSheet("""
-                        QPushButton {
-                            background-color: #337ab7;
-                            color: white;
-                            border: none;
-                            border-radius: 0px;
-                            padding: 0px;
-                            margin: 0px;
-                            font-size: 12pt;
-                            font-family: "Microsoft YaHei";
-                            text-align: center;
-                            width: 100%;
-                            height: 100%;
-                        }
-                        QPushButton:hover {
-                            background-color: #286090;
-                        }
-                    """)
-                
-                btn.clicked.connect(lambda checked, row=i: self.handle_package_action(row))
-                self.dep_table.setCellWidget(i, 3, btn)
-                
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"刷新依赖列表时出错: {str(e)}")
+        # 短时间内的多次刷新请求合并为一次
+        self.refresh_timer.start()
+
+    def start_refresh(self):
+        """在后台开始刷新，取消仍在进行的旧刷新"""
+        self.refresh_timer.stop()
+        if self.refresh_job is not None and not self.refresh_job.finished:
+            self.scheduler.cancel(self.refresh_job.id)
+        job = RefreshJob(self.python_path.text(), self.req_path.text(), on_rows=self.job_bridge.job_rows)
+        # 刷新很频繁，不在任务面板中显示
+        job.context['hidden'] = True
+        job.context['on_finished'] = self.handle_refresh_finished
+        self.refresh_job = job
+        self.scheduler.submit(job)
+        self.status_label.setText("正在刷新依赖列表...")
+
+    def handle_refresh_rows(self, job, start, rows):
+        # 已被新刷新取代的任务，其结果直接丢弃
+        if job is not self.refresh_job or job.cancel_requested:
+            return
+        if start == 0:
+            self.installed_index = job.env_state.installed_index
+            self.marker_env = job.env_state.marker_env
+        # 表格和 self.requirements 保持逐行对应：前面是新结果，后面暂时保留旧行
+        with job.timer.phase('table'):
+            count = self.dep_model.apply_chunk(start, rows)
+            new_requirements = job.env_state.requirements[start:start + len(rows)]
+            self.requirements = self.requirements[:start] + new_requirements + self.requirements[start + len(rows):count]
+            if start == 0:
+                self.fit_columns()
+
+    def watch_paths(self, state):
+        """监视本次刷新读取的需求文件、ComfyUI的custom_nodes目录和 site-packages"""
+        paths = list(state.requirement_files) + list(state.site_dirs)
+        nodes_dir = os.path.join(state.req_source, 'custom_nodes')
+        if os.path.isdir(nodes_dir):
+            # 新增或删除节点包
+            paths.append(nodes_dir)
+        old_paths = self.fs_watcher.files() + self.fs_watcher.directories()
+        if old_paths:
+            self.fs_watcher.removePaths(old_paths)
+        paths = [path for path in paths if os.path.exists(path)]
+        if paths:
+            self.fs_watcher.addPaths(paths)
+
+    def handle_requirements_changed(self, path):
+        # 编辑器保存时常常先删除再重建文件，刷新完成后会重新加入监视
+        self.status_label.setText(f"需求文件已变化，正在刷新: {path}")
+        self.refresh_timer.start()
+
+    def handle_directory_changed(self, path):
+        site_dirs = {os.path.normcase(os.path.abspath(site_dir)) for site_dir in self.site_dirs}
+        if os.path.normcase(os.path.abspath(path)) in site_dirs:
+            self.index_timer.start()
+        else:
+            self.refresh_timer.start()
+
+    def start_index_update(self):
+        """site-packages 有变化：在后台增量更新索引，再只更新受影响的行"""
+        if not self.python_path.text() or not self.site_dirs:
+            return
+        if self.index_job is not None and not self.index_job.finished:
+            # 上一次更新还没结束，稍后再试
+            self.index_timer.start()
+            return
+        job = InstalledIndexJob(self.python_path.text(), list(self.site_dirs))
+        job.context['hidden'] = True
+        job.context['on_finished'] = self.handle_index_updated
+        self.index_job = job
+        self.scheduler.submit(job)
+
+    def handle_index_updated(self, job):
+        if job is not self.index_job or job.state != SUCCEEDED:
+            return
+        if self.dep_graph is not None:
+            self.dep_graph.update(job.distributions)
+        self.apply_installed_changes(diff_index(self.installed_index, job.index))
+
+    def handle_pip_finished(self, job):
+        """根据确认过的安装计划和pip输出中的“Successfully installed/uninstalled”只更新受影响的行"""
+        plan = job.context.get('plan')
+        if plan is not None and job.state == SUCCEEDED:
+            self.apply_installed_changes(plan.changes())
+        changes = job.context['pip_changes'].changes
+        self.log_pip_job(job, changed=len(changes))
+        self.apply_installed_changes(changes)
+        if changes or plan is not None:
+            # 依赖关系图需要新装的包的元数据，随后在后台增量更新
+            self.index_timer.start()
+
+    def apply_installed_changes(self, changes):
+        """changes 为 规范化包名 -> 新版本（卸载为 None），更新索引和对应的表格行"""
+        if not changes:
+            return
+        for key, version in changes.items():
+            if version:
+                self.installed_index[key] = version
+            else:
+                self.installed_index.pop(key, None)
+        for row, req in enumerate(self.requirements):
+            if req.key in changes:
+                self.dep_model.update_row(row, **build_row(req, self.installed_index, self.marker_env))
+
+    def fit_columns(self):
+        """版本列和状态列按内容调整宽度"""
+        self.dep_table.resizeColumnToContents(1)
+        self.dep_table.resizeColumnToContents(2)
+
+    def handle_refresh_finished(self, job):
+        if job is not self.refresh_job:
+            return
+        if job.state == FAILED:
+            job.timer.finish(False, error=job.message)
+            QMessageBox.warning(self, "警告", f"刷新依赖列表时出错: {job.message}")
+            self.status_label.setText("刷新失败")
+            return
+        if job.state != SUCCEEDED:
+            return
+        state = job.env_state
+        with job.timer.phase('table'):
+            # 去掉比新列表多出来的旧行；空列表时也要清空
+            self.dep_model.truncate(len(state.rows))
+            self.requirements = list(state.requirements)
+            self.installed_index = state.installed_index
+            self.marker_env = state.marker_env
+            self.site_dirs = state.site_dirs
+            self.dep_graph = state.graph()
+            self.fit_columns()
+        self.watch_paths(state)
+        job.timer.finish(True)
+        if state.errors:
+            # 目录模式下错误来自各节点包，显示 节点包/文件名:行号
+            details = [
+                f"{os.path.basename(os.path.dirname(path))}/{os.path.basename(path)}:{lineno} {message}"
+                for path, lineno, message in state.errors
+            ]
+            self.status_label.setText(f"有 {len(state.errors)} 行无法解析，已跳过: {details[0]}")
+            self.status_label.setToolTip('\n'.join(details))
+        else:
+            self.status_label.setToolTip('')
+            self.status_label.setText(f"刷新完成 - {state.interpreter.describe()}")
 
     def get_pip_command(self):
         if not self.python_path.text():
@@ -434,51 +1269,233 @@ class DependencyInstaller(QMainWindow):
             QMessageBox.warning(self, "警告", f"Python解释器不存在: {python_exe}")
             return None
             
-        # 使用完整路径，并确保使用正斜杠
-        return f'"{python_exe.replace(os.sep, "/")}" -m pip'
+        return pip_command(python_exe)
+
+    def get_mirror_args(self):
+        return mirror_args(self.mirror_combo.currentData())
+
+    def get_python_exe(self):
+        return os.path.join(self.python_path.text(), "python.exe")
+
+    def current_interpreter(self):
+        """缓存中目标解释器的信息，只读缓存、不启动子进程；尚未探测或解释器已变化时返回None"""
+        return cached_interpreter(self.get_python_exe())
+
+    def with_interpreter(self, then, on_error=None):
+        """缓存中有目标解释器的信息时直接调用 then(信息)，否则先在后台探测，完成后再调用
+
+        探测失败时调用 on_error(说明)，未指定 on_error 时调用 then(None)。
+        """
+        interpreter = self.current_interpreter()
+        if interpreter is not None:
+            then(interpreter)
+            return
+        job = InterpreterProbeJob(self.get_python_exe(), self.python_path.text())
+        job.context['hidden'] = True
+
+        def finished(job):
+            if job.state == CANCELLED:
+                return
+            if job.state == SUCCEEDED:
+                then(job.interpreter)
+            elif on_error is not None:
+                on_error(job.message)
+            else:
+                then(None)
+        job.context['on_finished'] = finished
+        self.scheduler.submit(job)
+        self.status_label.setText("正在探测Python解释器...")
+
+    def wheelhouse_target(self):
+        """本地仓库清单使用的目标标识：目标解释器最优先的wheel标签"""
+        interpreter = self.current_interpreter()
+        return interpreter.best_tag if interpreter is not None else ''
+
+    def applicable_specs(self, requirements):
+        """适用于目标环境的需求字符串；含直接引用（git+等）时返回None，无法离线安装"""
+        interpreter = self.current_interpreter()
+        marker_env = interpreter.marker_env if interpreter is not None else self.marker_env
+        specs = []
+        for req in requirements:
+            if not req.applies(marker_env):
+                continue
+            if req.url:
+                return None
+            specs.append(req.to_spec())
+        return specs
+
+    def get_offline_args(self, requirements):
+        """本地仓库能满足这组需求时返回离线安装参数，否则返回空列表"""
+        specs = self.applicable_specs(requirements)
+        if not specs:
+            return []
+        target = self.wheelhouse_target()
+        hit = self.wheelhouse.can_satisfy(specs, target)
+        self.wheelhouse.record_use(specs, target, hit)
+        if not hit:
+            return []
+        return self.wheelhouse.install_args()
+
+    def prefetch_requirements(self):
+        """把当前依赖列表（含传递依赖）并行下载到本地仓库"""
+        pip_cmd = self.get_pip_command()
+        if not pip_cmd:
+            QMessageBox.warning(self, "警告", "请先选择Python环境")
+            return
+        if not self.requirements:
+            QMessageBox.information(self, "提示", "请先刷新依赖列表")
+            return
+        # 目标标识、环境标记和pip版本都来自解释器缓存，缓存未命中时先在后台探测
+        self.with_interpreter(lambda interpreter: self.submit_prefetch(pip_cmd))
+
+    def submit_prefetch(self, pip_cmd):
+        specs = self.applicable_specs([req for req in self.requirements if not req.url])
+        if not specs:
+            QMessageBox.information(self, "提示", "没有可以预取的依赖")
+            return
+        from wheelhouse import PrefetchJob
+        job = PrefetchJob(
+            self.wheelhouse, specs, pip_cmd, self.python_path.text(),
+            self.wheelhouse_target(), self.get_mirror_args(), pip_version=self.target_pip_version()
+        )
+        job.context['dialog'] = InstallDialog(job.title, f"{format_command(pip_cmd)} download ...", self)
+        job.context['finished_handler'] = self.handle_prefetch_finished
+        self.track_pip_job(job, 'prefetch', self.get_mirror_args())
+        job.context['on_finished'] = self.log_pip_job
+        self.scheduler.submit(job)
+        self.job_panel.show()
+
+    def handle_prefetch_finished(self, success, message, dialog):
+        dialog.set_finished(success, message)
+        self.status_label.setText(message if success else "预取失败，详情见任务输出")
+
+    def show_wheelhouse_usage(self):
+        usage = self.wheelhouse.usage()
+        total = usage['hits'] + usage['misses']
+        hit_rate = f"{usage['hits'] / total:.0%}" if total else "-"
+        git_usage = self.git_wheel_cache.usage()
+        QMessageBox.information(
+            self,
+            "本地缓存",
+            f"目录: {usage['path']}\n"
+            f"文件数: {usage['files']}\n"
+            f"占用: {usage['total_bytes'] / 1024 ** 2:.1f} MB / 上限 {usage['max_bytes'] / 1024 ** 3:.0f} GB\n"
+            f"预取次数: {usage['prefetches']}\n"
+            f"离线安装命中: {usage['hits']} / {total} ({hit_rate})\n\n"
+            f"git依赖构建缓存: {git_usage['commits']} 个提交，"
+            f"{git_usage['total_bytes'] / 1024 ** 2:.1f} MB\n"
+            f"复用 {git_usage['hits']} 次 / 构建 {git_usage['builds']} 次"
+        )
+
+    def custom_mirrors(self):
+        urls = self.settings.value("mirrors/custom", [])
+        if isinstance(urls, str):
+            urls = [urls]
+        return [url for url in urls if url]
+
+    def add_custom_mirror(self):
+        url, ok = QInputDialog.getText(self, "添加镜像", "simple索引地址（如 https://example.com/simple/）:")
+        url = url.strip()
+        if not ok or not url:
+            return
+        if not url.startswith(("http://", "https://")):
+            QMessageBox.warning(self, "警告", "镜像地址必须以 http:// 或 https:// 开头")
+            return
+        if self.mirror_combo.findData(url) >= 0:
+            QMessageBox.information(self, "提示", "该镜像已在列表中")
+            return
+        self.settings.setValue("mirrors/custom", self.custom_mirrors() + [url])
+        self.mirror_combo.addItem(f"自定义 {url}", url)
+        self.probe_mirrors()
+
+    def handle_mirror_activated(self, index):
+        self.mirror_user_selected = True
 
-    def get_mirror_url(self):
-        mirror_text = self.mirror_combo.currentText()
-        if "默认源" in mirror_text:
-            return ""
-        return f"-i {mirror_text.split()[-1]}"
+    def mirror_probe_urls(self):
+        """测速用的地址列表，默认源对应PyPI官方索引"""
+        return [self.mirror_combo.itemData(i) or PYPI_SIMPLE_URL for i in range(self.mirror_combo.count())]
+
+    def probe_mirrors(self, force=False):
+        """在任务队列中并发测速所有镜像"""
+        job = MirrorProbeJob(self.mirror_probe_urls(), force=force)
+        job.context['on_finished'] = self.handle_probe_finished
+        if force:
+            # 手动测速后按结果重新预选
+            self.mirror_user_selected = False
+        self.scheduler.submit(job)
+
+    def handle_probe_finished(self, job):
+        if not job.ranked:
+            return
+        results = {result.url: result for result in job.ranked}
+        for i in range(self.mirror_combo.count()):
+            result = results.get(self.mirror_combo.itemData(i) or PYPI_SIMPLE_URL)
+            if result is not None:
+                self.mirror_combo.setItemData(i, result.describe(), Qt.ToolTipRole)
+        fastest = job.ranked[0]
+        if not fastest.ok:
+            self.status_label.setText("镜像测速失败: 所有镜像均不可用")
+            return
+        index = 0 if fastest.url == PYPI_SIMPLE_URL else self.mirror_combo.findData(fastest.url)
+        if not self.mirror_user_selected and index >= 0:
+            self.mirror_combo.setCurrentIndex(index)
+        self.status_label.setText(f"镜像测速完成，最快: {self.mirror_combo.itemText(index)} ({fastest.describe()})")
 
     def handle_package_action(self, row):
-        package_name = self.dep_table.item(row, 0).text()
-        required_version = self.dep_table.item(row, 1).text()
+        requirement = self.requirements[row]
         
         try:
-            # 获取基础包名用于检查安装状态
-            if package_name.startswith('git+'):
-                base_package = os.path.splitext(os.path.basename(package_name))[0]
-            else:
-                base_package = package_name.split('[')[0]
-            
-            installed_version = self.get_installed_version(base_package)
-            
-            if installed_version:
-                self.uninstall_package(base_package)  # 卸载时使用基础包名
+            row_data = self.dep_model.row_data(row)
+            if row_data['state'] in UNSATISFIED_STATES:
+                # 未安装或版本不满足要求：按要求安装，pip会升级或降级到满足要求的版本
+                self.install_package(requirement)
+            elif row_data['installed']:
+                self.uninstall_package(requirement.name)  # 卸载时使用基础包名
             else:
-                self.install_package(package_name, required_version)  # 安装时使用完整包名
+                QMessageBox.information(self, "提示", f"{requirement.display_name()} 的环境标记与目标Python环境不匹配，无需安装")
         except Exception as e:
             QMessageBox.critical(self, "错误", f"处理依赖时出错: {str(e)}")
 
     def uninstall_all(self):
-        reply = QMessageBox.question(
-            self,
-            "确认卸载",
-            "确定要卸载所有依赖吗？",
-            QMessageBox.Yes | QMessageBox.No
-        )
-        
-        if reply == QMessageBox.No:
+        names = [req.name for req in self.requirements if req.key and self.installed_index.get(req.key)]
+        if not names:
+            QMessageBox.information(self, "提示", "没有已安装的依赖")
             return
-            
-        for row in range(self.dep_table.rowCount()):
-            package_name = self.dep_table.item(row, 0).text()
-            installed_version = self.get_installed_version(package_name)
-            if installed_version:
-                self.uninstall_package(package_name)
+        # 确认框中列出全部包以及仍依赖它们的其他包，一次pip调用卸载全部
+        self.uninstall_packages(names)
+
+    def selected_rows(self):
+        return sorted(index.row() for index in self.dep_table.selectionModel().selectedRows())
+
+    def install_selected(self):
+        """把选中的未满足要求的依赖放在同一个pip进程中安装，解析器只运行一次"""
+        rows = self.selected_rows()
+        if not rows:
+            QMessageBox.information(self, "提示", "请先在列表中选择要安装的依赖")
+            return
+        requirements = [
+            self.requirements[row] for row in rows
+            if self.dep_model.row_data(row)['state'] in UNSATISFIED_STATES
+        ]
+        if not requirements:
+            QMessageBox.information(self, "提示", "选中的依赖都已满足要求或不适用于当前环境")
+            return
+        self.install_requirements(requirements)
+
+    def uninstall_selected(self):
+        """一次确认、一个pip进程卸载所有选中的已安装依赖"""
+        rows = self.selected_rows()
+        if not rows:
+            QMessageBox.information(self, "提示", "请先在列表中选择要卸载的依赖")
+            return
+        names = [
+            self.requirements[row].name for row in rows
+            if self.dep_model.row_data(row)['installed']
+        ]
+        if not names:
+            QMessageBox.information(self, "提示", "选中的依赖都未安装")
+            return
+        self.uninstall_packages(names)
 
     def install_all(self):
         if not self.req_path.text() or not os.path.exists(self.req_path.text()):
@@ -490,136 +1507,488 @@ class DependencyInstaller(QMainWindow):
             QMessageBox.warning(self, "警告", "请先选择Python环境")
             return
             
-        mirror_url = self.get_mirror_url()
-        cmd = f'{pip_cmd} install -r "{self.req_path.text()}" {mirror_url}'
-        
-        # 创建并显示安装对话框
-        dialog = InstallDialog("所有依赖", cmd, self)
-        
-        # 创建安装线程
-        install_thread = InstallThread(cmd)
-        install_thread.output_received.connect(dialog.append_output)
-        install_thread.finished.connect(lambda success, msg: self.handle_install_finished(success, msg, dialog))
-        
-        # 启动线程
-        install_thread.start()
-        
-        # 显示对话框
-        dialog.exec_()
+        from custom_nodes import aggregate_requirements, find_requirement_files
+        from req_parser import parse_requirements
+        mirror = self.get_mirror_args()
+        req_file = self.req_path.text()
+        if os.path.isdir(req_file):
+            parsed = None
+            requirements = self.requirements
+            if not requirements or not hasattr(requirements[0], 'sources'):
+                requirements, _ = aggregate_requirements(find_requirement_files(req_file), req_file,
+                                                         marker_env=self.marker_env)
+        else:
+            parsed = parse_requirements(req_file)
+            requirements = parsed.requirements
+
+        # 按已安装索引在本地判断，只把未满足要求的依赖交给pip；全部满足时不启动pip
+        unsatisfied = [
+            req for req in requirements
+            if build_row(req, self.installed_index, self.marker_env)['state'] in UNSATISFIED_STATES
+        ]
+        if not unsatisfied:
+            self.status_label.setText("所有依赖均已满足要求")
+            QMessageBox.information(self, "提示", "所有依赖均已满足要求，无需安装")
+            return
+        if parsed is None:
+            conflicts = [item for item in unsatisfied if item.conflict]
+            if conflicts:
+                reply = QMessageBox.question(
+                    self,
+                    "版本冲突",
+                    f"有 {len(conflicts)} 个依赖的版本要求存在冲突，pip可能无法完成解析，是否继续？",
+                    QMessageBox.Yes | QMessageBox.No
+                )
+                if reply == QMessageBox.No:
+                    return
+
+        def install(prebuilt):
+            # 写成一个需求文件，pip只需整体解析一次；单文件模式保留原文件中的选项和约束。
+            # 文件在任务执行时才写入任务自己的临时目录，排队中的其他安装不会覆盖它
+            files = {PENDING_REQUIREMENTS: lambda path: write_requirements_file(unsatisfied, path, parsed, prebuilt)}
+            # 本地仓库能满足整组需求时离线安装，不再访问网络
+            offline_args = self.get_offline_args(unsatisfied)
+            cmd = install_file_command(pip_cmd, PENDING_REQUIREMENTS, offline_args or mirror)
+            self.start_install(f"{len(unsatisfied)} 个未满足要求的依赖", cmd, unsatisfied, files)
+
+        self.build_git_wheels(unsatisfied, install)
 
     def handle_install_finished(self, success, message, dialog):
         try:
             dialog.set_finished(success, message)
             if success:
+                # 受影响的行已根据pip输出更新
                 self.status_label.setText(f"成功安装 {dialog.package_name}")
-                # 安装成功后等待一小段时间再刷新，确保pip已经完成所有操作
-                QTimer.singleShot(1000, self.refresh_dependencies)
             else:
                 self.status_label.setText(f"安装失败: {dialog.package_name}")
         except Exception as e:
             QMessageBox.critical(self, "错误", f"处理安装结果时出错: {str(e)}")
 
-    def install_package(self, package_name, version=""):
+    def install_package(self, requirement):
+        """安装单个结构化依赖（ParsedRequirement / AggregatedRequirement）"""
+        self.install_requirements([requirement])
+
+    def install_requirements(self, requirements):
+        """在同一个pip进程中安装多个依赖，解析器只运行一次"""
         pip_cmd = self.get_pip_command()
         if not pip_cmd:
             QMessageBox.warning(self, "警告", "请先选择Python环境")
             return
-            
-        mirror_url = self.get_mirror_url()
-        
-        if package_name.startswith('git+'):
-            # git仓库安装不需要镜像源
-            cmd = f'{pip_cmd} install {package_name}'
-        else:
-            # 标准包安装
-            if version and version != "任意":
-                if ';' in version:
-                    # 处理带环境标记的版本
-                    version_spec, env_marker = version.split(';', 1)
-                    version_spec = version_spec.strip()
-                    env_marker = env_marker.strip()
-                    if version_spec:
-                        package_spec = f"{package_name}{version_spec}"
-                    else:
-                        package_spec = package_name
-                    package_spec = f"{package_spec} ; {env_marker}"
-                elif version.startswith(('>=', '<=', '~=', '>', '<')):
-                    # 对于范围版本要求，直接使用原始的版本字符串
-                    package_spec = f"{package_name}{version}"
-                else:
-                    # 对于明确的版本要求，使用 ==
-                    package_spec = f"{package_name}=={version}"
-            else:
-                # 没有版本要求时直接安装最新版
-                package_spec = package_name
-                
-            # 组装完整命令
-            cmd_parts = [pip_cmd, "install"]
-            if mirror_url:
-                cmd_parts.append(mirror_url)
-            cmd_parts.append(package_spec)
-            cmd = " ".join(cmd_parts)
 
+        def install(prebuilt):
+            # 本地仓库能满足时离线安装，否则使用镜像（git仓库安装不需要镜像源）
+            offline_args = self.get_offline_args(requirements)
+            cmd = install_command(pip_cmd, requirements, offline_args or self.get_mirror_args(), prebuilt)
+            title = requirements[0].display_name() if len(requirements) == 1 else f"{len(requirements)} 个依赖"
+            self.start_install(title, cmd, requirements)
+
+        self.build_git_wheels(requirements, install)
+
+    def build_git_wheels(self, requirements, then):
+        """安装前在后台把 git+ 依赖解析到提交，从缓存取得或构建wheel，完成后调用 then(prebuilt)
+
+        同一提交的源码只构建一次，之后在任何环境中安装都直接使用缓存的wheel；
+        没有 git+ 依赖或无法探测目标解释器时直接调用 then({})。
+        """
+        # 之后的步骤（本地仓库、pip版本）都只读解释器缓存，这里先确保缓存中有目标解释器
+        self.with_interpreter(lambda interpreter: self.submit_git_build(requirements, interpreter, then))
+
+    def submit_git_build(self, requirements, interpreter, then):
+        from git_cache import GitWheelBuilder, GitWheelJob, cacheable_requirements
+
+        if interpreter is None or not cacheable_requirements(requirements):
+            then({})
+            return
+        tags = interpreter.tags
+        pip_cmd = self.get_pip_command()
+        builder = GitWheelBuilder(self.git_wheel_cache, pip_cmd, tags, self.get_mirror_args())
+        job = GitWheelJob(builder, requirements, self.python_path.text())
+        job.context['dialog'] = InstallDialog(job.title, f"{format_command(pip_cmd)} wheel --no-deps ...", self)
+        self.track_pip_job(job, 'git_build', [])
+
+        def finished(job):
+            self.log_pip_job(job, git_cached=sum(1 for item in builder.report if item['action'] == 'cached'),
+                             git_built=sum(1 for item in builder.report if item['action'] == 'built'))
+            job.context['dialog'].set_finished(job.state == SUCCEEDED, job.message)
+            if job.state == CANCELLED:
+                self.status_label.setText(f"已取消: {job.title}")
+                return
+            # 构建失败的依赖不在 prebuilt 中，仍按原地址交给pip
+            then(builder.prebuilt)
+        job.context['on_finished'] = finished
+        self.scheduler.submit(job)
+        self.job_panel.show()
+        self.status_label.setText(f"正在准备git依赖: {job.title}")
+
+    def target_pip_version(self):
+        interpreter = self.current_interpreter()
+        return interpreter.pip_version if interpreter is not None else None
+
+    def start_install(self, title, cmd, requirements, files=None):
+        """安装前先用pip试运行生成变更计划，用户确认后再执行；未开启预览或pip不支持时直接安装
+
+        pip 支持时加上 --progress-bar raw，输出窗口据此显示下载进度。files 见 CommandJob。
+        """
+        pip_version = self.target_pip_version()
+        cmd = progress_command(cmd, pip_version)
+        if self.preview_check.isChecked():
+            if supports_report(pip_version):
+                job = PlanJob(title, cmd, self.python_path.text(), self.installed_index,
+                              [req.key for req in requirements if req.key])
+                job.files = files or {}
+                job.context['dialog'] = InstallDialog(job.title, job.display_command(), self)
+                job.context['on_finished'] = self.handle_plan_finished
+                self.track_pip_job(job, 'plan', cmd)
+                self.scheduler.submit(job)
+                self.job_panel.show()
+                self.status_label.setText(f"正在生成安装计划: {title}")
+                return
+        self.submit_pip_job(title, cmd, self.handle_install_finished, files=files)
+
+    def handle_plan_finished(self, job):
+        self.log_pip_job(job)
+        job.context['dialog'].set_finished(job.state == SUCCEEDED, job.message)
+        title = job.install_title
+        if job.state == CANCELLED:
+            self.status_label.setText(f"已取消安装: {title}")
+            return
+        if job.state != SUCCEEDED:
+            reply = QMessageBox.question(
+                self,
+                "生成安装计划失败",
+                f"{job.message[-500:]}\n\n是否跳过预览直接安装？",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            if reply == QMessageBox.Yes:
+                self.submit_pip_job(title, job.install_cmd, self.handle_install_finished, files=job.files)
+            return
+        if not job.plan.changed_items():
+            self.status_label.setText(f"无需安装: {title}")
+            QMessageBox.information(self, "提示", "pip解析后没有需要安装或变更的包")
+            return
+        if InstallPlanDialog(title, job.plan, self).exec_() != QDialog.Accepted:
+            self.status_label.setText(f"已取消安装: {title}")
+            return
+        pip_job = self.submit_pip_job(title, job.install_cmd, self.handle_install_finished, files=job.files)
+        if pip_job is not None:
+            pip_job.context['plan'] = job.plan
+            # 计划中已知的下载量作为进度条的总量
+            pip_job.context['pip_progress'].expected_bytes = job.plan.download_size()[0]
+
+    def submit_pip_job(self, package_name, cmd, finished_handler, read_only=False, operation='install', files=None):
+        """把一条pip命令加入后台任务队列，输出写入该任务的（非模态）输出窗口"""
         try:
-            # 创建并显示安装对话框
-            dialog = InstallDialog(package_name, cmd, self)
-            
-            # 创建安装线程
-            install_thread = InstallThread(cmd)
-            install_thread.output_received.connect(dialog.append_output)
-            install_thread.finished.connect(lambda success, msg: self.handle_install_finished(success, msg, dialog))
-            
-            # 启动线程
-            install_thread.start()
-            
-            # 显示对话框并等待完成
-            dialog.exec_()
+            dialog = InstallDialog(package_name, format_command(cmd), self)
+            job = CommandJob(package_name, cmd, self.python_path.text(), read_only=read_only)
+            job.files = files or {}
+            job.context['dialog'] = dialog
+            job.context['finished_handler'] = finished_handler
+            job.context['pip_changes'] = PipChangeCollector()
+            job.context['on_finished'] = self.handle_pip_finished
+            self.track_pip_job(job, operation, cmd)
+            self.scheduler.submit(job)
+            self.job_panel.show()
+            self.status_label.setText(f"已加入任务队列: {package_name}")
+            return job
         except Exception as e:
-            QMessageBox.critical(self, "错误", f"安装过程出错: {str(e)}")
+            QMessageBox.critical(self, "错误", f"执行pip命令时出错: {str(e)}")
+            return None
+
+    def operation_timeout(self, operation):
+        """设置中该类操作的超时（秒，timeouts/<操作>），未设置或为0时不限制"""
+        seconds = float(self.settings.value(f"timeouts/{operation}", 0) or 0)
+        return seconds if seconds > 0 else None
+
+    def track_pip_job(self, job, operation, cmd):
+        """记录pip任务各阶段的耗时，完成后由 log_pip_job 写入操作日志；按操作类型设置超时"""
+        job.context['operation'] = operation
+        job.timeout = self.operation_timeout(operation)
+        job.context['pip_phases'] = PipPhaseTracker()
+        job.context['pip_progress'] = PipProgress()
+        if '--no-index' in cmd:
+            job.context['mirror'] = '本地仓库'
+        else:
+            job.context['mirror'] = self.mirror_combo.currentData() or ''
+
+    def log_pip_job(self, job, **counters):
+        """把pip任务的排队时间、各阶段耗时和下载量写入操作日志；已取消的任务不记录"""
+        if job.state == CANCELLED or job.started_at is None:
+            return
+        timer = OperationTimer(job.context.get('operation', 'pip'), env=job.env_key or '',
+                               mirror=job.context.get('mirror', ''))
+        timer.started_at = job.started_at
+        timer.add_phase('queue', job.started_at - job.created_at)
+        tracker = job.context.get('pip_phases')
+        if tracker is not None:
+            for phase, seconds in tracker.finish().items():
+                timer.add_phase(phase, seconds)
+            timer.count('downloads', tracker.downloads)
+            timer.count('download_bytes', tracker.download_bytes)
+        progress = job.context.get('pip_progress')
+        if progress is not None and progress.transfer_seconds:
+            # 由原始进度行测得的实际传输量和时间，比下载阶段的耗时更准确
+            timer.count('transfer_bytes', progress.transfer_bytes)
+            timer.count('transfer_seconds', round(progress.transfer_seconds, 3))
+        if getattr(job, 'peak_rss', None):
+            timer.count('peak_rss', job.peak_rss)
+        for name, value in counters.items():
+            timer.count(name, value)
+        if job.state == SUCCEEDED:
+            timer.finish(True, seconds=job.elapsed())
+        else:
+            timer.finish(False, seconds=job.elapsed(), error=job.message[-200:])
+
+    def handle_job_output(self, job, text):
+        collector = job.context.get('pip_changes')
+        if collector is not None:
+            collector.feed_text(text)
+        tracker = job.context.get('pip_phases')
+        if tracker is not None:
+            tracker.feed_text(text)
+        progress = job.context.get('pip_progress')
+        dialog = job.context.get('dialog')
+        if progress is not None:
+            progress.feed_text(text)
+            text = strip_progress_lines(text)
+            if dialog is not None:
+                dialog.update_progress(progress)
+        if dialog is not None and text:
+            dialog.append_output(text)
+
+    def handle_job_updated(self, job):
+        if not job.context.get('hidden'):
+            self.job_panel.update_job(job)
+        if job.finished and not job.context.get('handled'):
+            job.context['handled'] = True
+            on_finished = job.context.get('on_finished')
+            if on_finished is not None:
+                on_finished(job)
+            handler = job.context.get('finished_handler')
+            dialog = job.context.get('dialog')
+            if handler is not None and dialog is not None:
+                handler(job.state == SUCCEEDED, job.message, dialog)
+            if job.context.get('hidden'):
+                self.scheduler.forget(job)
+
+    def closeEvent(self, event):
+        running = [job for job in self.scheduler.jobs() if not job.finished and not job.context.get('hidden')]
+        if running:
+            reply = QMessageBox.question(
+                self,
+                "确认退出",
+                f"还有 {len(running)} 个任务未完成，退出将取消这些任务，确定退出吗？",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            if reply == QMessageBox.No:
+                event.ignore()
+                return
+        self.scheduler.shutdown()
+        super().closeEvent(event)
 
     def handle_uninstall_finished(self, success, message, dialog):
         dialog.set_finished(success, message)
         if success:
+            # 受影响的行已根据pip输出更新
             self.status_label.setText(f"成功卸载 {dialog.package_name}")
-            # 卸载成功后等待一小段时间再刷新，确保pip已经完成所有操作
-            QTimer.singleShot(1000, self.refresh_dependencies)
         else:
             self.status_label.setText(f"卸载失败: {dialog.package_name}")
 
+    def uninstall_dependents(self, package_names):
+        """要卸载的包 -> 仍依赖它的其他已安装包的名称（同一批卸载的包不计入）"""
+        if self.dep_graph is None:
+            return {}
+        removing = {normalize_name(name) for name in package_names}
+        dependents = {}
+        for name in package_names:
+            users = self.dep_graph.dependents_of(normalize_name(name), exclude=removing)
+            if users:
+                dependents[name] = [self.dep_graph.display_name(user) for user in users]
+        return dependents
+
+    def show_consistency_report(self):
+        """在本进程内检查已安装包之间的依赖是否一致，结果与 pip check 相同"""
+        if self.dep_graph is None:
+            QMessageBox.information(self, "提示", "请先刷新依赖列表")
+            return
+        start = time.perf_counter()
+        problems = self.dep_graph.check()
+        elapsed = (time.perf_counter() - start) * 1000
+        count = len(self.dep_graph.distributions)
+        if not problems:
+            self.status_label.setText(f"依赖检查通过: {count} 个包 ({elapsed:.1f}ms)")
+            QMessageBox.information(self, "依赖检查", f"已安装的 {count} 个包的依赖都已满足")
+            return
+        self.status_label.setText(f"依赖检查发现 {len(problems)} 个问题 ({elapsed:.1f}ms)")
+        box = QMessageBox(QMessageBox.Warning, "依赖检查", f"已安装的 {count} 个包中发现 {len(problems)} 个依赖问题:", QMessageBox.Ok, self)
+        box.setInformativeText("\n".join(problem.describe() for problem in problems[:10]))
+        box.setDetailedText("\n".join(problem.describe() for problem in problems))
+        box.exec_()
+
+    def cleanup_orphans(self):
+        """卸载孤立的依赖：不是直接安装的、不在当前依赖列表中，也不被这两类包（直接或间接）依赖"""
+        if self.dep_graph is None:
+            QMessageBox.information(self, "提示", "请先刷新依赖列表")
+            return
+        orphans = self.dep_graph.orphans(req.key for req in self.requirements if req.key)
+        if not orphans:
+            QMessageBox.information(self, "提示", "没有发现孤立的依赖包")
+            return
+        self.uninstall_packages([self.dep_graph.display_name(key) for key in orphans])
+
+    def show_compare_dialog(self):
+        if self.compare_dialog is None:
+            self.compare_dialog = CompareDialog(self)
+        self.compare_dialog.show()
+        self.compare_dialog.raise_()
+
+    def snapshot_interpreter(self, then):
+        """保存/恢复快照前（在后台）探测目标解释器，完成后调用 then(解释器信息, site-packages 列表)；失败时提示"""
+        if not self.python_path.text():
+            QMessageBox.warning(self, "警告", "请先选择Python环境")
+            return
+        python_path = self.python_path.text()
+        self.with_interpreter(
+            lambda interpreter: then(interpreter, interpreter.site_packages or find_site_packages(python_path)),
+            on_error=lambda message: QMessageBox.warning(self, "警告", f"无法探测Python解释器: {message}")
+        )
+
+    def save_snapshot(self):
+        """把目标环境已安装的全部包（准确版本、来源和 RECORD 摘要）保存为锁文件"""
+        self.snapshot_interpreter(self.write_snapshot)
+
+    def write_snapshot(self, interpreter, site_dirs):
+        default_path = os.path.join(get_cache_dir('snapshots'), time.strftime('snapshot_%Y%m%d_%H%M%S.lock.json'))
+        file_path, _ = QFileDialog.getSaveFileName(self, "保存环境快照", default_path, "锁文件 (*.json)")
+        if not file_path:
+            return
+        from env_lock import SnapshotJob
+        job = SnapshotJob(site_dirs, file_path, self.get_python_exe(), interpreter.best_tag, self.python_path.text())
+        job.context['on_finished'] = self.handle_snapshot_finished
+        # 任务可能很快完成并同步调用完成回调，提示需要在提交前设置
+        self.status_label.setText("正在读取已安装包的锁定信息...")
+        self.scheduler.submit(job)
+
+    def handle_snapshot_finished(self, job):
+        if job.state == SUCCEEDED:
+            self.status_label.setText(job.message)
+        elif job.state == FAILED:
+            self.status_label.setText("保存快照失败")
+            QMessageBox.critical(self, "错误", job.message)
+
+    def restore_snapshot(self):
+        """把环境恢复到快照：只处理有差异的包，安装在一个pip进程中完成，本地仓库有所需文件时离线安装"""
+        pip_cmd = self.get_pip_command()
+        if not pip_cmd:
+            QMessageBox.warning(self, "警告", "请先选择Python环境")
+            return
+        file_path, _ = QFileDialog.getOpenFileName(self, "选择环境快照", get_cache_dir('snapshots'), "锁文件 (*.json)")
+        if not file_path:
+            return
+        self.snapshot_interpreter(lambda interpreter, site_dirs: self.diff_snapshot(file_path, interpreter, site_dirs))
+
+    def diff_snapshot(self, file_path, interpreter, site_dirs):
+        from env_lock import LockDiffJob
+        job = LockDiffJob(file_path, site_dirs, self.python_path.text())
+        job.context['on_finished'] = lambda job: self.confirm_restore(job, interpreter)
+        self.status_label.setText("正在比较快照与当前环境...")
+        self.scheduler.submit(job)
+
+    def confirm_restore(self, job, interpreter):
+        if job.state == FAILED:
+            self.status_label.setText("读取快照失败")
+            QMessageBox.warning(self, "警告", job.message)
+            return
+        if job.state != SUCCEEDED:
+            return
+        lock, diff = job.lock, job.diff
+        self.status_label.setText(f"快照比较完成: {diff.summary()}")
+        if diff.is_empty():
+            QMessageBox.information(self, "提示", "当前环境与快照一致，无需恢复")
+            return
+
+        box = QMessageBox(QMessageBox.Question, "恢复环境快照",
+                          f"将把环境恢复到 {lock.created} 的快照: {diff.summary()}",
+                          QMessageBox.Yes | QMessageBox.No, self)
+        details = diff.describe()
+        informative = "\n".join(details[:10])
+        if len(details) > 10:
+            informative += f"\n... 等共 {len(details)} 项"
+        if lock.target and lock.target != interpreter.best_tag:
+            informative += f"\n\n注意：快照来自不同的解释器（{lock.target}），部分版本可能无法安装"
+        box.setInformativeText(informative)
+        box.setDetailedText("\n".join(details))
+        if box.exec_() != QMessageBox.Yes:
+            return
+
+        self.submit_restore_job(self.python_path.text(), diff, f"恢复快照: {diff.summary()}",
+                                tags=interpreter.tags)
+
+    def submit_restore_job(self, python_path, diff, title, on_finished=None, operation='restore', tags=None):
+        """把差异（env_lock.LockDiff）应用到指定环境；本地仓库有所需文件时离线安装
+
+        tags 为目标解释器支持的wheel标签；目标是当前环境时按pip输出更新表格；完成后调用 on_finished(job)。
+        """
+        from env_lock import RestoreJob, restore_source_args
+
+        pip_cmd = pip_command(find_python_exe(python_path) or os.path.join(python_path, "python.exe"))
+        source_args = restore_source_args(diff, self.wheelhouse, self.get_mirror_args(), tags)
+        job = RestoreJob(title, pip_cmd, diff, python_path, source_args)
+        job.context['dialog'] = InstallDialog(title, job.display_command(), self)
+        job.context['finished_handler'] = self.handle_install_finished
+        current = os.path.normcase(os.path.abspath(python_path)) == os.path.normcase(os.path.abspath(self.python_path.text()))
+        if current:
+            job.context['pip_changes'] = PipChangeCollector()
+
+        def finished(job):
+            if current:
+                self.handle_pip_finished(job)
+            else:
+                self.log_pip_job(job)
+            if on_finished is not None:
+                on_finished(job)
+        job.context['on_finished'] = finished
+        self.track_pip_job(job, operation, source_args)
+        self.scheduler.submit(job)
+        self.job_panel.show()
+        self.status_label.setText(f"已加入任务队列: {title}")
+        return job
+
     def uninstall_package(self, package_name):
+        self.uninstall_packages([package_name])
+
+    def uninstall_packages(self, package_names, confirm=True):
+        """一次确认、一个 pip uninstall 进程卸载多个包"""
         pip_cmd = self.get_pip_command()
         if not pip_cmd:
             QMessageBox.warning(self, "警告", "请先选择Python环境")
             return
             
-        # 如果包名包含可选依赖，只取基础包名
-        base_package = package_name.split('[')[0]
+        # 如果包名包含可选依赖，只取基础包名；同时去重并保持顺序
+        cmd, base_packages = uninstall_command(pip_cmd, package_names)
+
+        if confirm:
+            preview = "\n".join(base_packages[:20])
+            if len(base_packages) > 20:
+                preview += f"\n... 等共 {len(base_packages)} 个包"
+            dependents = self.uninstall_dependents(base_packages)
+            if dependents:
+                lines = [
+                    f"{name} ← {', '.join(users[:5])}" + (f" 等 {len(users)} 个" if len(users) > 5 else "")
+                    for name, users in list(dependents.items())[:20]
+                ]
+                preview += "\n\n注意：以下包仍被其他已安装的包依赖，卸载后它们可能无法正常工作：\n" + "\n".join(lines)
+            reply = QMessageBox.question(
+                self,
+                "确认卸载",
+                f"确定要卸载以下包吗？\n{preview}",
+                QMessageBox.Yes | QMessageBox.No
+            )
             
-        reply = QMessageBox.question(
-            self,
-            "确认卸载",
-            f"确定要卸载 {base_package} 吗？",
-            QMessageBox.Yes | QMessageBox.No
-        )
-        
-        if reply == QMessageBox.No:
-            return
+            if reply == QMessageBox.No:
+                return
             
-        cmd = f'{pip_cmd} uninstall -y {base_package}'
-        
-        # 创建并显示卸载对话框
-        dialog = InstallDialog(f"卸载 {package_name}", cmd, self)
-        
-        # 创建卸载线程
-        install_thread = InstallThread(cmd)
-        install_thread.output_received.connect(dialog.append_output)
-        install_thread.finished.connect(lambda success, msg: self.handle_uninstall_finished(success, msg, dialog))
-        
-        # 启动线程
-        install_thread.start()
-        
-        # 显示对话框
-        dialog.exec_()
+        title = f"卸载 {base_packages[0]}" if len(base_packages) == 1 else f"卸载 {len(base_packages)} 个包"
+        self.submit_pip_job(title, cmd, self.handle_uninstall_finished, operation='uninstall')
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -630,8 +1999,8 @@ if __name__ == "__main__":
     font.setPointSize(10)  # 设置字体大小
     app.setFont(font)
     
-    # 设置全局样式
-    app.setStyleSheet("""
+    # 全局样式在首次绘制之后再应用，解析样式表和重新计算控件样式不占用启动时间
+    style_sheet = """
         QMainWindow {
             background-color: #f5f5f5;
         }
@@ -656,12 +2025,12 @@ if __name__ == "__main__":
             padding: 5px 15px;
             font-size: 10pt;
         }
-        QTableWidget {
+        QTableView {
             font-size: 10pt;
             border: 1px solid #ddd;
             background-color: white;
         }
-        QTableWidget::item {
+        QTableView::item {
             padding: 5px;
         }
         QHeaderView::section {
@@ -672,8 +2041,9 @@ if __name__ == "__main__":
             border-bottom: 1px solid #ddd;
             font-weight: bold;
         }
-    """)
+    """
     
     window = DependencyInstaller()
     window.show()
+    QTimer.singleShot(0, lambda: app.setStyleSheet(style_sheet))
     sys.exit(app.exec_()) 
\ No newline at end of file
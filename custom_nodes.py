@@ -0,0 +1,227 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from packaging.markers import Marker, UndefinedEnvironmentName
+from packaging.specifiers import SpecifierSet
+from packaging.version import InvalidVersion, Version
+
+from req_parser import VERSION_OK, RequirementParseError, compare_version, parse_requirements
+
+# 视为“只有下限”的运算符，组合后总能被足够新的版本满足
+_OPEN_ENDED_OPERATORS = {'>', '>=', '!='}
+
+
+def find_requirement_files(comfy_root):
+    """查找ComfyUI根目录及 custom_nodes/*/ 下的所有 requirements.txt"""
+    files = []
+    root_file = os.path.join(comfy_root, 'requirements.txt')
+    if os.path.isfile(root_file):
+        files.append(root_file)
+
+    nodes_dir = os.path.join(comfy_root, 'custom_nodes')
+    try:
+        entries = sorted(os.scandir(nodes_dir), key=lambda e: e.name.lower())
+    except OSError:
+        return files
+    for entry in entries:
+        # 跳过 .disabled、__pycache__ 等非节点目录
+        if not entry.is_dir() or entry.name.startswith(('.', '__')):
+            continue
+        path = os.path.join(entry.path, 'requirements.txt')
+        if os.path.isfile(path):
+            files.append(path)
+    return files
+
+
+def source_label(path, comfy_root):
+    """需求文件所属的节点包名称，根目录的文件显示为 ComfyUI"""
+    parent = os.path.dirname(os.path.abspath(path))
+    if os.path.normcase(parent) == os.path.normcase(os.path.abspath(comfy_root)):
+        return 'ComfyUI'
+    return os.path.basename(parent)
+
+
+def _marker_applies(marker, marker_env):
+    """环境标记在目标环境中是否成立；marker_env 为None时按当前解释器判断，无法判断时视为成立"""
+    if not marker:
+        return True
+    try:
+        return Marker(marker).evaluate(marker_env) if marker_env else Marker(marker).evaluate()
+    except UndefinedEnvironmentName:
+        return True
+
+
+class AggregatedRequirement:
+    """合并后的单个依赖：记录各节点包的要求以及是否存在冲突
+
+    对外提供与 req_parser.ParsedRequirement 相同的显示/安装接口。版本要求只合并环境标记在
+    目标环境（marker_env）中成立的来源，其他平台或Python版本的要求不参与冲突判断和安装。
+    """
+
+    def __init__(self, key, name, marker_env=None):
+        self.key = key
+        self.name = name
+        self.marker_env = marker_env
+        self.extras = set()
+        self.specifiers = {}  # 来源 -> 版本要求字符串
+        self.markers = {}  # 来源 -> 环境标记字符串
+        self.direct = None  # 直接引用（git+、URL等）对应的 ParsedRequirement
+        self.conflict = ''
+
+    @property
+    def sources(self):
+        return list(self.specifiers)
+
+    @property
+    def url(self):
+        return self.direct.url if self.direct else None
+
+    @property
+    def is_vcs(self):
+        return bool(self.direct) and self.direct.is_vcs
+
+    @property
+    def editable(self):
+        return bool(self.direct) and self.direct.editable
+
+    def add(self, source, req):
+        self.markers[source] = str(req.marker) if req.marker else ''
+        if req.url:
+            self.direct = self.direct or req
+            self.specifiers[source] = ''
+            return
+        self.extras.update(req.extras)
+        self.specifiers[source] = str(req.specifier)
+
+    def active_sources(self, marker_env=None):
+        """环境标记在目标环境中成立的来源；都不成立（依赖不适用）时返回全部来源"""
+        env = marker_env if marker_env is not None else self.marker_env
+        sources = [source for source in self.specifiers if _marker_applies(self.markers[source], env)]
+        return sources or list(self.specifiers)
+
+    def combined_specifier(self, marker_env=None):
+        combined = SpecifierSet()
+        for source in self.active_sources(marker_env):
+            combined &= SpecifierSet(self.specifiers[source])
+        return combined
+
+    def common_marker(self, marker_env=None):
+        """参与合并的来源的环境标记：都相同时为该标记，各不相同时用 or 连接；有来源不带标记时返回None"""
+        markers = []
+        for source in self.active_sources(marker_env):
+            marker = self.markers[source]
+            if not marker:
+                return None
+            if marker not in markers:
+                markers.append(marker)
+        if len(markers) == 1:
+            return markers[0]
+        return ' or '.join(f'({marker})' for marker in markers) or None
+
+    def applies(self, marker_env=None):
+        """任一来源在目标环境中需要该依赖即视为适用"""
+        return any(_marker_applies(marker, marker_env) for marker in self.markers.values())
+
+    def check_conflict(self):
+        """粗略判断参与合并的各来源的版本要求能否同时满足"""
+        combined = self.combined_specifier()
+        specs = list(combined)
+        # 只有一个来源限定了版本时不存在来源之间的冲突
+        constrained = [source for source in self.active_sources() if self.specifiers[source]]
+        if len(constrained) < 2 or all(spec.operator in _OPEN_ENDED_OPERATORS for spec in specs):
+            self.conflict = ''
+            return self.conflict
+
+        # 用各要求中出现过的版本作为候选，检查是否存在同时满足的版本
+        candidates = []
+        for spec in specs:
+            try:
+                candidates.append(Version(spec.version.rstrip('.*')))
+            except InvalidVersion:
+                continue
+        if candidates and not any(combined.contains(v, prereleases=True) for v in candidates):
+            details = ', '.join(f'{src}: {self.specifiers[src] or "任意"}' for src in self.active_sources())
+            self.conflict = f'版本要求冲突 ({details})'
+        else:
+            self.conflict = ''
+        return self.conflict
+
+    def compare_installed(self, version, marker_env=None):
+        """已安装版本是否同时满足参与合并的各来源的要求"""
+        if self.direct:
+            return VERSION_OK
+        return compare_version(self.combined_specifier(marker_env), version)
+
+    def display_name(self):
+        if self.direct:
+            return self.direct.display_name()
+        if self.extras:
+            return f"{self.name}[{','.join(sorted(self.extras))}]"
+        return self.name
+
+    def display_required(self):
+        """表格中显示的版本要求，格式与单文件模式一致"""
+        if self.direct:
+            return self.direct.display_required()
+        required = str(self.combined_specifier()) or "任意"
+        marker = self.common_marker()
+        if marker:
+            required = f"{required} ; {marker}" if required != "任意" else f"; {marker}"
+        return required
+
+    def to_spec(self):
+        """生成合并后的需求字符串"""
+        if self.direct:
+            return self.direct.to_spec()
+        spec = self.display_name() + str(self.combined_specifier())
+        marker = self.common_marker()
+        if marker:
+            spec += f'; {marker}'
+        return spec
+
+    def install_args(self):
+        if self.direct:
+            return self.direct.install_args()
+        return [self.to_spec()]
+
+    def file_line(self):
+        if self.direct:
+            return self.direct.file_line()
+        return self.to_spec()
+
+
+def aggregate_requirements(files, comfy_root, max_workers=8, marker_env=None):
+    """并行解析多个需求文件并合并为去重后的依赖列表（保持首次出现的顺序）
+
+    marker_env 为目标解释器的环境标记，按它筛选参与合并版本要求的来源。
+    返回 (依赖列表, 解析错误列表)；错误为 (文件, 行号, 说明)，文件即所属节点包中的需求文件。
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        parsed = list(executor.map(_parse_safe, files))
+
+    merged = {}
+    errors = [error for _, file_errors in parsed for error in file_errors]
+    for path, (requirements, _) in zip(files, parsed):
+        source = source_label(path, comfy_root)
+        for req in requirements:
+            # 直接引用无法按版本合并，按引用本身去重
+            key = req.to_spec() if req.url else req.key
+            item = merged.get(key)
+            if item is None:
+                item = merged[key] = AggregatedRequirement(req.key, req.name, marker_env)
+            item.add(source, req)
+
+    items = list(merged.values())
+    for item in items:
+        if not item.direct:
+            item.check_conflict()
+    return items, errors
+
+
+def _parse_safe(path):
+    """解析一个节点包的需求文件，返回 (依赖列表, 解析错误列表)；无法读取的文件记为一条错误"""
+    try:
+        parsed = parse_requirements(path)
+    except RequirementParseError as e:
+        return [], [(path, 0, str(e))]
+    return parsed.requirements, parsed.errors
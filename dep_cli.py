@@ -0,0 +1,431 @@
+"""命令行入口：不依赖PyQt5，适合在脚本或无显示器的主机上批量检查、同步依赖
+
+所有子命令把结果以JSON输出到标准输出，pip的输出转到标准错误。
+退出码：0 成功；1 检查未通过或pip执行失败；2 参数或环境错误。
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from app_paths import get_cache_dir
+from installer_core import (EnvironmentState, InstallerError, install_command, install_file_command, mirror_args,
+                            pip_command, uninstall_command, write_requirements_file)
+from interpreter_probe import InterpreterProbeError
+from operation_log import OperationTimer
+from pip_output import PipPhaseTracker
+from process_runner import format_command, run_process
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_ERROR = 2
+
+
+def expected_errors():
+    """按参数/环境错误处理的异常类型；req_parser 依赖 packaging，出错时才导入"""
+    from git_cache import GitCacheError
+    from req_parser import RequirementParseError
+
+    # 需求字符串无效（InvalidRequirement）和快照文件无法读取都是 ValueError
+    return InstallerError, InterpreterProbeError, RequirementParseError, GitCacheError, OSError, ValueError
+
+
+def emit(result, args):
+    # 保持ASCII输出，不受控制台编码影响
+    text = json.dumps(result, indent=2 if args.pretty else None, sort_keys=args.pretty)
+    if args.output:
+        with open(args.output, 'w', encoding='ascii') as f:
+            f.write(text + '\n')
+    else:
+        sys.stdout.write(text + '\n')
+        sys.stdout.flush()
+
+
+def forward_output(lines, args):
+    if not args.quiet:
+        sys.stderr.write('\n'.join(lines) + '\n')
+        sys.stderr.flush()
+
+
+def run_pip(cmd, args):
+    """执行pip命令，输出转发到stderr（--quiet 时丢弃），各阶段耗时计入本次操作的计时
+
+    超过 --timeout 秒时结束pip及其子进程（如编译扩展的构建进程），按失败处理。
+    """
+    tracker = PipPhaseTracker()
+
+    def on_lines(lines):
+        tracker.feed(lines)
+        forward_output(lines, args)
+
+    result = run_process(cmd, on_lines, timeout=args.timeout)
+    for phase, seconds in tracker.finish().items():
+        args.timer.add_phase(phase, seconds)
+    args.timer.count('downloads', tracker.downloads)
+    args.timer.count('download_bytes', tracker.download_bytes)
+    if result.peak_rss is not None:
+        args.timer.fields['peak_rss'] = max(args.timer.fields.get('peak_rss', 0), result.peak_rss)
+    args.timer.fields['mirror'] = getattr(args, 'mirror', '')
+    info = {'command': format_command(cmd)}
+    info.update(result.to_dict())
+    if result.timed_out:
+        info['returncode'] = None
+        info['error'] = f'pip 执行超过 {args.timeout} 秒，已结束'
+    else:
+        info['error'] = result.stderr_text.strip() if result.returncode != 0 else ''
+    return info
+
+
+def run_plan(cmd, state, requirements, args):
+    """用pip试运行生成变更计划（需要pip 22.2及以上）"""
+    from install_plan import PlanJob, supports_report
+
+    if state.interpreter is None or not supports_report(state.interpreter.pip_version):
+        raise InstallerError("目标环境的pip低于22.2或未安装，无法生成安装计划")
+    job = PlanJob('sync', cmd, state.python_dir, state.installed_index, [req.key for req in requirements if req.key])
+    job.timeout = args.timeout
+    success, message = job.run(lambda job, lines: forward_output(lines, args))
+    if not success:
+        raise InstallerError(message)
+    return job.plan.to_dict()
+
+
+def prepare_git_wheels(state, requirements, args, result):
+    """把 git+ 依赖解析到提交并从缓存取得或构建wheel，返回 依赖地址 -> 需求字符串
+
+    --no-git-cache 或没有 git+ 依赖时返回空字典；每个依赖的处理结果写入 result['git_wheels']。
+    """
+    from git_cache import GitWheelBuilder, GitWheelCache, cacheable_requirements
+
+    if args.no_git_cache or not cacheable_requirements(requirements):
+        return {}
+    if state.interpreter is None:
+        from interpreter_probe import InterpreterProbeError, probe_interpreter
+        try:
+            state.interpreter = probe_interpreter(state.python_exe)
+        except InterpreterProbeError as e:
+            raise InstallerError(f"无法探测目标解释器的wheel标签: {e}")
+    builder = GitWheelBuilder(GitWheelCache(), pip_command(state.python_exe), state.interpreter.tags,
+                              mirror_args(args.mirror), timeout=args.timeout)
+    with args.timer.phase('git_build'):
+        prebuilt = builder.prepare(requirements, lambda lines: forward_output(lines, args))
+    args.timer.count('git_cached', sum(1 for item in builder.report if item['action'] == 'cached'))
+    args.timer.count('git_built', sum(1 for item in builder.report if item['action'] == 'built'))
+    result['git_wheels'] = builder.report
+    return prebuilt
+
+
+def env_info(state):
+    info = {'python': state.python_exe, 'python_dir': state.python_dir}
+    if state.interpreter is not None:
+        info['interpreter'] = state.interpreter.to_dict()
+    return info
+
+
+def cmd_check(args):
+    state = EnvironmentState(args.python, args.requirements, timer=args.timer).scan()
+    result = env_info(state)
+    result.update({
+        'requirements': args.requirements,
+        'ok': not state.unsatisfied(),
+        'summary': state.summary(),
+        'rows': state.rows,
+        'parse_errors': [{'file': f, 'line': n, 'message': msg} for f, n, msg in state.errors],
+    })
+    return result, EXIT_OK if result['ok'] else EXIT_FAILED
+
+
+def cmd_sync(args):
+    """只安装适用于目标环境但缺失或版本不满足要求的依赖，完成后重新检查
+
+    是否满足要求在本地按版本要求和环境标记判断，全部满足时不会启动pip。
+    """
+    state = EnvironmentState(args.python, args.requirements, timer=args.timer).scan()
+    unsatisfied = state.unsatisfied()
+    result = env_info(state)
+    result.update({'requirements': args.requirements, 'to_install': [req.to_spec() for req in unsatisfied]})
+    if not unsatisfied:
+        result.update({'ok': True, 'changed': False, 'summary': state.summary()})
+        return result, EXIT_OK
+
+    # 写成一个需求文件交给pip；单文件模式保留原文件中的选项（如 --find-links）和约束
+    parsed = None
+    if os.path.isfile(args.requirements):
+        from req_parser import parse_requirements
+        parsed = parse_requirements(args.requirements)
+    # 只列出将要安装的依赖时不需要构建git依赖
+    prebuilt = prepare_git_wheels(state, unsatisfied, args, result) if args.plan or not args.dry_run else {}
+    with tempfile.TemporaryDirectory(dir=get_cache_dir()) as work_dir:
+        req_file = write_requirements_file(unsatisfied, os.path.join(work_dir, 'requirements.txt'), parsed,
+                                           prebuilt)
+        cmd = install_file_command(pip_command(state.python_exe), req_file, mirror_args(args.mirror))
+        if args.plan:
+            with args.timer.phase('plan'):
+                result['plan'] = run_plan(cmd, state, unsatisfied, args)
+        if args.dry_run:
+            result.update({'ok': True, 'changed': False, 'summary': state.summary()})
+            return result, EXIT_OK
+        result['pip'] = run_pip(cmd, args)
+
+    state.scan()
+    result.update({
+        'ok': result['pip']['returncode'] == 0 and not state.unsatisfied(),
+        'changed': True,
+        'summary': state.summary(),
+        'still_unsatisfied': [req.to_spec() for req in state.unsatisfied()],
+    })
+    return result, EXIT_OK if result['ok'] else EXIT_FAILED
+
+
+def cmd_install(args):
+    state = EnvironmentState(args.python, timer=args.timer)
+    pip_cmd = pip_command(state.python_exe)
+    result = env_info(state)
+    if args.requirement_file:
+        cmd = install_file_command(pip_cmd, args.requirement_file, mirror_args(args.mirror))
+    else:
+        from req_parser import parse_requirement_line
+        requirements = [parse_requirement_line(spec) for spec in args.packages]
+        prebuilt = prepare_git_wheels(state, requirements, args, result)
+        cmd = install_command(pip_cmd, requirements, mirror_args(args.mirror), prebuilt)
+    result['pip'] = run_pip(cmd, args)
+    result['ok'] = result['pip']['returncode'] == 0
+    return result, EXIT_OK if result['ok'] else EXIT_FAILED
+
+
+def dependents_report(graph, names):
+    """被卸载的包 -> 仍依赖它的其他已安装包（同一批卸载的包不计入）"""
+    from env_scanner import normalize_name
+
+    removing = {normalize_name(name) for name in names}
+    report = {}
+    for name in names:
+        users = graph.dependents_of(normalize_name(name), exclude=removing)
+        if users:
+            report[name] = [graph.display_name(user) for user in users]
+    return report
+
+
+def cmd_uninstall(args):
+    """卸载前检查依赖关系：还有其他包依赖要卸载的包时，除非指定 --force，否则不执行"""
+    state = EnvironmentState(args.python, timer=args.timer).scan(probe=True)
+    cmd, names = uninstall_command(pip_command(state.python_exe), args.packages)
+    result = env_info(state)
+    result['packages'] = names
+    result['dependents'] = dependents_report(state.graph(), names)
+    if result['dependents'] and not args.force:
+        result['ok'] = False
+        result['error'] = '仍有其他已安装的包依赖这些包，使用 --force 强制卸载'
+        return result, EXIT_FAILED
+    result['pip'] = run_pip(cmd, args)
+    result['ok'] = result['pip']['returncode'] == 0
+    return result, EXIT_OK if result['ok'] else EXIT_FAILED
+
+
+def cmd_verify(args):
+    """检查已安装的包之间的依赖是否一致，相当于 pip check，但直接读取元数据、不启动pip"""
+    start = time.perf_counter()
+    state = EnvironmentState(args.python, timer=args.timer).scan(probe=True)
+    problems = state.graph().check()
+    result = env_info(state)
+    result.update({
+        'ok': not problems,
+        'packages': len(state.distributions),
+        'problems': [problem.to_dict() for problem in problems],
+        'seconds': round(time.perf_counter() - start, 3),
+    })
+    return result, EXIT_OK if result['ok'] else EXIT_FAILED
+
+
+def cmd_orphans(args):
+    """列出（或一次卸载）孤立的依赖：不是直接安装的、也没有其他包依赖的包"""
+    state = EnvironmentState(args.python, args.requirements, timer=args.timer).scan(probe=True)
+    roots = [req.key for req in state.requirements if req.key]
+    graph = state.graph()
+    orphans = [graph.display_name(key) for key in graph.orphans(roots)]
+    result = env_info(state)
+    result['orphans'] = orphans
+    if not orphans or not args.remove:
+        result.update({'ok': True, 'changed': False})
+        return result, EXIT_OK
+    cmd, _ = uninstall_command(pip_command(state.python_exe), orphans)
+    result['pip'] = run_pip(cmd, args)
+    result.update({'ok': result['pip']['returncode'] == 0, 'changed': True})
+    return result, EXIT_OK if result['ok'] else EXIT_FAILED
+
+
+def cmd_snapshot(args):
+    """导出环境中已安装的包及版本（只读文件系统，不启动目标解释器）
+
+    指定 --lock 时另外写入锁文件（含来源和 RECORD 摘要），供 restore 使用。
+    """
+    state = EnvironmentState(args.python, timer=args.timer).scan(probe=bool(args.lock))
+    result = env_info(state)
+    result.update({
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'packages': dict(sorted(state.installed_index.items())),
+    })
+    if args.lock:
+        from env_lock import EnvironmentLock
+        with args.timer.phase('lock'):
+            lock = EnvironmentLock.capture(state.site_dirs, state.python_exe, state.interpreter.best_tag)
+            result['lock'] = lock.save(args.lock)
+    return result, EXIT_OK
+
+
+def cmd_restore(args):
+    """把环境恢复到快照：只安装新增和版本变化的包、卸载多出来的包
+
+    安装在一个pip进程中完成（--no-deps，不需要解析依赖），本地仓库有所需文件时优先使用。
+    """
+    from env_lock import EnvironmentLock, restore_commands, restore_source_args, write_restore_file
+    from wheelhouse import Wheelhouse
+
+    lock = EnvironmentLock.load(args.lock)
+    state = EnvironmentState(args.python, timer=args.timer).prepare(probe=True)
+    with args.timer.phase('diff'):
+        diff = lock.diff(state.site_dirs)
+    result = env_info(state)
+    result.update({'lock': args.lock, 'summary': diff.summary(), 'diff': diff.to_dict()})
+    if lock.target and lock.target != state.interpreter.best_tag:
+        result['warning'] = f'快照来自不同的解释器（{lock.target}），部分版本可能无法安装'
+    if diff.is_empty() or args.dry_run:
+        result.update({'ok': True, 'changed': False})
+        return result, EXIT_OK
+
+    source_args = restore_source_args(diff, Wheelhouse(), mirror_args(args.mirror), state.interpreter.tags)
+    result['pip'] = []
+    with tempfile.TemporaryDirectory(dir=get_cache_dir()) as work_dir:
+        req_file = write_restore_file(diff, os.path.join(work_dir, 'restore.txt'))
+        for cmd in restore_commands(pip_command(state.python_exe), diff, req_file, source_args):
+            result['pip'].append(run_pip(cmd, args))
+            if result['pip'][-1]['returncode'] != 0:
+                break
+
+    remaining = lock.diff(state.site_dirs)
+    result.update({
+        'ok': all(run['returncode'] == 0 for run in result['pip']) and remaining.is_empty(),
+        'changed': True,
+        'remaining': remaining.to_dict(),
+    })
+    return result, EXIT_OK if result['ok'] else EXIT_FAILED
+
+
+def cmd_compare(args):
+    """并行扫描多个环境，按需求（或全部已安装的包）逐行比较各环境的版本；存在差异时退出码为 1"""
+    from env_compare import EnvironmentComparison, scan_environments
+    from installer_core import load_requirements
+
+    requirements = None
+    if args.requirements:
+        with args.timer.phase('parse'):
+            requirements, errors, _ = load_requirements(args.requirements)
+    with args.timer.phase('scan'):
+        results = scan_environments(args.python, max_workers=args.workers)
+    with args.timer.phase('rows'):
+        comparison = EnvironmentComparison(results, requirements)
+    result = comparison.to_dict()
+    if args.requirements:
+        result['parse_errors'] = [{'file': f, 'line': n, 'message': msg} for f, n, msg in errors]
+    if args.drift_only:
+        result['rows'] = [row for row in result['rows'] if row['drift']]
+    failed = [env['python'] for env in result['environments'] if env['packages'] == 0 and env['error']]
+    result.update({'requirements': args.requirements, 'ok': not result['drift'] and not failed})
+    if failed:
+        result['failed'] = failed
+    return result, EXIT_OK if result['ok'] else EXIT_FAILED
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='dep_cli',
+        description='ComfyUI依赖安装工具的命令行版本，结果以JSON输出',
+    )
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-p', '--python', required=True, help='Python环境目录或解释器路径')
+    common.add_argument('-o', '--output', help='把JSON结果写入文件而不是标准输出')
+    common.add_argument('--pretty', action='store_true', help='格式化JSON输出')
+    common.add_argument('-q', '--quiet', action='store_true', help='不转发pip的输出')
+    common.add_argument('--timeout', type=float, help='每次pip调用的超时（秒），超时后结束pip及其子进程')
+    mirror = argparse.ArgumentParser(add_help=False)
+    mirror.add_argument('-i', '--mirror', default='', help='pip镜像地址（simple索引）')
+    git_cache = argparse.ArgumentParser(add_help=False)
+    git_cache.add_argument('--no-git-cache', action='store_true',
+                           help='git+ 依赖直接交给pip安装，不使用按提交缓存的wheel')
+
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    check = sub.add_parser('check', parents=[common], help='检查需求是否都已安装且版本满足要求')
+    check.add_argument('-r', '--requirements', required=True, help='requirements.txt 或 ComfyUI 根目录')
+    check.set_defaults(func=cmd_check)
+
+    sync = sub.add_parser('sync', parents=[common, mirror, git_cache], help='安装缺失或版本不满足要求的依赖')
+    sync.add_argument('-r', '--requirements', required=True, help='requirements.txt 或 ComfyUI 根目录')
+    sync.add_argument('-n', '--dry-run', action='store_true', help='只列出将要安装的依赖')
+    sync.add_argument('--plan', action='store_true',
+                      help='先用pip试运行生成变更计划（新增/升级/降级及下载大小，需要pip 22.2+）')
+    sync.set_defaults(func=cmd_sync)
+
+    install = sub.add_parser('install', parents=[common, mirror, git_cache], help='安装指定的包')
+    install.add_argument('packages', nargs='*', help='需求字符串，如 "numpy>=1.24"')
+    install.add_argument('-r', '--requirement-file', help='直接安装一个需求文件')
+    install.set_defaults(func=cmd_install)
+
+    uninstall = sub.add_parser('uninstall', parents=[common], help='卸载指定的包')
+    uninstall.add_argument('packages', nargs='+', help='包名')
+    uninstall.add_argument('--force', action='store_true', help='即使还有其他包依赖它们也卸载')
+    uninstall.set_defaults(func=cmd_uninstall)
+
+    verify = sub.add_parser('verify', parents=[common], help='检查已安装包之间的依赖是否一致（相当于 pip check）')
+    verify.set_defaults(func=cmd_verify)
+
+    orphans = sub.add_parser('orphans', parents=[common], help='列出孤立的依赖包')
+    orphans.add_argument('-r', '--requirements', help='需求文件或ComfyUI目录，其中列出的包不视为孤立')
+    orphans.add_argument('--remove', action='store_true', help='在一次pip调用中卸载全部孤立包')
+    orphans.set_defaults(func=cmd_orphans)
+
+    snapshot = sub.add_parser('snapshot', parents=[common], help='导出已安装包的列表')
+    snapshot.add_argument('-l', '--lock', help='同时写入锁文件（准确版本、来源和 RECORD 摘要）')
+    snapshot.set_defaults(func=cmd_snapshot)
+
+    restore = sub.add_parser('restore', parents=[common, mirror], help='按锁文件把环境恢复到快照时的状态')
+    restore.add_argument('-l', '--lock', required=True, help='snapshot --lock 生成的锁文件')
+    restore.add_argument('-n', '--dry-run', action='store_true', help='只列出差异，不修改环境')
+    restore.set_defaults(func=cmd_restore)
+
+    # 多个 -p，不能使用 common 中的单个 -p
+    compare = sub.add_parser('compare', help='并行扫描多个环境并比较各包的版本')
+    compare.add_argument('-p', '--python', action='append', required=True,
+                         help='Python环境目录或解释器路径，可重复指定')
+    compare.add_argument('-r', '--requirements', help='只比较需求文件或ComfyUI目录中的依赖')
+    compare.add_argument('--drift-only', action='store_true', help='只输出版本不一致的包')
+    compare.add_argument('-j', '--workers', type=int, help='扫描线程数，默认为CPU核数')
+    compare.add_argument('-o', '--output', help='把JSON结果写入文件而不是标准输出')
+    compare.add_argument('--pretty', action='store_true', help='格式化JSON输出')
+    compare.add_argument('-q', '--quiet', action='store_true', help='不转发pip的输出')
+    compare.set_defaults(func=cmd_compare)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'install' and not args.packages and not args.requirement_file:
+        parser.error('install 需要指定包名或 -r 需求文件')
+    # 每次执行记录一条操作日志（JSONL），各阶段耗时同时附在结果中
+    args.timer = OperationTimer(args.command, env=args.python)
+    try:
+        result, code = args.func(args)
+    except expected_errors() as e:
+        # 需求文件无法解析、环境不存在等按参数/环境错误处理；其他异常是程序错误，保留完整的调用栈
+        result, code = {'ok': False, 'error': str(e), 'error_type': type(e).__name__}, EXIT_ERROR
+    result['command'] = args.command
+    result['timings'] = args.timer.finish(ok=code == EXIT_OK, source=getattr(args, 'requirements', None))['phases']
+    emit(result, args)
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
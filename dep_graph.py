@@ -0,0 +1,173 @@
+from env_scanner import normalize_name
+
+# 卸载和清理孤立包时始终保留的基础工具
+PROTECTED_PACKAGES = {'pip', 'setuptools', 'wheel'}
+
+# Requires-Dist 字符串 -> (包名, 规范化包名, 版本要求, 环境标记)；同一字符串在进程内只解析一次
+_requirement_cache = {}
+
+
+def parse_requires_dist(text):
+    """解析一条 Requires-Dist，无法解析时返回None"""
+    parsed = _requirement_cache.get(text)
+    if parsed is None:
+        from packaging.requirements import InvalidRequirement, Requirement
+        try:
+            req = Requirement(text)
+        except InvalidRequirement:
+            parsed = False
+        else:
+            parsed = (req.name, normalize_name(req.name), req.specifier, req.marker)
+        _requirement_cache[text] = parsed
+    return parsed or None
+
+
+class DependencyProblem:
+    """一处不一致：某个包的依赖未安装或版本不满足要求（与 pip check 报告的问题相同）"""
+
+    def __init__(self, name, version, requirement, dep_name, installed_version):
+        self.name = name
+        self.version = version
+        self.requirement = requirement
+        self.dep_name = dep_name
+        self.installed_version = installed_version
+
+    def describe(self):
+        if self.installed_version is None:
+            return f"{self.name} {self.version} 需要 {self.requirement}，但未安装"
+        return f"{self.name} {self.version} 需要 {self.requirement}，但已安装的是 {self.dep_name} {self.installed_version}"
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'version': self.version,
+            'requirement': self.requirement,
+            'installed_version': self.installed_version,
+        }
+
+
+class DependencyGraph:
+    """目标环境中已安装的包之间的依赖关系，由各分布元数据中的 Requires-Dist 构建
+
+    与 pip check 一样只考虑不带 extra 的依赖；环境标记按目标解释器求值。
+    distributions 为 env_scanner.scan_distributions 的结果，update() 只重新处理有变化的包。
+    """
+
+    def __init__(self, marker_env=None):
+        self.marker_env = marker_env
+        self.distributions = {}
+        self.requires = {}  # 包 -> [(依赖的规范化包名, 要求字符串, 版本要求)]
+        self.dependents = {}  # 包 -> 依赖它的包的集合
+        self._marker_results = {}
+
+    @classmethod
+    def build(cls, distributions, marker_env=None):
+        graph = cls(marker_env)
+        graph.update(distributions)
+        return graph
+
+    def update(self, distributions):
+        """按新的分布列表增量更新，返回重新处理的包数"""
+        changed = 0
+        for key in [key for key in self.distributions if key not in distributions]:
+            self._remove(key)
+            changed += 1
+        for key, info in distributions.items():
+            old = self.distributions.get(key)
+            if old is not None and old['version'] == info['version'] and old['requires'] == info['requires']:
+                self.distributions[key] = info
+                continue
+            if old is not None:
+                self._remove(key)
+            self._add(key, info)
+            changed += 1
+        return changed
+
+    def _marker_applies(self, marker):
+        text = str(marker)
+        result = self._marker_results.get(text)
+        if result is None:
+            from packaging.markers import UndefinedEnvironmentName
+            environment = dict(self.marker_env or {})
+            environment['extra'] = ''
+            try:
+                result = marker.evaluate(environment)
+            except UndefinedEnvironmentName:
+                result = True
+            self._marker_results[text] = result
+        return result
+
+    def _add(self, key, info):
+        self.distributions[key] = info
+        edges = []
+        for text in info['requires']:
+            parsed = parse_requires_dist(text)
+            if parsed is None:
+                continue
+            name, dep_key, specifier, marker = parsed
+            if marker is not None and not self._marker_applies(marker):
+                continue
+            edges.append((dep_key, f'{name}{specifier}', specifier))
+            self.dependents.setdefault(dep_key, set()).add(key)
+        self.requires[key] = edges
+
+    def _remove(self, key):
+        for dep_key, _, _ in self.requires.pop(key, ()):
+            users = self.dependents.get(dep_key)
+            if users is not None:
+                users.discard(key)
+                if not users:
+                    del self.dependents[dep_key]
+        self.distributions.pop(key, None)
+
+    def display_name(self, key):
+        info = self.distributions.get(key)
+        return info['name'] if info else key
+
+    def dependents_of(self, key, exclude=()):
+        """依赖该包的已安装包（规范化包名），exclude 中的包不计入"""
+        return sorted(user for user in self.dependents.get(key, ()) if user not in exclude and user in self.distributions)
+
+    def check(self):
+        """检查每个已安装包的依赖是否都已安装且版本满足要求，返回 DependencyProblem 列表"""
+        from packaging.version import InvalidVersion, Version
+
+        problems = []
+        for key, edges in self.requires.items():
+            info = self.distributions[key]
+            for dep_key, requirement, specifier in edges:
+                dep = self.distributions.get(dep_key)
+                if dep is None:
+                    problems.append(DependencyProblem(info['name'], info['version'], requirement, dep_key, None))
+                    continue
+                if not str(specifier):
+                    continue
+                try:
+                    installed = Version(dep['version'])
+                except InvalidVersion:
+                    continue
+                if not specifier.contains(installed, prereleases=True):
+                    problems.append(DependencyProblem(
+                        info['name'], info['version'], requirement, dep['name'], dep['version']
+                    ))
+        return sorted(problems, key=lambda problem: normalize_name(problem.name))
+
+    def orphans(self, roots=()):
+        """孤立的依赖：从用户直接安装的包、roots 和基础工具出发，沿依赖关系无法到达的已安装包
+
+        只被其他孤立包依赖的包、以及互相依赖的一组包（依赖环）都会一次算出。
+        返回规范化包名列表。
+        """
+        keep = PROTECTED_PACKAGES | {normalize_name(root) for root in roots}
+        pending = [
+            key for key, info in self.distributions.items()
+            if key in keep or info.get('requested', True)
+        ]
+        reachable = set(pending)
+        while pending:
+            key = pending.pop()
+            for dep_key, _, _ in self.requires.get(key, ()):
+                if dep_key in self.distributions and dep_key not in reachable:
+                    reachable.add(dep_key)
+                    pending.append(dep_key)
+        return sorted(key for key in self.distributions if key not in reachable and key not in keep)
@@ -0,0 +1,227 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from env_scanner import find_site_packages, scan_distributions
+from installer_core import STATE_MISSING, build_row, find_python_exe, python_dir_of
+from interpreter_probe import InterpreterProbeError, probe_interpreter
+from job_queue import NO_ENV, Job
+
+# 这些目录名不足以区分环境（如 ComfyUI 便携版的 python_embeded），显示时带上上一级目录
+_GENERIC_DIR_NAMES = {'python_embeded', 'python_embedded', 'python', 'venv', '.venv', 'env', 'bin', 'scripts'}
+
+
+def environment_label(python_path):
+    """环境在表头中显示的简短名称"""
+    path = os.path.normpath(os.path.abspath(python_path))
+    if os.path.isfile(path):
+        path = os.path.dirname(path)
+    name = os.path.basename(path)
+    if name.lower() in _GENERIC_DIR_NAMES:
+        name = f'{os.path.basename(os.path.dirname(path))}/{name}'
+    return name
+
+
+def probe_environment(python_path):
+    """在父进程中定位并探测解释器（结果有缓存），得到需要扫描的 site-packages 和环境标记"""
+    result = {'python': python_path, 'label': environment_label(python_path), 'error': '',
+              'python_exe': None, 'python_dir': None, 'site_dirs': [], 'marker_env': None, 'version': '', 'tags': None}
+    python_exe = find_python_exe(python_path)
+    if python_exe is None:
+        result['error'] = f'目录中没有找到Python解释器: {python_path}'
+        return result
+    result['python_exe'] = python_exe
+    result['python_dir'] = python_path if os.path.isdir(python_path) else python_dir_of(python_exe)
+    try:
+        interpreter = probe_interpreter(python_exe)
+    except InterpreterProbeError as e:
+        # 解释器无法启动时仍可按目录布局扫描
+        result['error'] = str(e)
+        interpreter = None
+    if interpreter is not None:
+        result.update(site_dirs=interpreter.site_packages, marker_env=interpreter.marker_env,
+                      version=interpreter.version, tags=interpreter.tags)
+    result['site_dirs'] = result['site_dirs'] or find_site_packages(result['python_dir'])
+    return result
+
+
+def scan_site_dirs(python_dir, site_dirs):
+    """扫描一个环境，返回 (规范化包名 -> 版本, 规范化包名 -> 包名, 耗时)"""
+    start = time.perf_counter()
+    distributions = scan_distributions(python_dir, site_dirs)
+    index = {key: info['version'] for key, info in distributions.items()}
+    names = {key: info['name'] for key, info in distributions.items()}
+    return index, names, time.perf_counter() - start
+
+
+def scan_environments(python_paths, max_workers=None, should_stop=None):
+    """并行扫描多个环境，返回与 python_paths 顺序一致的结果列表
+
+    探测解释器主要是等待子进程；扫描有按环境的已安装包索引缓存，只重新读取有变化的条目，
+    以文件读写为主。两者都用线程并发：进程池的每个 spawn 子进程都要重新导入调用方的主模块
+    （界面程序会导入 PyQt5），启动开销远大于扫描本身。
+    """
+    with ThreadPoolExecutor(max_workers=min(8, len(python_paths)) or 1) as executor:
+        results = list(executor.map(probe_environment, python_paths))
+    targets = [result for result in results if result['python_exe']]
+    workers = min(len(targets), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        for result in targets:
+            result['index'], result['names'], result['seconds'] = scan_site_dirs(result['python_dir'],
+                                                                                  result['site_dirs'])
+        return results
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            (result, executor.submit(scan_site_dirs, result['python_dir'], result['site_dirs']))
+            for result in targets
+        ]
+        for result, future in futures:
+            if should_stop is not None and should_stop():
+                # 尚未开始的扫描不再执行，正在进行的扫描很快会结束
+                for _, pending in futures:
+                    pending.cancel()
+                break
+            try:
+                result['index'], result['names'], result['seconds'] = future.result()
+            except Exception as e:
+                result['error'] = f'扫描失败: {e}'
+    return results
+
+
+class EnvironmentComparison:
+    """多个环境的并排比较：每行一个包，每列一个环境的安装版本
+
+    指定 requirements 时按需求逐行比较，每格附带该环境中的状态（与主表格相同）；
+    否则比较所有环境中出现过的包。
+    """
+
+    def __init__(self, results, requirements=None):
+        self.results = results
+        self.requirements = requirements
+        self.rows = self._build_rows()
+
+    def scanned(self):
+        """成功扫描的环境在 results 中的位置"""
+        return [i for i, result in enumerate(self.results) if 'index' in result]
+
+    def _build_rows(self):
+        scanned = self.scanned()
+        rows = []
+        if self.requirements is not None:
+            for req in self.requirements:
+                cells = [
+                    build_row(req, self.results[i]['index'], self.results[i]['marker_env']) if i in scanned else None
+                    for i in range(len(self.results))
+                ]
+                rows.append(self._make_row(req.key, req.display_name(), req.display_required(), cells))
+            return rows
+
+        names = {}
+        for i in scanned:
+            for key, name in self.results[i]['names'].items():
+                names.setdefault(key, name)
+        for key in sorted(names):
+            cells = []
+            for i in range(len(self.results)):
+                if i not in scanned:
+                    cells.append(None)
+                    continue
+                version = self.results[i]['index'].get(key)
+                cells.append({'version': version, 'state': None if version else STATE_MISSING})
+            rows.append(self._make_row(key, names[key], '', cells))
+        return rows
+
+    @staticmethod
+    def _make_row(key, name, required, cells):
+        versions = {cell['version'] for cell in cells if cell is not None}
+        return {
+            'key': key,
+            'name': name,
+            'required': required,
+            'cells': cells,
+            # 已扫描的环境中版本不完全相同（含部分环境未安装）
+            'drift': len(versions) > 1,
+        }
+
+    def drift_rows(self):
+        return [row for row in self.rows if row['drift']]
+
+    def keys(self):
+        return [row['key'] for row in self.rows if row['key']]
+
+    def to_dict(self):
+        environments = []
+        for result in self.results:
+            info = {field: result.get(field) for field in ('python', 'label', 'version', 'error')}
+            info['packages'] = len(result.get('index', {}))
+            if 'seconds' in result:
+                info['seconds'] = round(result['seconds'], 4)
+            environments.append(info)
+        return {
+            'environments': environments,
+            'rows': [
+                {
+                    'name': row['name'],
+                    'required': row['required'],
+                    'drift': row['drift'],
+                    'versions': [cell['version'] if cell else None for cell in row['cells']],
+                    'states': [cell['state'] if cell else None for cell in row['cells']],
+                }
+                for row in self.rows
+            ],
+            'drift': len(self.drift_rows()),
+        }
+
+
+def sync_diff(source, target, remove_extra=False):
+    """让 target 环境的已安装包与 source 环境一致所需的变化（env_lock.LockDiff）
+
+    不同平台或Python版本的同一版本可能是不同的wheel，因此只比较版本和来源，不比较 RECORD 摘要；
+    remove_extra 为假时保留 target 中多出来的包。
+    """
+    from env_lock import LockDiff, read_lock_entries
+
+    diff = LockDiff.compute(read_lock_entries(source['site_dirs'], records=False),
+                            read_lock_entries(target['site_dirs'], records=False), compare_records=False)
+    if not remove_extra:
+        diff.remove = []
+    return diff
+
+
+class CompareJob(Job):
+    """在后台并行扫描多个环境并生成比较结果"""
+
+    def __init__(self, python_paths, requirements=None):
+        super().__init__(f"比较 {len(python_paths)} 个环境", NO_ENV, read_only=True)
+        self.python_paths = list(python_paths)
+        self.requirements = requirements
+        self.comparison = None
+
+    def run(self, emit_output):
+        start = time.perf_counter()
+        results = scan_environments(self.python_paths, should_stop=lambda: self.cancel_requested)
+        if self.cancel_requested:
+            return False, "已取消"
+        self.comparison = EnvironmentComparison(results, self.requirements)
+        failed = [result for result in results if 'index' not in result]
+        message = (f"扫描 {len(results) - len(failed)} 个环境用时 {time.perf_counter() - start:.2f}s，"
+                   f"{len(self.comparison.drift_rows())} 个包存在差异")
+        if failed:
+            message += f"；{len(failed)} 个环境扫描失败"
+        return True, message
+
+
+class SyncDiffJob(Job):
+    """在后台读取两个环境的已安装包并计算同步差异"""
+
+    def __init__(self, source, target, remove_extra=False):
+        super().__init__(f"计算同步差异 {target['label']} ← {source['label']}", NO_ENV, read_only=True)
+        self.source = source
+        self.target = target
+        self.remove_extra = remove_extra
+        self.diff = None
+
+    def run(self, emit_output):
+        self.diff = sync_diff(self.source, self.target, self.remove_extra)
+        return True, self.diff.summary() if not self.diff.is_empty() else "环境一致"
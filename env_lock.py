@@ -0,0 +1,335 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from app_paths import get_cache_dir
+from dep_graph import PROTECTED_PACKAGES
+from env_scanner import iter_distribution_entries, normalize_name, read_distribution
+from installer_core import install_file_command, uninstall_command
+from job_queue import CommandJob, Job
+from process_runner import format_command
+
+LOCK_VERSION = 1
+
+# 由安装方式决定、与包内容无关的元数据文件，计算 RECORD 摘要时忽略
+_INSTALL_METADATA_FILES = {'INSTALLER', 'REQUESTED', 'direct_url.json', 'RECORD'}
+
+
+def read_direct_url(dist_path):
+    """读取 PEP 610 的 direct_url.json（从URL、VCS或本地目录安装的包才有），没有时返回None"""
+    try:
+        with open(os.path.join(dist_path, 'direct_url.json'), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) and data.get('url') else None
+
+
+def source_line(name, direct_url):
+    """把 direct_url.json 还原成需求文件中的一行；VCS安装固定到当时的提交"""
+    url = direct_url['url']
+    if 'vcs_info' in direct_url:
+        vcs_info = direct_url['vcs_info']
+        commit = vcs_info.get('commit_id')
+        url = f"{vcs_info.get('vcs', 'git')}+{url}" + (f'@{commit}' if commit else '')
+        return f'{name} @ {url}'
+    if direct_url.get('dir_info', {}).get('editable'):
+        return f'-e {url}'
+    hashes = direct_url.get('archive_info', {}).get('hashes', {})
+    if 'sha256' in hashes and '#' not in url:
+        url += f"#sha256={hashes['sha256']}"
+    return f'{name} @ {url}'
+
+
+def record_digest(dist_path):
+    """RECORD 中各文件哈希的摘要：版本相同而安装的文件内容不同时摘要也不同
+
+    只取带哈希的行并排序，忽略 REQUESTED 等随安装方式变化的文件，以及 site-packages 之外的
+    文件（脚本中写有解释器路径）。
+    """
+    try:
+        with open(os.path.join(dist_path, 'RECORD'), 'r', encoding='utf-8', errors='replace') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return ''
+    dist_dir = os.path.basename(dist_path)
+    entries = []
+    for line in lines:
+        path, file_hash = _split_record_line(line)
+        if not file_hash or path.startswith('..'):
+            continue
+        folder, _, filename = path.replace('\\', '/').rpartition('/')
+        if folder == dist_dir and filename in _INSTALL_METADATA_FILES:
+            continue
+        entries.append(f'{path},{file_hash}')
+    return hashlib.sha256('\n'.join(sorted(entries)).encode('utf-8')).hexdigest()
+
+
+def _split_record_line(line):
+    """RECORD 的一行为 路径,哈希,大小；路径本身可能含逗号"""
+    head, _, _ = line.rpartition(',')
+    path, _, file_hash = head.rpartition(',')
+    return path, file_hash
+
+
+def read_lock_entries(site_dirs, records=True):
+    """读取环境中每个已安装包的锁定信息，返回 规范化包名 -> 条目
+
+    records 为假时不计算 RECORD 摘要（不比较摘要时无需读取每个包的 RECORD）。
+    """
+    entries = {}
+    for site_dir in site_dirs:
+        for entry_name in iter_distribution_entries(site_dir):
+            name, version = read_distribution(site_dir, entry_name)
+            key = normalize_name(name) if name else None
+            if not key or not version or key in entries:
+                # 与 sys.path 顺序一致，靠前的目录优先
+                continue
+            dist_path = os.path.join(site_dir, entry_name)
+            direct_url = read_direct_url(dist_path) if entry_name.endswith('.dist-info') else None
+            entries[key] = {
+                'name': name,
+                'version': version,
+                'source': source_line(name, direct_url) if direct_url else '',
+                'record_sha256': record_digest(dist_path) if records and entry_name.endswith('.dist-info') else '',
+            }
+    return entries
+
+
+def install_line(entry):
+    return entry['source'] or f"{entry['name']}=={entry['version']}"
+
+
+class LockDiff:
+    """快照与当前环境的差异：需要新增、变更版本、重新安装和卸载的包
+
+    pip、setuptools、wheel 不参与比较，恢复时保持当前版本。
+    """
+
+    def __init__(self, add, change, reinstall, remove):
+        self.add = add
+        self.change = change  # [(快照中的条目, 当前版本)]
+        self.reinstall = reinstall
+        self.remove = remove
+
+    @classmethod
+    def compute(cls, locked, live, compare_records=True):
+        """compare_records 为假时版本和来源相同即视为一致（比较不同环境时使用）"""
+        add, change, reinstall, remove = [], [], [], []
+        for key, entry in sorted(locked.items()):
+            if key in PROTECTED_PACKAGES:
+                continue
+            current = live.get(key)
+            if current is None:
+                add.append(entry)
+            elif current['version'] != entry['version']:
+                change.append((entry, current['version']))
+            elif current['source'] != entry['source'] or (
+                    compare_records and entry['record_sha256'] and current['record_sha256']
+                    and current['record_sha256'] != entry['record_sha256']):
+                # 版本相同，但来源（如VCS提交）或已安装的文件不同
+                reinstall.append(entry)
+        for key, entry in sorted(live.items()):
+            if key not in locked and key not in PROTECTED_PACKAGES:
+                remove.append(entry)
+        return cls(add, change, reinstall, remove)
+
+    def is_empty(self):
+        return not (self.add or self.change or self.reinstall or self.remove)
+
+    def install_entries(self):
+        return self.add + [entry for entry, _ in self.change] + self.reinstall
+
+    def pins(self):
+        """不带直接引用、可以从索引或本地仓库安装的 (包名, 版本)"""
+        return [(entry['name'], entry['version']) for entry in self.install_entries() if not entry['source']]
+
+    def needs_network(self):
+        """直接引用中是否有远程地址（本地文件和目录不需要网络）"""
+        return any(
+            entry['source'] and 'file:' not in entry['source']
+            for entry in self.install_entries()
+        )
+
+    def summary(self):
+        if self.is_empty():
+            return '当前环境与快照一致'
+        counts = [
+            f'{label} {len(items)}'
+            for label, items in (('新增', self.add), ('版本变更', self.change),
+                                 ('重新安装', self.reinstall), ('卸载', self.remove))
+            if items
+        ]
+        return '，'.join(counts)
+
+    def describe(self):
+        """逐包列出变化，用于确认对话框和命令行输出"""
+        lines = [f"新增 {entry['name']} {entry['version']}" for entry in self.add]
+        lines += [f"{entry['name']} {installed} → {entry['version']}" for entry, installed in self.change]
+        lines += [f"重新安装 {entry['name']} {entry['version']}" for entry in self.reinstall]
+        lines += [f"卸载 {entry['name']} {entry['version']}" for entry in self.remove]
+        return lines
+
+    def to_dict(self):
+        return {
+            'add': [install_line(entry) for entry in self.add],
+            'change': [
+                {'name': entry['name'], 'from': installed, 'to': entry['version']}
+                for entry, installed in self.change
+            ],
+            'reinstall': [install_line(entry) for entry in self.reinstall],
+            'remove': [entry['name'] for entry in self.remove],
+        }
+
+
+class EnvironmentLock:
+    """环境快照（锁文件）：记录每个已安装包的准确版本、来源和 RECORD 摘要"""
+
+    def __init__(self, packages, python='', target='', created=None):
+        self.packages = packages
+        self.python = python
+        self.target = target
+        self.created = created or time.strftime('%Y-%m-%dT%H:%M:%S')
+
+    @classmethod
+    def capture(cls, site_dirs, python='', target=''):
+        return cls(read_lock_entries(site_dirs), python, target)
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f'无法读取快照文件 {path}: {e}')
+        if data.get('lock_version') != LOCK_VERSION:
+            raise ValueError(f'不支持的快照文件格式: {path}')
+        packages = {normalize_name(entry['name']): entry for entry in data.get('packages', [])}
+        return cls(packages, data.get('python', ''), data.get('target', ''), data.get('created'))
+
+    def save(self, path):
+        tmp_file = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=1, ensure_ascii=False)
+        os.replace(tmp_file, path)
+        return path
+
+    def to_dict(self):
+        return {
+            'lock_version': LOCK_VERSION,
+            'created': self.created,
+            'python': self.python,
+            'target': self.target,
+            'packages': [self.packages[key] for key in sorted(self.packages)],
+        }
+
+    def diff(self, site_dirs):
+        """与环境的当前状态比较"""
+        return LockDiff.compute(self.packages, read_lock_entries(site_dirs))
+
+
+class SnapshotJob(Job):
+    """在后台读取环境中每个包的锁定信息（含 RECORD 摘要）并保存为锁文件"""
+
+    def __init__(self, site_dirs, path, python, target, env_key):
+        super().__init__("保存环境快照", env_key, read_only=True)
+        self.site_dirs = site_dirs
+        self.path = path
+        self.python = python
+        self.target = target
+        self.lock = None
+
+    def run(self, emit_output):
+        self.lock = EnvironmentLock.capture(self.site_dirs, self.python, self.target)
+        try:
+            self.lock.save(self.path)
+        except OSError as e:
+            return False, f"保存快照失败: {e}"
+        return True, f"已保存 {len(self.lock.packages)} 个包的快照: {self.path}"
+
+
+class LockDiffJob(Job):
+    """在后台读取快照文件并与环境的当前状态比较"""
+
+    def __init__(self, path, site_dirs, env_key):
+        super().__init__("比较环境快照", env_key, read_only=True)
+        self.path = path
+        self.site_dirs = site_dirs
+        self.lock = None
+        self.diff = None
+
+    def run(self, emit_output):
+        try:
+            self.lock = EnvironmentLock.load(self.path)
+        except ValueError as e:
+            return False, str(e)
+        self.diff = self.lock.diff(self.site_dirs)
+        return True, self.diff.summary()
+
+
+def write_restore_file(diff, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        for entry in diff.install_entries():
+            f.write(install_line(entry) + '\n')
+    return path
+
+
+def restore_source_args(diff, wheelhouse=None, source_args=(), tags=None):
+    """恢复时的下载来源：本地仓库有全部所需文件时离线安装，否则本地仓库优先、其余从镜像下载
+
+    tags 为目标解释器支持的wheel标签，仓库中与目标不兼容的wheel不算作已有。
+    """
+    if wheelhouse is None:
+        return list(source_args)
+    find_links = ['--find-links', wheelhouse.root]
+    if not diff.needs_network() and not wheelhouse.missing_distributions(diff.pins(), tags):
+        return ['--no-index'] + find_links
+    return find_links + list(source_args)
+
+
+def restore_commands(pip_cmd, diff, req_file, source_args=()):
+    """把差异应用到环境的pip命令：一次安装全部新增和变更的包，一次卸载多出来的包
+
+    快照记录的是完整的已安装集合，安装时使用 --no-deps，pip 不需要再解析依赖。
+    """
+    commands = []
+    if diff.install_entries():
+        cmd = install_file_command(pip_cmd, req_file, source_args) + ['--no-deps']
+        if diff.reinstall:
+            cmd.append('--force-reinstall')
+        commands.append(cmd)
+    if diff.remove:
+        commands.append(uninstall_command(pip_cmd, [entry['name'] for entry in diff.remove])[0])
+    return commands
+
+
+class RestoreJob(CommandJob):
+    """把差异应用到一个环境：依次执行安装和卸载命令，前一条失败时不再继续
+
+    需求文件在任务开始执行时才写入临时目录，同一环境排队的多个任务互不影响。
+    """
+
+    def __init__(self, title, pip_cmd, diff, env_key, source_args=()):
+        super().__init__(title, [], env_key)
+        self.pip_cmd = pip_cmd
+        self.diff = diff
+        self.source_args = source_args
+        # 用于在输出窗口中显示的命令（需求文件路径为占位）
+        self.preview = ' && '.join(
+            format_command(cmd) for cmd in restore_commands(pip_cmd, diff, 'restore.txt', source_args))
+
+    def display_command(self):
+        return self.preview
+
+    def run(self, emit_output):
+        success, message = True, "环境已一致"
+        with tempfile.TemporaryDirectory(dir=get_cache_dir()) as work_dir:
+            req_file = write_restore_file(self.diff, os.path.join(work_dir, 'restore.txt'))
+            for cmd in restore_commands(self.pip_cmd, self.diff, req_file, self.source_args):
+                self.cmd = cmd
+                success, message = super().run(emit_output)
+                if not success:
+                    break
+        return success, message
@@ -0,0 +1,334 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+from app_paths import get_cache_dir
+
+# PEP 503 包名规范化规则
+_NORMALIZE_RE = re.compile(r'[-_.]+')
+
+# dist-info / egg-info 目录中的元数据文件
+_METADATA_FILES = {
+    '.dist-info': 'METADATA',
+    '.egg-info': 'PKG-INFO',
+}
+
+
+def normalize_name(name):
+    """按照 PEP 503 规范化包名，用于索引查找"""
+    return _NORMALIZE_RE.sub('-', name).lower()
+
+
+def find_site_packages(python_dir):
+    """查找Python环境目录对应的site-packages目录列表"""
+    python_dir = os.path.abspath(python_dir)
+    candidates = [
+        # Windows 安装版 / 嵌入版 / venv
+        os.path.join(python_dir, 'Lib', 'site-packages'),
+        # 选择的是 venv 的 Scripts 目录
+        os.path.join(os.path.dirname(python_dir), 'Lib', 'site-packages'),
+    ]
+
+    # 类Unix布局: <prefix>/lib/pythonX.Y/site-packages，目录可能是 prefix 或 bin
+    for base in (python_dir, os.path.dirname(python_dir)):
+        lib_dir = os.path.join(base, 'lib')
+        if not os.path.isdir(lib_dir):
+            continue
+        for entry in sorted(os.listdir(lib_dir)):
+            if entry.startswith('python'):
+                candidates.append(os.path.join(lib_dir, entry, 'site-packages'))
+
+    site_dirs = []
+    for path in candidates:
+        if os.path.isdir(path) and path not in site_dirs:
+            site_dirs.append(path)
+    return site_dirs
+
+
+def _split_dist_dir_name(entry_name):
+    """从 name-version.dist-info 目录名中拆出包名和版本"""
+    stem = os.path.splitext(entry_name)[0]
+    name, sep, version = stem.partition('-')
+    if not sep:
+        return name, None
+    # egg-info 目录名可能带有 -py3.x 之类的后缀
+    return name, version.split('-')[0]
+
+
+def read_metadata_header(metadata_path, with_requires=False):
+    """读取元数据文件头部的 Name 和 Version，返回 (包名, 版本, 依赖列表)
+
+    with_requires 为真时读完整个头部并收集全部 Requires-Dist，否则读到包名和版本即停止。
+    """
+    name = version = None
+    requires = []
+    with open(metadata_path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            # 元数据头部以空行结束，后面是长描述
+            if not line.strip():
+                break
+            if line.startswith('Name:'):
+                name = line[5:].strip()
+            elif line.startswith('Version:'):
+                version = line[8:].strip()
+            elif with_requires and line.startswith('Requires-Dist:'):
+                requires.append(line[14:].strip())
+            if name and version and not with_requires:
+                break
+    return name, version, requires
+
+
+def read_egg_requires(egg_dir):
+    """把 egg-info 的 requires.txt 转成 Requires-Dist 形式（分节转为环境标记）"""
+    requires = []
+    marker = ''
+    try:
+        with open(os.path.join(egg_dir, 'requires.txt'), 'r', encoding='utf-8', errors='replace') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return requires
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('[') and line.endswith(']'):
+            # [extra]、[:环境标记] 或 [extra:环境标记]
+            extra, _, condition = line[1:-1].partition(':')
+            parts = []
+            if extra:
+                parts.append(f'extra == "{extra}"')
+            if condition:
+                parts.append(f'({condition})')
+            marker = ' and '.join(parts)
+            continue
+        requires.append(f'{line}; {marker}' if marker else line)
+    return requires
+
+
+def _metadata_path(site_dir, entry_name):
+    path = os.path.join(site_dir, entry_name)
+    if os.path.isdir(path):
+        return path, os.path.join(path, _METADATA_FILES[os.path.splitext(entry_name)[1]])
+    # 旧式安装的 egg-info 可能直接是一个 PKG-INFO 格式的文件
+    return path, path
+
+
+def _read_entry(site_dir, entry_name, with_requires):
+    """读取单个 dist-info/egg-info 条目，返回 (条目路径, 包名, 版本, 依赖列表)"""
+    path, metadata_path = _metadata_path(site_dir, entry_name)
+    name = version = None
+    requires = []
+    try:
+        name, version, requires = read_metadata_header(metadata_path, with_requires)
+    except OSError:
+        pass
+
+    # 元数据缺失或损坏时退回到目录名
+    if not name or not version:
+        dir_name, dir_version = _split_dist_dir_name(entry_name)
+        name = name or dir_name
+        version = version or dir_version
+    return path, name, version, requires
+
+
+def read_distribution(site_dir, entry_name):
+    """读取单个 dist-info/egg-info 条目，返回 (包名, 版本)"""
+    _, name, version, _ = _read_entry(site_dir, entry_name, with_requires=False)
+    return name, version
+
+
+def read_distribution_info(site_dir, entry_name):
+    """读取单个条目的包名、版本、依赖声明，以及是否由用户直接安装
+
+    pip 会在用户直接要求安装的包的 dist-info 中写入 REQUESTED 文件；
+    egg-info 没有这项记录，按直接安装处理（不会被当作孤立依赖清理）。
+    """
+    path, name, version, requires = _read_entry(site_dir, entry_name, with_requires=True)
+    if entry_name.endswith('.dist-info'):
+        requested = os.path.exists(os.path.join(path, 'REQUESTED'))
+    else:
+        requested = True
+        if os.path.isdir(path):
+            requires = read_egg_requires(path)
+    return {'name': name, 'version': version, 'requires': requires, 'requested': requested}
+
+
+def iter_distribution_entries(site_dir):
+    """遍历site-packages中的 dist-info/egg-info 条目名"""
+    try:
+        with os.scandir(site_dir) as it:
+            for entry in it:
+                if os.path.splitext(entry.name)[1] in _METADATA_FILES:
+                    yield entry.name
+    except OSError:
+        return
+
+
+def scan_site_packages(site_dirs):
+    """一次性扫描所有site-packages，返回 规范化包名 -> 版本 的索引"""
+    index = {}
+    for site_dir in site_dirs:
+        for entry_name in iter_distribution_entries(site_dir):
+            name, version = read_distribution(site_dir, entry_name)
+            if not name or not version:
+                continue
+            # 与 sys.path 顺序一致，靠前的目录优先
+            index.setdefault(normalize_name(name), version)
+    return index
+
+
+def diff_index(old, new):
+    """比较两个索引，返回 规范化包名 -> 新版本 的变化（已删除的包为 None）"""
+    changes = {key: version for key, version in new.items() if old.get(key) != version}
+    for key in old.keys() - new.keys():
+        changes[key] = None
+    return changes
+
+
+class InstalledIndexCache:
+    """按环境持久化的已安装包索引缓存
+
+    缓存以解释器路径为键，记录每个site-packages目录的mtime和条目列表（含依赖声明）；
+    刷新时只重新读取新增、删除或修改过的 dist-info/egg-info 条目。
+    """
+
+    VERSION = 2
+
+    def __init__(self, python_dir, cache_dir=None):
+        self.python_dir = os.path.normcase(os.path.abspath(python_dir))
+        self.cache_dir = cache_dir or get_cache_dir('installed_index')
+        key = hashlib.sha1(self.python_dir.encode('utf-8')).hexdigest()
+        self.cache_file = os.path.join(self.cache_dir, f'{key}.json')
+        self.site_dirs = {}
+        self.dirty = False
+        # 同一环境可能有多个只读任务同时扫描
+        self.lock = threading.Lock()
+        # 最近一次刷新重新读取的条目数，便于判断缓存是否生效
+        self.entries_read = 0
+
+    def load(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != self.VERSION or data.get('python_dir') != self.python_dir:
+            return
+        self.site_dirs = data.get('site_dirs', {})
+
+    def save(self):
+        if not self.dirty:
+            return
+        data = {
+            'version': self.VERSION,
+            'python_dir': self.python_dir,
+            'site_dirs': self.site_dirs,
+        }
+        tmp_file = f'{self.cache_file}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.cache_file)
+            self.dirty = False
+        except OSError:
+            # 缓存写入失败不影响扫描结果
+            try:
+                os.remove(tmp_file)
+            except OSError:
+                pass
+
+    def _refresh_site_dir(self, site_dir):
+        try:
+            dir_mtime = os.stat(site_dir).st_mtime_ns
+        except OSError:
+            if self.site_dirs.pop(site_dir, None) is not None:
+                self.dirty = True
+            return {}
+
+        cached = self.site_dirs.get(site_dir)
+        # 目录本身未变化时，条目列表不可能有增删，直接复用
+        if cached and cached.get('mtime') == dir_mtime:
+            return cached['entries']
+
+        old_entries = cached['entries'] if cached else {}
+        entries = {}
+        try:
+            with os.scandir(site_dir) as it:
+                for entry in it:
+                    if os.path.splitext(entry.name)[1] not in _METADATA_FILES:
+                        continue
+                    try:
+                        entry_mtime = entry.stat().st_mtime_ns
+                    except OSError:
+                        continue
+                    old = old_entries.get(entry.name)
+                    if old and old.get('mtime') == entry_mtime:
+                        entries[entry.name] = old
+                        continue
+                    info = read_distribution_info(site_dir, entry.name)
+                    info['mtime'] = entry_mtime
+                    self.entries_read += 1
+                    entries[entry.name] = info
+        except OSError:
+            pass
+
+        self.site_dirs[site_dir] = {'mtime': dir_mtime, 'entries': entries}
+        self.dirty = True
+        return entries
+
+    def refresh(self, site_dirs):
+        """增量刷新并返回 规范化包名 -> 条目信息（name/version/requires/requested）"""
+        self.entries_read = 0
+        # 不再属于该环境的目录从缓存中移除
+        for stale in set(self.site_dirs) - set(site_dirs):
+            del self.site_dirs[stale]
+            self.dirty = True
+
+        distributions = {}
+        for site_dir in site_dirs:
+            entries = self._refresh_site_dir(site_dir)
+            for info in entries.values():
+                if info['name'] and info['version']:
+                    distributions.setdefault(normalize_name(info['name']), info)
+        return distributions
+
+
+# 进程内缓存，避免每次刷新都重新加载缓存文件
+_index_caches = {}
+
+
+def get_index_cache(python_dir):
+    """获取指定环境的索引缓存对象（首次使用时从磁盘加载）"""
+    key = os.path.normcase(os.path.abspath(python_dir))
+    cache = _index_caches.get(key)
+    if cache is None:
+        cache = InstalledIndexCache(python_dir)
+        cache.load()
+        cache = _index_caches.setdefault(key, cache)
+    return cache
+
+
+def scan_distributions(python_dir, site_dirs=None):
+    """扫描已安装的所有分布，返回 规范化包名 -> 条目信息，用于构建依赖关系
+
+    返回的条目与缓存共享，调用方不要修改。
+    """
+    if not site_dirs:
+        site_dirs = find_site_packages(python_dir)
+    cache = get_index_cache(python_dir)
+    with cache.lock:
+        distributions = cache.refresh(site_dirs)
+        cache.save()
+    return distributions
+
+
+def scan_environment(python_dir, use_cache=True, site_dirs=None):
+    """扫描Python环境目录中已安装的所有包，返回 规范化包名 -> 版本
+
+    site_dirs 为解释器探测得到的 site-packages 列表；未提供时按目录布局推断。
+    """
+    if not use_cache:
+        return scan_site_packages(site_dirs or find_site_packages(python_dir))
+    return {key: info['version'] for key, info in scan_distributions(python_dir, site_dirs).items()}
@@ -0,0 +1,319 @@
+import hashlib
+import json
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit, urlunsplit
+
+from app_paths import get_cache_dir
+from job_queue import Job
+from process_runner import kill_process_tree, run_process
+
+_COMMIT_RE = re.compile(r'^[0-9a-f]{40}$')
+
+
+class GitCacheError(Exception):
+    """git 地址无法解析到提交（仓库不可访问、引用不存在等）"""
+
+
+class GitReference:
+    """git+ 需求中的仓库地址、引用（分支、标签或提交）和子目录"""
+
+    def __init__(self, repo, ref=None, subdirectory=''):
+        self.repo = repo
+        self.ref = ref
+        self.subdirectory = subdirectory
+
+    def build_url(self, commit):
+        """固定到提交的 pip 需求地址"""
+        url = f'git+{self.repo}@{commit}'
+        if self.subdirectory:
+            url += f'#subdirectory={self.subdirectory}'
+        return url
+
+
+def parse_git_url(url):
+    """把 git+https://host/repo.git@ref#egg=name&subdirectory=dir 拆成 GitReference，不是 git+ 地址时返回None"""
+    if not url or not url.startswith('git+'):
+        return None
+    parts = urlsplit(url[len('git+'):])
+    path, ref = parts.path, None
+    # 只在路径部分找 @，ssh 地址中的 git@host 属于 netloc
+    if '@' in path:
+        path, ref = path.rsplit('@', 1)
+    fragment = parse_qs(parts.fragment)
+    subdirectory = fragment.get('subdirectory', [''])[0]
+    repo = urlunsplit((parts.scheme, parts.netloc, path, parts.query, ''))
+    return GitReference(repo, ref or None, subdirectory)
+
+
+def resolve_commit(reference, timeout=60):
+    """用 git ls-remote 把分支或标签解析为提交；引用本身是完整的提交号时不访问仓库"""
+    ref = reference.ref
+    if ref and _COMMIT_RE.match(ref.lower()):
+        return ref.lower()
+    env = os.environ.copy()
+    # 需要认证的仓库不弹出输入提示，直接失败
+    env['GIT_TERMINAL_PROMPT'] = '0'
+    try:
+        result = subprocess.run(
+            ['git', 'ls-remote', reference.repo, ref or 'HEAD'],
+            capture_output=True, text=True, timeout=timeout, env=env
+        )
+    except FileNotFoundError:
+        raise GitCacheError("没有找到git命令")
+    except subprocess.TimeoutExpired:
+        raise GitCacheError(f"git ls-remote 在 {timeout} 秒内没有响应: {reference.repo}")
+    if result.returncode != 0:
+        raise GitCacheError(result.stderr.strip()[-300:] or f"无法访问仓库: {reference.repo}")
+    refs = {}
+    for line in result.stdout.splitlines():
+        commit, _, name = line.partition('\t')
+        refs[name.strip()] = commit.strip()
+    if not ref:
+        candidates = ['HEAD']
+    else:
+        # 附注标签的 ^{} 行才是标签指向的提交
+        candidates = [f'refs/tags/{ref}^{{}}', f'refs/tags/{ref}', f'refs/heads/{ref}', ref]
+    for name in candidates:
+        if name in refs:
+            return refs[name]
+    # 缩写的提交号等无法通过 ls-remote 解析
+    raise GitCacheError(f"仓库中没有找到引用 {ref}: {reference.repo}")
+
+
+def wheel_tags(filename):
+    """wheel 文件名中的全部标签（压缩的标签集如 py2.py3-none-any 会展开）"""
+    parts = filename[:-len('.whl')].split('-')
+    if len(parts) < 5:
+        return set()
+    python_tags, abi_tags, platform_tags = parts[-3:]
+    return {
+        f'{python_tag}-{abi_tag}-{platform_tag}'
+        for python_tag in python_tags.split('.')
+        for abi_tag in abi_tags.split('.')
+        for platform_tag in platform_tags.split('.')
+    }
+
+
+def wheel_requirement(path, extras=()):
+    """从本地wheel安装的需求字符串（包名[可选依赖] @ file:// 地址），可用于命令行和需求文件"""
+    name = os.path.basename(path).split('-')[0]
+    if extras:
+        name += f"[{','.join(sorted(extras))}]"
+    return f'{name} @ {Path(os.path.abspath(path)).as_uri()}'
+
+
+class GitWheelCache:
+    """git+ 依赖构建出的wheel缓存
+
+    以 仓库地址、提交和子目录 为键，同一提交的源码只构建一次；不同解释器构建出的wheel
+    （含编译扩展时标签不同）并存，安装时选用与目标环境标签兼容的文件。
+    """
+
+    INDEX_NAME = 'git_wheels.json'
+
+    def __init__(self, root=None):
+        self.root = root or get_cache_dir('git_wheels')
+        os.makedirs(self.root, exist_ok=True)
+        self.index_file = os.path.join(self.root, self.INDEX_NAME)
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data.setdefault('entries', {})
+        data.setdefault('stats', {'hits': 0, 'builds': 0})
+        return data
+
+    def _save(self, data):
+        tmp_file = f'{self.index_file}.{os.getpid()}.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp_file, self.index_file)
+
+    @staticmethod
+    def cache_key(reference, commit):
+        text = f'{reference.repo}@{commit}#{reference.subdirectory}'
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()[:24]
+
+    def lookup(self, reference, commit, tags):
+        """缓存中与目标环境标签兼容的wheel路径，没有时返回None"""
+        key = self.cache_key(reference, commit)
+        entry_dir = os.path.join(self.root, key)
+        supported = set(tags)
+        try:
+            names = sorted(name for name in os.listdir(entry_dir) if name.endswith('.whl'))
+        except OSError:
+            return None
+        for name in names:
+            if wheel_tags(name) & supported:
+                with self._lock:
+                    data = self._load()
+                    entry = data['entries'].get(key)
+                    if entry is not None:
+                        entry['last_used'] = time.time()
+                    data['stats']['hits'] += 1
+                    self._save(data)
+                return os.path.join(entry_dir, name)
+        return None
+
+    def add(self, reference, commit, wheel_file):
+        """把构建出的wheel移入缓存，返回缓存中的路径"""
+        key = self.cache_key(reference, commit)
+        entry_dir = os.path.join(self.root, key)
+        os.makedirs(entry_dir, exist_ok=True)
+        target = os.path.join(entry_dir, os.path.basename(wheel_file))
+        os.replace(wheel_file, target)
+        with self._lock:
+            data = self._load()
+            entry = data['entries'].setdefault(key, {
+                'repo': reference.repo,
+                'commit': commit,
+                'subdirectory': reference.subdirectory,
+                'files': [],
+            })
+            if os.path.basename(target) not in entry['files']:
+                entry['files'].append(os.path.basename(target))
+            entry['built'] = entry['last_used'] = time.time()
+            data['stats']['builds'] += 1
+            self._save(data)
+        return target
+
+    def usage(self):
+        with self._lock:
+            data = self._load()
+        total = 0
+        for key, entry in data['entries'].items():
+            for name in entry['files']:
+                try:
+                    total += os.path.getsize(os.path.join(self.root, key, name))
+                except OSError:
+                    pass
+        return {
+            'path': self.root,
+            'commits': len(data['entries']),
+            'total_bytes': total,
+            'hits': data['stats']['hits'],
+            'builds': data['stats']['builds'],
+        }
+
+
+def cacheable_requirements(requirements):
+    """可以走构建缓存的依赖：非可编辑安装的 git+ 地址"""
+    return [req for req in requirements if req.url and req.url.startswith('git+') and not req.editable]
+
+
+class GitWheelBuilder:
+    """把一组 git+ 依赖解析到提交，并从缓存取得或用目标环境的pip构建wheel
+
+    prebuilt 为 依赖地址 -> 从缓存wheel安装的需求字符串；解析或构建失败的依赖不在其中，
+    安装时仍按原地址交给pip。
+    """
+
+    def __init__(self, cache, pip_cmd, tags, source_args=(), timeout=None):
+        self.cache = cache
+        self.pip_cmd = pip_cmd
+        self.tags = tags
+        self.source_args = list(source_args)
+        self.timeout = timeout
+        self.prebuilt = {}
+        self.report = []
+        self.on_start = None
+
+    def prepare(self, requirements, on_lines=None, should_stop=None):
+        on_lines = on_lines or (lambda lines: None)
+        for req in cacheable_requirements(requirements):
+            if should_stop is not None and should_stop():
+                break
+            self._prepare_one(req, on_lines)
+        return self.prebuilt
+
+    def _prepare_one(self, req, on_lines):
+        reference = parse_git_url(req.url)
+        item = {'url': req.url, 'commit': None, 'wheel': None, 'action': 'direct', 'error': ''}
+        self.report.append(item)
+        try:
+            item['commit'] = commit = resolve_commit(reference)
+        except GitCacheError as e:
+            item['error'] = str(e)
+            on_lines([f'无法解析 {req.url} 的提交，直接交给pip安装: {e}'])
+            return
+        wheel = self.cache.lookup(reference, commit, self.tags)
+        if wheel is not None:
+            item['action'] = 'cached'
+            on_lines([f'{req.url} -> {commit[:12]}，使用缓存的 {os.path.basename(wheel)}'])
+        else:
+            on_lines([f'{req.url} -> {commit[:12]}，开始构建wheel'])
+            wheel, error = self._build(reference, commit, on_lines)
+            if wheel is None:
+                item['error'] = error
+                on_lines([f'构建失败，直接交给pip安装: {req.url}'])
+                return
+            item['action'] = 'built'
+        item['wheel'] = wheel
+        self.prebuilt[req.url] = wheel_requirement(wheel, req.extras)
+
+    def _build(self, reference, commit, on_lines):
+        """在缓存目录下的临时目录中执行 pip wheel --no-deps，成功后移入缓存"""
+        with tempfile.TemporaryDirectory(dir=self.cache.root) as work_dir:
+            cmd = (self.pip_cmd + ['wheel', '--no-deps', '-w', work_dir] + self.source_args
+                   + [reference.build_url(commit)])
+            result = run_process(cmd, on_lines, self.timeout, on_start=self.on_start)
+            if result.timed_out:
+                return None, f'构建超过 {self.timeout} 秒，已结束'
+            if result.returncode != 0:
+                return None, result.stderr_text[-500:]
+            wheels = [name for name in os.listdir(work_dir) if name.endswith('.whl')]
+            if len(wheels) != 1:
+                return None, f'构建结果中有 {len(wheels)} 个wheel文件'
+            return self.cache.add(reference, commit, os.path.join(work_dir, wheels[0])), ''
+
+    def summary(self):
+        counts = {action: sum(1 for item in self.report if item['action'] == action)
+                  for action in ('cached', 'built', 'direct')}
+        text = f"复用 {counts['cached']} 个、构建 {counts['built']} 个git依赖的wheel"
+        if counts['direct']:
+            text += f"，{counts['direct']} 个直接从git安装"
+        return text
+
+
+class GitWheelJob(Job):
+    """安装前在后台准备 git+ 依赖的wheel（不修改环境，可与其他只读任务并行）"""
+
+    def __init__(self, builder, requirements, env_key):
+        super().__init__(f"准备 {len(cacheable_requirements(requirements))} 个git依赖", env_key, read_only=True)
+        self.builder = builder
+        self.requirements = requirements
+        self.timeout = None
+        self.process = None
+        self._lock = threading.Lock()
+        builder.on_start = self._started
+
+    def _started(self, process):
+        with self._lock:
+            self.process = process
+        if self.cancel_requested:
+            kill_process_tree(process)
+
+    def run(self, emit_output):
+        self.builder.timeout = self.timeout
+        self.builder.prepare(self.requirements, lambda lines: emit_output(self, lines),
+                             should_stop=lambda: self.cancel_requested)
+        if self.cancel_requested:
+            return False, "已取消"
+        return True, self.builder.summary()
+
+    def cancel(self):
+        with self._lock:
+            self.cancel_requested = True
+            process = self.process
+        if process is not None:
+            kill_process_tree(process)
@@ -0,0 +1,224 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from app_paths import get_cache_dir
+from env_scanner import normalize_name
+from job_queue import CommandJob
+from pip_output import pip_version_at_least
+
+# 计划中每个包的操作
+ACTION_ADD = 'add'
+ACTION_UPGRADE = 'upgrade'
+ACTION_DOWNGRADE = 'downgrade'
+ACTION_REINSTALL = 'reinstall'
+ACTION_KEEP = 'keep'
+
+ACTION_LABELS = {
+    ACTION_ADD: '新增',
+    ACTION_UPGRADE: '升级',
+    ACTION_DOWNGRADE: '降级',
+    ACTION_REINSTALL: '重新安装',
+    ACTION_KEEP: '保持不变',
+}
+
+# pip 从 22.2 开始支持 install --dry-run --report
+MIN_REPORT_PIP_VERSION = (22, 2)
+
+
+def supports_report(pip_version):
+    """目标环境的pip能否生成安装报告"""
+    return pip_version_at_least(pip_version, MIN_REPORT_PIP_VERSION)
+
+
+def plan_command(install_cmd, report_path):
+    """在安装命令上追加试运行参数：只解析依赖并把结果写入JSON报告，不修改环境"""
+    return install_cmd + ['--dry-run', '--report', report_path]
+
+
+def format_size(size):
+    if size is None:
+        return '未知'
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.2f} GB'
+
+
+def _compare_versions(installed, planned):
+    """返回计划版本相对已安装版本的操作"""
+    from packaging.version import InvalidVersion, Version
+
+    if installed is None:
+        return ACTION_ADD
+    try:
+        old, new = Version(installed), Version(planned)
+    except InvalidVersion:
+        return ACTION_REINSTALL if installed == planned else ACTION_UPGRADE
+    if new > old:
+        return ACTION_UPGRADE
+    if new < old:
+        return ACTION_DOWNGRADE
+    return ACTION_REINSTALL
+
+
+class PlanItem:
+    """安装计划中的一个包"""
+
+    def __init__(self, name, version, installed_version, action, url='', requested=False):
+        self.name = name
+        self.key = normalize_name(name)
+        self.version = version
+        self.installed_version = installed_version
+        self.action = action
+        self.url = url
+        self.requested = requested
+        self.size = None  # 下载大小（字节），未知时为None
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'version': self.version,
+            'installed_version': self.installed_version,
+            'action': self.action,
+            'url': self.url,
+            'requested': self.requested,
+            'size': self.size,
+        }
+
+
+class InstallPlan:
+    """由 pip install --dry-run --report 的JSON报告得到的变更计划"""
+
+    def __init__(self, items):
+        self.items = items
+
+    @classmethod
+    def from_report(cls, report, installed_index, requested_keys=()):
+        """report 为解析后的JSON；requested_keys 中已满足、pip不会处理的包记为保持不变"""
+        items = []
+        for entry in report.get('install', []):
+            metadata = entry.get('metadata', {})
+            name = metadata.get('name', '')
+            version = metadata.get('version', '')
+            installed = installed_index.get(normalize_name(name))
+            items.append(PlanItem(
+                name, version, installed, _compare_versions(installed, version),
+                url=entry.get('download_info', {}).get('url', ''),
+                requested=bool(entry.get('requested')),
+            ))
+        planned = {item.key for item in items}
+        for key in requested_keys:
+            if key and key not in planned and installed_index.get(key):
+                items.append(PlanItem(key, installed_index[key], installed_index[key], ACTION_KEEP, requested=True))
+                planned.add(key)
+        return cls(items)
+
+    def changed_items(self):
+        return [item for item in self.items if item.action != ACTION_KEEP]
+
+    def by_action(self, action):
+        return [item for item in self.items if item.action == action]
+
+    def changes(self):
+        """安装成功后环境的变化：规范化包名 -> 新版本"""
+        return {item.key: item.version for item in self.changed_items()}
+
+    def download_size(self):
+        """(已知的下载总大小, 大小未知的文件数)"""
+        items = [item for item in self.changed_items() if item.url.startswith(('http://', 'https://', 'file:'))]
+        known = sum(item.size for item in items if item.size is not None)
+        return known, sum(1 for item in items if item.size is None)
+
+    def summary(self):
+        counts = [
+            f'{ACTION_LABELS[action]} {len(self.by_action(action))}'
+            for action in (ACTION_ADD, ACTION_UPGRADE, ACTION_DOWNGRADE, ACTION_REINSTALL, ACTION_KEEP)
+            if self.by_action(action)
+        ]
+        known, unknown = self.download_size()
+        text = '，'.join(counts) or '没有需要变更的包'
+        text += f'；下载约 {format_size(known)}'
+        if unknown:
+            text += f'（{unknown} 个文件大小未知）'
+        return text
+
+    def to_dict(self):
+        known, unknown = self.download_size()
+        return {
+            'items': [item.to_dict() for item in self.items],
+            'download_bytes': known,
+            'unknown_sizes': unknown,
+        }
+
+
+def _url_size(url, timeout):
+    """本地文件直接取大小，远程文件发HEAD请求读取 Content-Length；失败时返回None"""
+    # urllib 导入较慢，只在需要查询大小时导入
+    import urllib.error
+    import urllib.parse
+    import urllib.request
+
+    if url.startswith('file:'):
+        path = urllib.request.url2pathname(urllib.parse.urlparse(url).path)
+        try:
+            return os.path.getsize(path) if os.path.isfile(path) else None
+        except OSError:
+            return None
+    request = urllib.request.Request(url, method='HEAD', headers={'User-Agent': 'pip/24.0'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            length = response.headers.get('Content-Length')
+    except (OSError, urllib.error.URLError, ValueError):
+        return None
+    return int(length) if length and length.isdigit() else None
+
+
+def fetch_sizes(items, timeout=10.0, max_workers=8):
+    """并发查询计划中各文件的下载大小"""
+    items = [item for item in items if item.url.startswith(('http://', 'https://', 'file:'))]
+    if not items:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        for item, size in zip(items, executor.map(lambda item: _url_size(item.url, timeout), items)):
+            item.size = size
+
+
+class PlanJob(CommandJob):
+    """用pip的试运行解析一次安装命令，生成变更计划（不修改环境）
+
+    pip 试运行时会下载解析所需的文件，这些文件进入pip自己的缓存，确认后的安装可以直接复用。
+    完成后 plan 为 InstallPlan，install_cmd 为确认后要执行的原始命令。
+    """
+
+    def __init__(self, title, install_cmd, env_key, installed_index, requested_keys=()):
+        self.report_path = os.path.join(get_cache_dir('plans'), f'report_{os.getpid()}_{id(self)}.json')
+        super().__init__(f"生成安装计划: {title}", plan_command(install_cmd, self.report_path), env_key,
+                         read_only=True)
+        self.install_title = title
+        self.install_cmd = install_cmd
+        self.installed_index = dict(installed_index)
+        self.requested_keys = list(requested_keys)
+        self.plan = None
+
+    def run(self, emit_output):
+        try:
+            success, message = super().run(emit_output)
+            if not success:
+                return success, message
+            try:
+                with open(self.report_path, 'r', encoding='utf-8') as f:
+                    report = json.load(f)
+            except (OSError, ValueError) as e:
+                return False, f"无法读取pip生成的安装报告: {e}"
+        finally:
+            try:
+                os.remove(self.report_path)
+            except OSError:
+                pass
+        plan = InstallPlan.from_report(report, self.installed_index, self.requested_keys)
+        if not self.cancel_requested:
+            fetch_sizes(plan.changed_items())
+        self.plan = plan
+        return True, plan.summary()
@@ -0,0 +1,340 @@
+import os
+import shlex
+
+from env_scanner import find_site_packages, scan_distributions
+from interpreter_probe import InterpreterProbeError, probe_interpreter
+from job_queue import Job
+from operation_log import OperationTimer
+
+# 需求解析相关模块（依赖 packaging）在用到时才导入，界面和 snapshot 命令启动时不需要
+
+# 行状态（供CLI的JSON输出和界面共用）
+STATE_SATISFIED = 'satisfied'  # 已安装且版本满足要求
+STATE_OUTDATED = 'outdated'  # 已安装但版本过低，升级即可
+STATE_CONFLICTING = 'conflicting'  # 已安装但版本过高或被排除
+STATE_MISSING = 'missing'
+STATE_NOT_APPLICABLE = 'not_applicable'
+# 需要调用pip处理的状态
+UNSATISFIED_STATES = (STATE_MISSING, STATE_OUTDATED, STATE_CONFLICTING)
+
+
+class InstallerError(Exception):
+    """环境目录或需求文件无效等无法继续执行的错误"""
+
+
+def find_python_exe(python_path):
+    """解析Python环境目录（或解释器路径）对应的解释器，找不到时返回None
+
+    Windows环境目录中为 python.exe；其他平台兼容 venv 的 bin/python 布局。
+    """
+    if os.path.isfile(python_path):
+        return os.path.abspath(python_path)
+    candidates = ['python.exe']
+    if os.name != 'nt':
+        candidates += ['python3', 'python', os.path.join('bin', 'python3'), os.path.join('bin', 'python')]
+    for name in candidates:
+        path = os.path.join(python_path, name)
+        if os.path.isfile(path):
+            return os.path.abspath(path)
+    return None
+
+
+def python_dir_of(python_exe):
+    """解释器所在的环境目录（bin/Scripts 目录取上一级）"""
+    python_dir = os.path.dirname(os.path.abspath(python_exe))
+    if os.path.basename(python_dir).lower() in ('bin', 'scripts'):
+        return os.path.dirname(python_dir)
+    return python_dir
+
+
+# 以下函数生成的命令都是参数列表，由 process_runner 直接启动，不经过shell，
+# 路径和需求字符串中的空格、引号、< > 等字符不需要转义
+
+def pip_command(python_exe):
+    return [python_exe, '-m', 'pip']
+
+
+def mirror_args(url):
+    return ['-i', url] if url else []
+
+
+def load_requirements(req_source, marker_env=None):
+    """读取需求文件或ComfyUI目录，返回 (依赖列表, 解析错误列表, 读取过的需求文件)
+
+    目录模式下按目标环境的 marker_env 合并各节点包的版本要求。
+    """
+    from custom_nodes import aggregate_requirements, find_requirement_files
+    from req_parser import parse_requirements
+
+    if not req_source or not os.path.exists(req_source):
+        raise InstallerError(f"需求文件不存在: {req_source}")
+    if os.path.isdir(req_source):
+        # ComfyUI目录模式：合并所有节点包的需求文件
+        files = find_requirement_files(req_source)
+        if not files:
+            raise InstallerError(f"目录及其custom_nodes中没有找到requirements.txt文件: {req_source}")
+        requirements, errors = aggregate_requirements(files, req_source, marker_env=marker_env)
+        return requirements, errors, files
+    parsed = parse_requirements(req_source)
+    return parsed.requirements, parsed.errors, [path for path, _, _ in parsed.files]
+
+
+def build_row(req, installed_index, marker_env):
+    """一条依赖在目标环境中的状态：按环境标记和版本要求在本地判断，不调用pip"""
+    from req_parser import VERSION_OK, VERSION_TOO_OLD
+
+    applies = req.applies(marker_env)
+    installed_version = installed_index.get(req.key) if req.key else None
+    if not applies:
+        state = STATE_NOT_APPLICABLE
+        status = "不适用 (环境标记不匹配)"
+    elif not installed_version:
+        state = STATE_MISSING
+        status = "未安装"
+    else:
+        result = req.compare_installed(installed_version, marker_env)
+        if result == VERSION_OK:
+            state = STATE_SATISFIED
+            status = f"已满足 ({installed_version})"
+        elif result == VERSION_TOO_OLD:
+            state = STATE_OUTDATED
+            status = f"版本过低 ({installed_version})"
+        else:
+            state = STATE_CONFLICTING
+            status = f"版本不符 ({installed_version})"
+    return {
+        'name': req.display_name(),
+        'key': req.key,
+        'required': req.display_required(),
+        'spec': req.to_spec(),
+        'state': state,
+        'status': status,
+        'version': installed_version,
+        'installed': installed_version is not None,
+        'satisfied': state in (STATE_SATISFIED, STATE_NOT_APPLICABLE),
+        'applies': applies,
+        'sources': getattr(req, 'sources', []),
+        'conflict': getattr(req, 'conflict', ''),
+    }
+
+
+class EnvironmentState:
+    """一个Python环境相对于一组需求的状态：已安装索引、环境标记和逐条依赖的检查结果
+
+    各阶段（probe/scan/parse/rows/graph）的耗时记录在 timer 中，由调用方决定是否写入操作日志。
+    """
+
+    def __init__(self, python_path, req_source=None, timer=None):
+        self.python_exe = find_python_exe(python_path)
+        if self.python_exe is None:
+            raise InstallerError(f"目录中没有找到Python解释器: {python_path}")
+        self.python_dir = python_path if os.path.isdir(python_path) else python_dir_of(self.python_exe)
+        self.req_source = req_source
+        self.interpreter = None
+        self.distributions = {}
+        self.installed_index = {}
+        self.dependency_graph = None
+        self.marker_env = None
+        self.requirements = []
+        self.errors = []
+        self.rows = []
+        # 参与本次检查的需求文件和 site-packages 目录，界面据此监视变化
+        self.requirement_files = []
+        self.site_dirs = []
+        self.timer = timer or OperationTimer('environment', env=python_path)
+
+    def prepare(self, probe=None):
+        """探测解释器、扫描已安装的包并读取需求，但还不检查每条依赖
+
+        probe 为真时先探测解释器（结果有缓存），用其 site-packages 列表和环境标记；
+        默认只在需要检查依赖时探测，snapshot 等只读文件系统的操作不启动解释器。
+        """
+        if probe is None:
+            probe = bool(self.req_source)
+        if probe:
+            with self.timer.phase('probe'):
+                self.interpreter = probe_interpreter(self.python_exe)
+            self.marker_env = self.interpreter.marker_env
+        site_dirs = self.interpreter.site_packages if self.interpreter else None
+        with self.timer.phase('scan'):
+            self.site_dirs = site_dirs or find_site_packages(self.python_dir)
+            self.distributions = scan_distributions(self.python_dir, site_dirs=self.site_dirs)
+            self.installed_index = {key: info['version'] for key, info in self.distributions.items()}
+        self.timer.count('packages', len(self.distributions))
+        self.dependency_graph = None
+        if self.req_source:
+            with self.timer.phase('parse'):
+                self.requirements, self.errors, self.requirement_files = load_requirements(self.req_source,
+                                                                                           self.marker_env)
+            self.timer.count('requirements', len(self.requirements))
+        return self
+
+    def iter_row_chunks(self, chunk_size):
+        """逐块检查依赖，产出 (起始行号, 行列表)，生成的行同时追加到 rows"""
+        self.rows = []
+        for start in range(0, len(self.requirements), chunk_size):
+            with self.timer.phase('rows'):
+                rows = [
+                    build_row(req, self.installed_index, self.marker_env)
+                    for req in self.requirements[start:start + chunk_size]
+                ]
+            self.rows.extend(rows)
+            yield start, rows
+
+    def scan(self, probe=None):
+        """扫描已安装的包；指定了需求来源时同时检查每条依赖"""
+        self.prepare(probe)
+        with self.timer.phase('rows'):
+            self.rows = [build_row(req, self.installed_index, self.marker_env) for req in self.requirements]
+        return self
+
+    def graph(self):
+        """已安装包之间的依赖关系（首次使用时构建）"""
+        if self.dependency_graph is None:
+            from dep_graph import DependencyGraph
+            with self.timer.phase('graph'):
+                self.dependency_graph = DependencyGraph.build(self.distributions, self.marker_env)
+        return self.dependency_graph
+
+    def unsatisfied(self):
+        """适用于目标环境但未安装或版本不满足要求的依赖，只有这些需要交给pip"""
+        return [req for req, row in zip(self.requirements, self.rows) if row['state'] in UNSATISFIED_STATES]
+
+    def summary(self):
+        counts = {
+            STATE_SATISFIED: 0, STATE_OUTDATED: 0, STATE_CONFLICTING: 0,
+            STATE_MISSING: 0, STATE_NOT_APPLICABLE: 0,
+        }
+        for row in self.rows:
+            counts[row['state']] += 1
+        counts['total'] = len(self.rows)
+        counts['conflicts'] = sum(1 for row in self.rows if row['conflict'])
+        return counts
+
+
+class RefreshJob(Job):
+    """后台刷新依赖列表：探测解释器、扫描环境、读取需求，再逐块检查依赖
+
+    每检查完一块就调用 on_rows(job, 起始行号, 行列表)，界面可以边算边显示；
+    取消后在下一个阶段或下一块之前停止。完成后 env_state 为完整的扫描结果（含依赖关系图）。
+    各阶段耗时记录在 timer 中，界面补上填充表格的时间后写入操作日志。
+    """
+
+    CHUNK_SIZE = 100
+
+    def __init__(self, python_path, req_source, on_rows=None):
+        super().__init__("刷新依赖列表", python_path, read_only=True)
+        self.python_path = python_path
+        self.req_source = req_source
+        self.on_rows = on_rows
+        self.env_state = None
+        self.timer = OperationTimer('refresh', env=python_path, source=req_source)
+
+    def run(self, emit_output):
+        state = EnvironmentState(self.python_path, self.req_source, timer=self.timer)
+        try:
+            state.prepare(probe=True)
+        except InterpreterProbeError as e:
+            return False, str(e)
+        if self.cancel_requested:
+            return False, "已取消"
+        self.env_state = state
+        for start, rows in state.iter_row_chunks(self.CHUNK_SIZE):
+            if self.cancel_requested:
+                return False, "已取消"
+            if self.on_rows is not None:
+                self.on_rows(self, start, rows)
+        # 卸载前的依赖提示和一致性检查都用到依赖关系图，在后台提前构建
+        state.graph()
+        return True, f"已检查 {len(state.rows)} 个依赖"
+
+
+class InterpreterProbeJob(Job):
+    """在后台探测解释器并写入缓存；探测可能需要启动解释器、等待数十秒，不在界面线程中进行"""
+
+    def __init__(self, python_exe, env_key):
+        super().__init__("探测Python解释器", env_key, read_only=True)
+        self.python_exe = python_exe
+        self.interpreter = None
+
+    def run(self, emit_output):
+        try:
+            self.interpreter = probe_interpreter(self.python_exe)
+        except InterpreterProbeError as e:
+            return False, str(e)
+        return True, self.interpreter.describe()
+
+
+class InstalledIndexJob(Job):
+    """增量更新已安装包索引（只重新读取有变化的 dist-info）
+
+    完成后 index 为新索引，distributions 为对应的分布信息（用于更新依赖关系图）。
+    """
+
+    def __init__(self, python_dir, site_dirs):
+        super().__init__("更新已安装包索引", python_dir, read_only=True)
+        self.python_dir = python_dir
+        self.site_dirs = site_dirs
+        self.distributions = None
+        self.index = None
+
+    def run(self, emit_output):
+        timer = OperationTimer('index_update', env=self.python_dir)
+        with timer.phase('scan'):
+            self.distributions = scan_distributions(self.python_dir, site_dirs=self.site_dirs)
+            self.index = {key: info['version'] for key, info in self.distributions.items()}
+        timer.count('packages', len(self.index))
+        timer.finish()
+        return True, f"共 {len(self.index)} 个已安装的包"
+
+
+def install_command(pip_cmd, requirements, source_args=(), prebuilt=None):
+    """在同一个pip进程中安装多个依赖的命令；source_args 为镜像或本地仓库参数
+
+    prebuilt 为 依赖地址 -> 需求字符串，git+ 依赖改为从缓存中已构建的wheel安装（git_cache）。
+    """
+    prebuilt = prebuilt or {}
+    cmd = pip_cmd + ['install']
+    # 直接从git仓库安装不需要镜像源；改为从wheel安装时它的依赖仍要从镜像下载
+    if source_args and not all(req.is_vcs and req.url not in prebuilt for req in requirements):
+        cmd += source_args
+    for req in requirements:
+        cmd += [prebuilt[req.url]] if req.url in prebuilt else req.install_args()
+    return cmd
+
+
+# 命令中待写入的需求文件的占位参数，任务执行时替换为实际路径（job_queue.CommandJob.files）
+PENDING_REQUIREMENTS = 'pending_requirements.txt'
+
+
+def write_requirements_file(requirements, path, parsed=None, prebuilt=None):
+    """把一组依赖写成需求文件，供一次pip调用整体解析
+
+    parsed 为原需求文件的解析结果时，保留其中的pip选项，约束写入同目录的 *.constraints.txt；
+    prebuilt 与 install_command 相同。pip 按 shell 规则拆分选项行，其中的路径都加引号。
+    """
+    prebuilt = prebuilt or {}
+    lines = []
+    if parsed is not None:
+        lines += parsed.option_lines()
+        if parsed.constraints:
+            constraints_file = os.path.splitext(path)[0] + '.constraints.txt'
+            with open(constraints_file, 'w', encoding='utf-8') as f:
+                for req in parsed.constraints:
+                    f.write(req.to_spec() + '\n')
+            lines.append(f'-c {shlex.quote(constraints_file)}')
+    lines += [prebuilt[req.url] if req.url in prebuilt else req.file_line() for req in requirements]
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in lines:
+            f.write(line + '\n')
+    return path
+
+
+def install_file_command(pip_cmd, req_file, source_args=()):
+    return pip_cmd + ['install', '-r', req_file] + list(source_args)
+
+
+def uninstall_command(pip_cmd, package_names):
+    """一个 pip uninstall 进程卸载多个包的命令，包名去掉可选依赖并去重"""
+    base_packages = list(dict.fromkeys(name.split('[')[0] for name in package_names))
+    return pip_cmd + ['uninstall', '-y'] + base_packages, base_packages
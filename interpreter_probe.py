@@ -0,0 +1,223 @@
+import json
+import os
+import subprocess
+import threading
+
+from app_paths import get_cache_dir
+
+# 在目标解释器中执行的探测脚本（通过标准输入传入），一次收集所需的全部信息。
+# 只依赖标准库；wheel标签优先使用目标环境自带的pip计算。
+PROBE_SCRIPT = r'''
+import json, os, platform, sys
+impl = sys.implementation
+iv = impl.version
+implementation_version = '{0.major}.{0.minor}.{0.micro}'.format(iv)
+if iv.releaselevel != 'final':
+    implementation_version += iv.releaselevel[0] + str(iv.serial)
+marker_env = {
+    'implementation_name': impl.name,
+    'implementation_version': implementation_version,
+    'os_name': os.name,
+    'platform_machine': platform.machine(),
+    'platform_release': platform.release(),
+    'platform_system': platform.system(),
+    'platform_version': platform.version(),
+    'python_full_version': platform.python_version(),
+    'platform_python_implementation': platform.python_implementation(),
+    'python_version': '.'.join(platform.python_version_tuple()[:2]),
+    'sys_platform': sys.platform,
+}
+
+try:
+    from pip._internal.utils.compatibility_tags import get_supported
+    tags = [str(t) for t in get_supported()]
+except Exception:
+    try:
+        try:
+            from pip._vendor.packaging.tags import sys_tags
+        except Exception:
+            from packaging.tags import sys_tags
+        tags = [str(t) for t in sys_tags()]
+    except Exception:
+        tags = []
+
+pip_version = None
+try:
+    from importlib.metadata import version
+    pip_version = version('pip')
+except Exception:
+    try:
+        import pip
+        pip_version = pip.__version__
+    except Exception:
+        pass
+
+# 与 sys.path 顺序一致，包含用户目录下的 site-packages
+site_packages = [p for p in sys.path if os.path.basename(p) in ('site-packages', 'dist-packages') and os.path.isdir(p)]
+
+print(json.dumps({
+    'executable': sys.executable,
+    'version': platform.python_version(),
+    'platform': sys.platform,
+    'tags': tags,
+    'marker_env': marker_env,
+    'site_packages': site_packages,
+    'pip_version': pip_version,
+}))
+'''
+
+
+class InterpreterProbeError(Exception):
+    """解释器无法启动或探测脚本输出无效"""
+
+
+class InterpreterInfo:
+    """一次探测得到的解释器信息"""
+
+    FIELDS = ('executable', 'version', 'platform', 'tags', 'marker_env', 'site_packages', 'pip_version')
+
+    def __init__(self, python_exe, data):
+        self.python_exe = python_exe
+        self.executable = data.get('executable') or python_exe
+        self.version = data.get('version', '')
+        self.platform = data.get('platform', '')
+        self.tags = data.get('tags') or []
+        self.marker_env = data.get('marker_env')
+        self.site_packages = data.get('site_packages') or []
+        self.pip_version = data.get('pip_version')
+
+    @property
+    def best_tag(self):
+        """最优先的wheel标签，用作本地仓库清单的目标标识"""
+        return self.tags[0] if self.tags else ''
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def describe(self):
+        text = f"Python {self.version} ({self.platform})"
+        if self.pip_version:
+            text += f", pip {self.pip_version}"
+        else:
+            text += ", 未安装pip"
+        return text
+
+
+def _cache_key(python_exe):
+    return os.path.normcase(os.path.abspath(python_exe))
+
+
+def _exe_signature(python_exe, site_packages):
+    """解释器文件和 pip/__init__.py 的 (mtime, 大小)：替换或升级解释器、升级或降级pip后缓存失效
+
+    site_packages 为上次探测得到的目录，未安装pip时pip部分为None。
+    """
+    stat = os.stat(python_exe)
+    signature = [stat.st_mtime_ns, stat.st_size, None]
+    for site_dir in site_packages:
+        try:
+            pip_stat = os.stat(os.path.join(site_dir, 'pip', '__init__.py'))
+        except OSError:
+            continue
+        signature[2] = [pip_stat.st_mtime_ns, pip_stat.st_size]
+        break
+    return signature
+
+
+class InterpreterCache:
+    """按解释器路径和文件签名缓存探测结果（内存 + 磁盘）"""
+
+    def __init__(self, cache_file=None):
+        self.cache_file = cache_file or os.path.join(get_cache_dir(), 'interpreters.json')
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        tmp_file = f'{self.cache_file}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_file, self.cache_file)
+        except OSError:
+            pass
+
+    def get(self, python_exe):
+        """缓存命中且解释器文件和pip都未变化时返回 InterpreterInfo，否则返回None"""
+        with self._lock:
+            entry = self._load().get(_cache_key(python_exe))
+        if entry is None:
+            return None
+        try:
+            signature = _exe_signature(python_exe, entry['info'].get('site_packages') or [])
+        except OSError:
+            return None
+        if entry.get('signature') != signature:
+            return None
+        return InterpreterInfo(python_exe, entry['info'])
+
+    def put(self, python_exe, info):
+        try:
+            signature = _exe_signature(python_exe, info.site_packages)
+        except OSError:
+            return
+        with self._lock:
+            self._load()[_cache_key(python_exe)] = {'signature': signature, 'info': info.to_dict()}
+            self._save()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_interpreter_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = InterpreterCache()
+        return _cache
+
+
+def cached_interpreter(python_exe):
+    """只查缓存，不启动子进程"""
+    return get_interpreter_cache().get(python_exe)
+
+
+def probe_interpreter(python_exe, use_cache=True, timeout=60):
+    """探测解释器信息；结果按路径和文件签名缓存，失败时抛出 InterpreterProbeError"""
+    cache = get_interpreter_cache()
+    if use_cache:
+        info = cache.get(python_exe)
+        if info is not None:
+            return info
+    if not os.path.isfile(python_exe):
+        raise InterpreterProbeError(f"Python解释器不存在: {python_exe}")
+    try:
+        # 脚本通过标准输入传入，避免多行脚本的命令行转义问题
+        result = subprocess.run(
+            [python_exe, '-'], input=PROBE_SCRIPT, capture_output=True, text=True, timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        raise InterpreterProbeError(f"Python解释器在 {timeout} 秒内没有响应: {python_exe}")
+    except OSError as e:
+        raise InterpreterProbeError(f"测试Python环境时出错: {e}")
+    if result.returncode != 0:
+        raise InterpreterProbeError(
+            "所选Python环境可能无法正常工作，请检查是否选择了正确的Python目录\n" + result.stderr.strip()[-500:]
+        )
+    try:
+        data = json.loads(result.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        raise InterpreterProbeError(f"无法解析Python环境信息: {result.stdout.strip()[-200:]}")
+    info = InterpreterInfo(python_exe, data)
+    cache.put(python_exe, info)
+    return info
+
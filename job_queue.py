@@ -0,0 +1,267 @@
+import itertools
+import os
+import tempfile
+import threading
+import time
+
+from app_paths import get_cache_dir
+from process_runner import format_command, kill_process_tree, run_process
+
+# 任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+STATE_LABELS = {
+    QUEUED: '排队中',
+    RUNNING: '运行中',
+    SUCCEEDED: '成功',
+    FAILED: '失败',
+    CANCELLED: '已取消',
+}
+
+_job_ids = itertools.count(1)
+
+# 不属于任何一个环境的任务（镜像测速、多环境比较等）的 env_key；这类只读任务随时可以开始
+NO_ENV = None
+
+
+class Job:
+    """调度器中的一个后台任务
+
+    env_key 标识任务操作的Python环境；同一环境上的修改任务串行执行，
+    read_only 任务（扫描、下载等）之间可以并行。跨多个环境或与环境无关的任务使用 NO_ENV。
+    子类重写 run() 并返回 (是否成功, 说明)。
+    """
+
+    def __init__(self, title, env_key, read_only=False):
+        self.id = next(_job_ids)
+        self.title = title
+        self.env_key = os.path.normcase(os.path.abspath(env_key)) if env_key else NO_ENV
+        self.read_only = read_only
+        self.state = QUEUED
+        self.message = ''
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_requested = False
+        # 由界面层挂载的附加数据（如输出对话框、完成回调）
+        self.context = {}
+
+    @property
+    def finished(self):
+        return self.state in (SUCCEEDED, FAILED, CANCELLED)
+
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def run(self, emit_output):
+        raise NotImplementedError
+
+    def cancel(self):
+        """请求取消正在运行的任务，子类负责结束实际的工作"""
+        self.cancel_requested = True
+
+
+class CommandJob(Job):
+    """执行一条命令（pip install/uninstall/download 等）的任务
+
+    cmd 为参数列表，不经过shell执行；timeout 为秒数，超时后结束整个进程树。
+    files 为 命令中的占位参数 -> 写入函数(路径)：任务开始执行时才把文件写入该任务独占的临时目录
+    并替换占位参数，排队中的多个任务互不覆盖。
+    执行后 process_seconds 为命令的累计耗时，peak_rss 为峰值内存（字节）。
+    """
+
+    # 输出批次的最小发送间隔（秒）
+    OUTPUT_INTERVAL = 0.05
+
+    def __init__(self, title, cmd, env_key, read_only=False, timeout=None):
+        super().__init__(title, env_key, read_only)
+        self.cmd = cmd
+        self.timeout = timeout
+        self.files = {}
+        self.process = None
+        self.process_seconds = 0.0
+        self.peak_rss = None
+        self._lock = threading.Lock()
+
+    def display_command(self):
+        return format_command(self.cmd)
+
+    def _started(self, process):
+        with self._lock:
+            self.process = process
+        if self.cancel_requested:
+            # 取消请求在进程启动的同时到达
+            kill_process_tree(process)
+
+    def run(self, emit_output):
+        if self.cancel_requested:
+            return False, "已取消"
+        if not self.files:
+            return self._run_command(self.cmd, emit_output)
+        with tempfile.TemporaryDirectory(dir=get_cache_dir()) as work_dir:
+            paths = {name: os.path.join(work_dir, name) for name in self.files}
+            for name, write in self.files.items():
+                write(paths[name])
+            return self._run_command([paths.get(arg, arg) for arg in self.cmd], emit_output)
+
+    def _run_command(self, cmd, emit_output):
+        # 并发读取两个管道，按批次发送输出，避免逐行刷新界面
+        result = run_process(cmd, lambda lines: emit_output(self, lines), self.timeout,
+                             self.OUTPUT_INTERVAL, on_start=self._started)
+        self.process_seconds += result.seconds
+        if result.peak_rss is not None:
+            self.peak_rss = max(self.peak_rss or 0, result.peak_rss)
+
+        if self.cancel_requested:
+            return False, "已取消"
+        if result.timed_out:
+            return False, f"执行超时（超过 {self.timeout} 秒），已结束进程及其子进程"
+        if result.returncode == 0:
+            return True, "执行成功"
+        return False, f"执行失败:\n{result.stderr_text}"
+
+    def cancel(self):
+        with self._lock:
+            self.cancel_requested = True
+            process = self.process
+        if process is not None:
+            kill_process_tree(process)
+
+
+class JobScheduler:
+    """后台任务队列
+
+    任务按提交顺序调度；同一环境上的修改任务互斥且保持顺序，只读任务之间可以并行，
+    不同环境上的任务互不影响。listener 需提供 job_updated(job) 和 job_output(job, lines)，
+    两者都在工作线程中调用。
+    """
+
+    def __init__(self, listener, max_workers=4):
+        self.listener = listener
+        self._cond = threading.Condition()
+        self._queue = []
+        self._running = {}  # env_key -> [只读任务数, 是否有修改任务]
+        self._jobs = {}
+        self._stopped = False
+        self._workers = [
+            threading.Thread(target=self._worker, name=f'job-worker-{i}', daemon=True)
+            for i in range(max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, job):
+        with self._cond:
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self._cond.notify_all()
+        self.listener.job_updated(job)
+        return job
+
+    def jobs(self):
+        with self._cond:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            if job.state == QUEUED:
+                self._queue.remove(job)
+                job.state = CANCELLED
+                job.message = "已取消"
+                job.finished_at = time.time()
+                self._cond.notify_all()
+                queued = True
+            else:
+                queued = False
+        if queued:
+            self.listener.job_updated(job)
+        else:
+            job.cancel()
+        return True
+
+    def forget(self, job):
+        """从任务列表中移除一个已结束的任务"""
+        with self._cond:
+            if job.finished:
+                self._jobs.pop(job.id, None)
+
+    def remove_finished(self):
+        with self._cond:
+            for job_id in [j.id for j in self._jobs.values() if j.finished]:
+                del self._jobs[job_id]
+
+    def shutdown(self, cancel_running=True):
+        with self._cond:
+            self._stopped = True
+            running = [job for job in self._jobs.values() if job.state == RUNNING]
+            self._cond.notify_all()
+        if cancel_running:
+            for job in running:
+                job.cancel()
+
+    def _next_runnable(self):
+        """按FIFO顺序找到第一个可以开始的任务"""
+        queued_write = set()  # 排在前面、尚未开始的修改任务所在环境
+        queued_any = set()
+        for job in self._queue:
+            if job.env_key is NO_ENV and job.read_only:
+                return job
+            readers, writing = self._running.get(job.env_key, (0, False))
+            if job.read_only:
+                runnable = not writing and job.env_key not in queued_write
+            else:
+                runnable = not writing and not readers and job.env_key not in queued_any
+            if runnable:
+                return job
+            queued_any.add(job.env_key)
+            if not job.read_only:
+                queued_write.add(job.env_key)
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._stopped:
+                    job = self._next_runnable()
+                    if job is not None:
+                        break
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                self._queue.remove(job)
+                readers, writing = self._running.get(job.env_key, (0, False))
+                self._running[job.env_key] = (readers + 1, writing) if job.read_only else (readers, True)
+                job.state = RUNNING
+                job.started_at = time.time()
+            self.listener.job_updated(job)
+
+            try:
+                success, message = job.run(self.listener.job_output)
+            except Exception as e:
+                success, message = False, f"执行过程出错: {str(e)}"
+
+            with self._cond:
+                readers, writing = self._running[job.env_key]
+                if job.read_only:
+                    readers -= 1
+                else:
+                    writing = False
+                if readers or writing:
+                    self._running[job.env_key] = (readers, writing)
+                else:
+                    del self._running[job.env_key]
+                job.finished_at = time.time()
+                job.message = message
+                job.state = CANCELLED if job.cancel_requested else (SUCCEEDED if success else FAILED)
+                self._cond.notify_all()
+            self.listener.job_updated(job)
@@ -0,0 +1,208 @@
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app_paths import get_cache_dir
+from job_queue import NO_ENV, Job
+
+# pip 未指定镜像时使用的官方索引
+PYPI_SIMPLE_URL = 'https://pypi.org/simple/'
+
+# 内置镜像（名称, simple 索引地址）
+DEFAULT_MIRRORS = [
+    ('阿里云', 'https://mirrors.aliyun.com/pypi/simple/'),
+    ('清华源', 'https://pypi.tuna.tsinghua.edu.cn/simple'),
+    ('豆瓣源', 'https://pypi.doubanio.com/simple/'),
+]
+
+# 测速时请求的索引页，选择常见且页面大小适中的包
+PROBE_PACKAGES = ('pip', 'requests', 'numpy')
+
+# 测速结果缓存时间（秒）
+DEFAULT_TTL = 6 * 3600
+
+# 综合评分时假设的一次索引请求大小（字节）
+_REFERENCE_PAGE_SIZE = 200 * 1024
+
+
+class MirrorResult:
+    """单个镜像的测速结果"""
+
+    def __init__(self, url, latency=None, throughput=None, error='', timestamp=None):
+        self.url = url
+        self.latency = latency  # 首字节时间中位数（秒）
+        self.throughput = throughput  # 平均下载速度（字节/秒）
+        self.error = error
+        self.timestamp = timestamp or time.time()
+
+    @property
+    def ok(self):
+        return not self.error and self.latency is not None
+
+    def score(self):
+        """估算拉取一个典型索引页所需的时间，越小越快"""
+        if not self.ok:
+            return float('inf')
+        transfer = _REFERENCE_PAGE_SIZE / self.throughput if self.throughput else 0.0
+        return self.latency + transfer
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'latency': self.latency,
+            'throughput': self.throughput,
+            'error': self.error,
+            'timestamp': self.timestamp,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['url'], data.get('latency'), data.get('throughput'),
+                   data.get('error', ''), data.get('timestamp'))
+
+    def describe(self):
+        if not self.ok:
+            return f'不可用 ({self.error})'
+        text = f'{self.latency * 1000:.0f}ms'
+        if self.throughput:
+            text += f', {self.throughput / 1024:.0f}KB/s'
+        return text
+
+
+def _fetch_index_page(url, timeout):
+    """请求一个 simple 索引页，返回 (首字节时间, 总耗时, 字节数)"""
+    # urllib 导入较慢，界面启动时只需要镜像列表，测速时再导入
+    import urllib.request
+    request = urllib.request.Request(url, headers={
+        'Accept': 'text/html',
+        'User-Agent': 'pip/24.0 (ComfyDependencyInstaller mirror probe)',
+    })
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        first = response.read(1)
+        ttfb = time.perf_counter() - start
+        size = len(first)
+        while True:
+            chunk = response.read(64 * 1024)
+            if not chunk:
+                break
+            size += len(chunk)
+    return ttfb, time.perf_counter() - start, size
+
+
+def probe_mirror(url, packages=PROBE_PACKAGES, timeout=5.0, max_workers=None):
+    """并发请求若干包的索引页，统计镜像的延迟和吞吐量"""
+    import urllib.error
+    base = url.rstrip('/')
+    page_urls = [f'{base}/{package}/' for package in packages]
+    samples = []
+    errors = []
+
+    def fetch(page_url):
+        try:
+            return _fetch_index_page(page_url, timeout)
+        except (OSError, urllib.error.URLError, ValueError) as e:
+            errors.append(str(getattr(e, 'reason', e)))
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(page_urls)) as executor:
+        for sample in executor.map(fetch, page_urls):
+            if sample is not None:
+                samples.append(sample)
+
+    if not samples:
+        return MirrorResult(url, error=errors[0] if errors else '无响应')
+    latency = statistics.median(s[0] for s in samples)
+    total_time = sum(s[1] - s[0] for s in samples)
+    total_bytes = sum(s[2] for s in samples)
+    throughput = total_bytes / total_time if total_time > 0 else None
+    return MirrorResult(url, latency, throughput)
+
+
+def probe_mirrors(urls, packages=PROBE_PACKAGES, timeout=5.0, max_workers=8):
+    """并发测速多个镜像，返回 url -> MirrorResult"""
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+        results = executor.map(lambda url: probe_mirror(url, packages, timeout), urls)
+        return {result.url: result for result in results}
+
+
+def rank_mirrors(results):
+    """按综合评分从快到慢排序，不可用的镜像排在最后"""
+    return sorted(results.values(), key=lambda result: result.score())
+
+
+class MirrorProbeCache:
+    """带过期时间的测速结果缓存"""
+
+    def __init__(self, cache_file=None, ttl=DEFAULT_TTL):
+        self.cache_file = cache_file or os.path.join(get_cache_dir(), 'mirror_probe.json')
+        self.ttl = ttl
+
+    def load(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        results = {}
+        for item in data.get('results', []):
+            try:
+                result = MirrorResult.from_dict(item)
+            except (KeyError, TypeError):
+                continue
+            results[result.url] = result
+        return results
+
+    def save(self, results):
+        data = {'results': [result.to_dict() for result in results.values()]}
+        tmp_file = f'{self.cache_file}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.cache_file)
+        except OSError:
+            pass
+
+    def fresh_results(self, urls):
+        """返回未过期的缓存结果"""
+        now = time.time()
+        cached = self.load()
+        return {
+            url: cached[url] for url in urls
+            if url in cached and now - cached[url].timestamp < self.ttl
+        }
+
+    def get_ranked(self, urls, force=False, **probe_kwargs):
+        """返回排序后的测速结果；只对缓存中没有或已过期的镜像重新测速"""
+        urls = list(dict.fromkeys(urls))
+        results = {} if force else self.fresh_results(urls)
+        missing = [url for url in urls if url not in results]
+        if missing:
+            results.update(probe_mirrors(missing, **probe_kwargs))
+            cached = self.load()
+            cached.update(results)
+            self.save(cached)
+        return rank_mirrors(results)
+
+
+class MirrorProbeJob(Job):
+    """在任务队列中执行的镜像测速任务（只读，可与其他任务并行）"""
+
+    def __init__(self, urls, cache=None, force=False):
+        super().__init__("镜像测速", NO_ENV, read_only=True)
+        self.urls = urls
+        self.cache = cache or MirrorProbeCache()
+        self.force = force
+        self.ranked = []
+
+    def run(self, emit_output):
+        self.ranked = self.cache.get_ranked(self.urls, force=self.force)
+        emit_output(self, [f'{result.url}: {result.describe()}' for result in self.ranked])
+        if not self.ranked or not self.ranked[0].ok:
+            return False, "所有镜像均不可用"
+        return True, f"最快镜像: {self.ranked[0].url} ({self.ranked[0].describe()})"
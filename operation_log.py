@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from app_paths import get_cache_dir
+
+# 日志文件超过该大小后轮换为 operations.jsonl.1
+DEFAULT_MAX_BYTES = 5 * 1024 ** 2
+
+
+class OperationTimer:
+    """一次操作（刷新、安装、同步等）的分阶段计时和计数
+
+    phases 为 阶段 -> 秒（同名阶段累加），counters 为 计数名 -> 数值；
+    finish() 生成一条记录并写入操作日志。
+    """
+
+    def __init__(self, operation, **fields):
+        self.operation = operation
+        self.fields = fields
+        self.phases = {}
+        self.counters = {}
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.record = None
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    def add_phase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def to_dict(self, ok=True, seconds=None):
+        record = {
+            'operation': self.operation,
+            'started': round(self.started_at, 3),
+            'seconds': round(self.elapsed() if seconds is None else seconds, 4),
+            'ok': ok,
+            'phases': {name: round(seconds, 4) for name, seconds in self.phases.items()},
+            'counters': dict(self.counters),
+        }
+        record.update(self.fields)
+        return record
+
+    def finish(self, ok=True, log=None, seconds=None, **fields):
+        """结束计时并写入日志（只写一次），返回记录；seconds 可覆盖总耗时（如不含排队时间）"""
+        if self.record is None:
+            self.fields.update(fields)
+            self.record = self.to_dict(ok, seconds)
+            (log or get_operation_log()).append(self.record)
+        return self.record
+
+
+class OperationLog:
+    """JSONL格式的操作日志，每行一条 OperationTimer 记录"""
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or os.path.join(get_cache_dir('logs'), 'operations.jsonl')
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            try:
+                if os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + '.1')
+            except OSError:
+                pass
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+            except OSError:
+                # 日志写入失败不影响操作本身
+                pass
+
+    def recent(self, limit=500):
+        """最近的若干条记录（按时间顺序）"""
+        with self._lock:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    lines = f.readlines()[-limit:]
+            except OSError:
+                return []
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+        return records
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_operation_log():
+    global _log
+    with _log_lock:
+        if _log is None:
+            _log = OperationLog()
+        return _log
+
+
+def percentile(values, fraction):
+    """线性插值的百分位数，values 为空时返回None"""
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _stats(values):
+    return {
+        'count': len(values),
+        'p50': percentile(values, 0.5),
+        'p90': percentile(values, 0.9),
+        'max': max(values) if values else None,
+    }
+
+
+def summarize(records):
+    """按操作和阶段汇总耗时百分位数，并按环境、镜像汇总
+
+    返回 {'operations': {操作: {'total': 统计, 'phases': {阶段: 统计}}},
+          'environments': {环境: 统计}, 'mirrors': {镜像: {'downloads': 次数, 'bytes_per_second': 中位数}}}
+    """
+    operations = {}
+    environments = {}
+    mirrors = {}
+    for record in records:
+        operation = operations.setdefault(record.get('operation', '?'), {'total': [], 'phases': {}})
+        operation['total'].append(record.get('seconds', 0.0))
+        for name, seconds in record.get('phases', {}).items():
+            operation['phases'].setdefault(name, []).append(seconds)
+        if record.get('env'):
+            environments.setdefault(record['env'], []).append(record.get('seconds', 0.0))
+        counters = record.get('counters', {})
+        if counters.get('transfer_seconds') and counters.get('transfer_bytes'):
+            # pip 输出了原始进度时记录的是实际传输时间
+            download_seconds, download_bytes = counters['transfer_seconds'], counters['transfer_bytes']
+        else:
+            download_seconds = record.get('phases', {}).get('download')
+            download_bytes = counters.get('download_bytes')
+        if record.get('mirror') is not None and download_seconds and download_bytes:
+            mirrors.setdefault(record['mirror'] or 'PyPI', []).append(download_bytes / download_seconds)
+    return {
+        'operations': {
+            name: {
+                'total': _stats(data['total']),
+                'phases': {phase: _stats(values) for phase, values in data['phases'].items()},
+            }
+            for name, data in operations.items()
+        },
+        'environments': {env: _stats(values) for env, values in environments.items()},
+        'mirrors': {
+            mirror: {'downloads': len(values), 'bytes_per_second': percentile(values, 0.5)}
+            for mirror, values in mirrors.items()
+        },
+    }
@@ -0,0 +1,343 @@
+import re
+import time
+
+from env_scanner import normalize_name
+
+_INSTALLED_PREFIX = 'Successfully installed '
+_UNINSTALLED_PREFIX = 'Successfully uninstalled '
+
+# 标志pip进入某个阶段的输出行前缀
+_PHASE_MARKERS = (
+    ('Looking in ', 'resolve'),
+    ('Collecting ', 'resolve'),
+    ('Processing ', 'resolve'),
+    ('Obtaining ', 'resolve'),
+    ('Requirement already satisfied', 'resolve'),
+    ('Downloading ', 'download'),
+    ('Using cached ', 'download'),
+    ('Building wheel', 'build'),
+    ('Installing collected packages', 'install'),
+    ('Found existing installation', 'uninstall'),
+    ('Uninstalling ', 'uninstall'),
+)
+# “Downloading xxx.whl (12.3 MB)” 中的文件大小；pip 按 1000 进位
+_DOWNLOAD_SIZE_RE = re.compile(r'\(([\d.]+)\s*(kB|MB|GB|B)\)')
+_SIZE_UNITS = {'B': 1, 'kB': 1000, 'MB': 1000 ** 2, 'GB': 1000 ** 3}
+
+# pip 从 24.1 开始支持 --progress-bar raw：下载时每隔约0.25秒输出一行“Progress 已下载字节 of 总字节”
+MIN_RAW_PROGRESS_PIP_VERSION = (24, 1)
+_PROGRESS_RE = re.compile(r'^Progress (\d+) of (\d+)$')
+_PACKAGE_NAME_RE = re.compile(r'[A-Za-z0-9][A-Za-z0-9._-]*')
+
+# 结构化的pip输出事件
+EVENT_COLLECTING = 'collecting'
+EVENT_DOWNLOADING = 'downloading'
+EVENT_PROGRESS = 'progress'
+EVENT_BUILDING = 'building'
+EVENT_INSTALLING = 'installing'
+EVENT_DONE = 'done'
+
+
+def pip_version_at_least(pip_version, minimum):
+    """pip_version（如 "24.1.2"）是否不低于 minimum（如 (24, 1)）；未知版本视为不满足"""
+    if not pip_version:
+        return False
+    parts = []
+    for part in pip_version.split('.')[:len(minimum)]:
+        digits = ''.join(ch for ch in part if ch.isdigit())
+        parts.append(int(digits or 0))
+    return tuple(parts) >= tuple(minimum)
+
+
+def progress_command(cmd, pip_version):
+    """目标环境的pip支持时，让 install/download 命令输出可解析的下载进度"""
+    if pip_version_at_least(pip_version, MIN_RAW_PROGRESS_PIP_VERSION):
+        return cmd + ['--progress-bar', 'raw']
+    return cmd
+
+
+def split_name_version(token):
+    """把pip输出中的 name-version 拆成 (包名, 版本)；版本号中不含 '-'"""
+    name, sep, version = token.rpartition('-')
+    if not sep or not name:
+        return token, None
+    return name, version
+
+
+class PipEvent:
+    """pip输出中的一个事件
+
+    name 为包名或文件名；下载事件的 total 为文件大小（字节，未知时为None），
+    进度事件的 current/total 为已下载和总字节数；安装事件的 total 为要安装的包数。
+    """
+
+    def __init__(self, kind, name='', current=0, total=None):
+        self.kind = kind
+        self.name = name
+        self.current = current
+        self.total = total
+
+    def __repr__(self):
+        return f'PipEvent({self.kind!r}, {self.name!r}, {self.current}, {self.total})'
+
+
+def parse_line(line):
+    """把一行pip输出解析为 PipEvent，与进度无关的行返回None"""
+    line = line.strip()
+    if line.startswith('Progress '):
+        match = _PROGRESS_RE.match(line)
+        if match:
+            total = int(match.group(2))
+            return PipEvent(EVENT_PROGRESS, current=int(match.group(1)), total=total or None)
+    elif line.startswith('Collecting '):
+        match = _PACKAGE_NAME_RE.match(line[len('Collecting '):])
+        return PipEvent(EVENT_COLLECTING, match.group(0) if match else '')
+    elif line.startswith('Downloading '):
+        # 旧版本的pip在这里输出完整URL
+        target = line[len('Downloading '):].split(' ', 1)[0]
+        match = _DOWNLOAD_SIZE_RE.search(line)
+        size = int(float(match.group(1)) * _SIZE_UNITS[match.group(2)]) if match else None
+        return PipEvent(EVENT_DOWNLOADING, target.rsplit('/', 1)[-1], total=size)
+    elif line.startswith('Building wheel for '):
+        return PipEvent(EVENT_BUILDING, line[len('Building wheel for '):].split(' ', 1)[0])
+    elif line.startswith('Installing collected packages:'):
+        names = [name.strip() for name in line.split(':', 1)[1].split(',') if name.strip()]
+        return PipEvent(EVENT_INSTALLING, ', '.join(names), total=len(names))
+    elif line.startswith(_INSTALLED_PREFIX):
+        return PipEvent(EVENT_DONE)
+    return None
+
+
+def strip_progress_lines(text):
+    """去掉原始进度行，只在输出窗口中显示其余内容"""
+    if 'Progress ' not in text:
+        return text
+    return '\n'.join(line for line in text.split('\n') if not _PROGRESS_RE.match(line.strip()))
+
+
+class PipChangeCollector:
+    """从pip输出中收集实际发生的变化
+
+    changes 为 规范化包名 -> 新版本，卸载的包为 None。升级时pip先输出
+    “Successfully uninstalled 旧版本”，最后输出“Successfully installed 新版本”，
+    按出现顺序覆盖即可得到最终状态。
+    """
+
+    def __init__(self):
+        self.changes = {}
+
+    def feed(self, lines):
+        for line in lines:
+            line = line.strip()
+            if line.startswith(_INSTALLED_PREFIX):
+                for token in line[len(_INSTALLED_PREFIX):].split():
+                    name, version = split_name_version(token)
+                    if version:
+                        self.changes[normalize_name(name)] = version
+            elif line.startswith(_UNINSTALLED_PREFIX):
+                name, _ = split_name_version(line[len(_UNINSTALLED_PREFIX):].strip())
+                self.changes[normalize_name(name)] = None
+
+    def feed_text(self, text):
+        # 绝大多数输出批次不含结果行，先做一次廉价的判断
+        if 'Successfully' in text:
+            self.feed(text.splitlines())
+
+
+class PipPhaseTracker:
+    """根据pip输出推断各阶段（解析依赖、下载、构建、安装/卸载）的耗时
+
+    每遇到一个阶段标志行就切换阶段，两行之间的时间计入前一个阶段；
+    同时统计下载的文件数和字节数。
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.phase = None
+        self.phase_start = None
+        self.phases = {}
+        self.downloads = 0
+        self.download_bytes = 0
+
+    def feed(self, lines):
+        now = self.clock()
+        for line in lines:
+            line = line.strip()
+            for prefix, phase in _PHASE_MARKERS:
+                if line.startswith(prefix):
+                    self._enter(phase, now)
+                    break
+            if line.startswith('Downloading '):
+                self.downloads += 1
+                match = _DOWNLOAD_SIZE_RE.search(line)
+                if match:
+                    self.download_bytes += int(float(match.group(1)) * _SIZE_UNITS[match.group(2)])
+
+    def feed_text(self, text):
+        self.feed(text.splitlines())
+
+    def _enter(self, phase, now):
+        if phase == self.phase:
+            return
+        self._close(now)
+        self.phase = phase
+        self.phase_start = now
+
+    def _close(self, now):
+        if self.phase is not None:
+            self.phases[self.phase] = self.phases.get(self.phase, 0.0) + now - self.phase_start
+
+    def finish(self):
+        """pip结束：把最后一个阶段计到现在，返回 阶段 -> 秒"""
+        self._close(self.clock())
+        self.phase = None
+        return self.phases
+
+
+def format_duration(seconds):
+    seconds = int(seconds + 0.5)
+    if seconds >= 3600:
+        return f'{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+    return f'{seconds // 60}:{seconds % 60:02d}'
+
+
+class PipProgress:
+    """由pip输出事件估算整体进度、当前文件的传输速率和剩余时间
+
+    总下载量优先使用安装计划中的大小（expected_bytes），否则为已出现的文件大小之和。
+    只有 --progress-bar raw 的进度行能测得真实的传输时间，transfer_bytes / transfer_seconds
+    即实际的下载吞吐量；没有进度行时仍按文件完成情况推进。
+    """
+
+    # 估算剩余时间时，整体速率中最近一段的权重
+    RATE_SMOOTHING = 0.3
+
+    def __init__(self, expected_bytes=None, clock=time.perf_counter):
+        self.clock = clock
+        self.expected_bytes = expected_bytes
+        self.stage = None
+        self.collected = 0
+        self.files = 0
+        self.building = ''
+        self.installing = 0
+        self.finished = False
+        self.done_bytes = 0
+        self.announced_bytes = 0
+        self.transfer_bytes = 0
+        self.transfer_seconds = 0.0
+        self.rate = None
+        # 正在下载的文件：name, total, bytes, start, last
+        self.current = None
+
+    def feed(self, lines):
+        now = self.clock()
+        for line in lines:
+            event = parse_line(line)
+            if event is not None:
+                self.handle(event, now)
+
+    def feed_text(self, text):
+        self.feed(text.splitlines())
+
+    def handle(self, event, now=None):
+        now = self.clock() if now is None else now
+        if event.kind == EVENT_PROGRESS:
+            self._progress(event, now)
+            return
+        self._finish_download()
+        self.stage = event.kind
+        if event.kind == EVENT_COLLECTING:
+            self.collected += 1
+        elif event.kind == EVENT_DOWNLOADING:
+            self.files += 1
+            self.announced_bytes += event.total or 0
+            self.current = {'name': event.name, 'total': event.total, 'bytes': 0, 'start': None, 'last': None}
+        elif event.kind == EVENT_BUILDING:
+            self.building = event.name
+        elif event.kind == EVENT_INSTALLING:
+            self.installing = event.total
+        elif event.kind == EVENT_DONE:
+            self.finished = True
+
+    def _progress(self, event, now):
+        current = self.current
+        if current is None:
+            # 没有对应的 Downloading 行（如 pip download 的某些输出），按匿名文件处理
+            current = self.current = {'name': '', 'total': event.total, 'bytes': 0, 'start': None, 'last': None}
+            self.announced_bytes += event.total or 0
+        if current['start'] is None:
+            current['start'] = current['last'] = now
+        elif now > current['last'] and event.current > current['bytes']:
+            received = event.current - current['bytes']
+            seconds = now - current['last']
+            self.transfer_bytes += received
+            self.transfer_seconds += seconds
+            rate = received / seconds
+            self.rate = rate if self.rate is None else (
+                self.RATE_SMOOTHING * rate + (1 - self.RATE_SMOOTHING) * self.rate)
+            current['last'] = now
+        if event.total and event.total != current['total']:
+            # 进度行中是准确的字节数，Downloading 行中的大小是四舍五入后的
+            self.announced_bytes += event.total - (current['total'] or 0)
+            current['total'] = event.total
+        current['bytes'] = max(current['bytes'], event.current)
+
+    def _finish_download(self):
+        if self.current is not None:
+            self.done_bytes += self.current['total'] or self.current['bytes']
+            self.current = None
+
+    def downloaded_bytes(self):
+        return self.done_bytes + (self.current['bytes'] if self.current else 0)
+
+    def total_bytes(self):
+        return max(self.expected_bytes or 0, self.announced_bytes) or None
+
+    def fraction(self):
+        """已下载的比例（0~1），总量未知时返回None"""
+        if self.finished:
+            return 1.0
+        total = self.total_bytes()
+        if not total:
+            return None
+        return min(self.downloaded_bytes() / total, 1.0)
+
+    def file_rate(self):
+        """当前文件的平均传输速率（字节/秒）"""
+        current = self.current
+        if current is None or current['start'] is None or current['last'] <= current['start']:
+            return None
+        return current['bytes'] / (current['last'] - current['start'])
+
+    def eta(self):
+        """按最近的下载速率估算剩余的下载时间（秒）"""
+        total = self.total_bytes()
+        if not total or not self.rate:
+            return None
+        return max(total - self.downloaded_bytes(), 0) / self.rate
+
+    def describe(self):
+        """进度条旁显示的一行说明"""
+        from install_plan import format_size
+
+        if self.finished:
+            return '安装完成'
+        if self.stage == EVENT_INSTALLING:
+            return f'正在安装 {self.installing} 个包...'
+        if self.stage == EVENT_BUILDING:
+            return f'正在构建 {self.building}...'
+        if self.current is not None:
+            current = self.current
+            text = f"下载 {current['name'] or '文件'} {format_size(current['bytes'])}"
+            if current['total']:
+                text += f" / {format_size(current['total'])}"
+            rate = self.file_rate()
+            if rate:
+                text += f'（{format_size(rate)}/s）'
+            eta = self.eta()
+            if eta is not None:
+                text += f'，剩余约 {format_duration(eta)}'
+            return text
+        if self.stage == EVENT_COLLECTING:
+            return f'正在解析依赖（已收集 {self.collected} 个包）...'
+        return ''
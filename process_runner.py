@@ -0,0 +1,264 @@
+import codecs
+import collections
+import os
+import queue
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+# 单次从管道读取的最大字节数
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class OutputPump:
+    """并发读取子进程的 stdout 和 stderr，并按批次返回输出行
+
+    每个管道使用独立的读取线程，避免一个管道写满时阻塞在另一个管道上；
+    读取按块进行并整体切分行，stderr 的最后若干行会保留下来用于失败提示。
+    """
+
+    def __init__(self, process, encoding='utf-8', stderr_tail_lines=200):
+        self.process = process
+        self.encoding = encoding
+        self.stderr_tail = collections.deque(maxlen=stderr_tail_lines)
+        self._queue = queue.Queue()
+        self._threads = []
+        for stream_name in ('stdout', 'stderr'):
+            pipe = getattr(process, stream_name)
+            if pipe is None:
+                continue
+            thread = threading.Thread(
+                target=self._read_pipe, args=(stream_name, pipe), daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _read_pipe(self, stream_name, pipe):
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+        pending = ''
+        fd = pipe.fileno()
+        try:
+            while True:
+                chunk = os.read(fd, READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                text = pending + decoder.decode(chunk)
+                # pip 的进度条使用 \r 刷新同一行，这里也视为换行
+                parts = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+                pending = parts.pop()
+                self._put_lines(stream_name, parts)
+            tail = pending + decoder.decode(b'', final=True)
+            if tail:
+                self._put_lines(stream_name, [tail])
+        except (OSError, ValueError):
+            pass
+        finally:
+            self._queue.put((stream_name, None))
+
+    def _put_lines(self, stream_name, lines):
+        lines = [line.rstrip() for line in lines if line.strip()]
+        if not lines:
+            return
+        if stream_name == 'stderr':
+            self.stderr_tail.extend(lines)
+        self._queue.put((stream_name, lines))
+
+    def batches(self, interval=0.05):
+        """按时间间隔合并输出行，直到两个管道都关闭；每次产出一个行列表"""
+        open_streams = len(self._threads)
+        batch = []
+        deadline = time.monotonic() + interval
+        while open_streams:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                stream_name, lines = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                lines = ()
+            else:
+                if lines is None:
+                    open_streams -= 1
+                else:
+                    batch.extend(lines)
+
+            if time.monotonic() >= deadline:
+                if batch:
+                    yield batch
+                    batch = []
+                deadline = time.monotonic() + interval
+
+        if batch:
+            yield batch
+        for thread in self._threads:
+            thread.join()
+        for pipe in (self.process.stdout, self.process.stderr):
+            if pipe is not None:
+                pipe.close()
+
+    def stderr_text(self):
+        return '\n'.join(self.stderr_tail)
+
+
+def format_command(argv):
+    """把参数列表转换为便于显示和复制的命令行文本（只用于显示，执行时不经过shell）"""
+    argv = [str(arg) for arg in argv]
+    if os.name == 'nt':
+        return subprocess.list2cmdline(argv)
+    return ' '.join(shlex.quote(arg) for arg in argv)
+
+
+def start_process(argv):
+    """以独立进程组直接启动命令（不经过shell），stdout/stderr 通过管道读取"""
+    # 设置环境变量以禁用输出缓冲，并统一输出编码
+    env = os.environ.copy()
+    env['PYTHONUNBUFFERED'] = '1'
+    env['PYTHONIOENCODING'] = 'utf-8'
+    return subprocess.Popen(
+        [str(arg) for arg in argv],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=env,
+        **process_group_kwargs()
+    )
+
+
+class ProcessResult:
+    """一次命令执行的结果
+
+    seconds 为墙钟时间；peak_rss 为进程树中单个进程的最大常驻内存（字节），无法获取时为None；
+    timed_out 表示因超时被结束。
+    """
+
+    def __init__(self, returncode, stderr_text, seconds, peak_rss=None, timed_out=False):
+        self.returncode = returncode
+        self.stderr_text = stderr_text
+        self.seconds = seconds
+        self.peak_rss = peak_rss
+        self.timed_out = timed_out
+
+    def to_dict(self):
+        return {
+            'returncode': self.returncode,
+            'seconds': round(self.seconds, 3),
+            'peak_rss': self.peak_rss,
+            'timed_out': self.timed_out,
+        }
+
+
+def run_process(argv, on_lines=None, timeout=None, interval=0.05, on_start=None):
+    """执行命令直到结束，输出按批交给 on_lines，返回 ProcessResult
+
+    超过 timeout 秒时结束整个进程树；on_start(process) 在进程启动后调用，
+    调用方可以借此保存进程以便取消。
+    """
+    start = time.perf_counter()
+    process = start_process(argv)
+    if on_start is not None:
+        on_start(process)
+    timed_out = threading.Event()
+    watchdog = None
+    if timeout:
+        def expire():
+            timed_out.set()
+            kill_process_tree(process)
+        watchdog = threading.Timer(timeout, expire)
+        watchdog.daemon = True
+        watchdog.start()
+    try:
+        pump = OutputPump(process)
+        for lines in pump.batches(interval):
+            if on_lines is not None:
+                on_lines(lines)
+        peak_rss = wait_with_usage(process)
+    finally:
+        if watchdog is not None:
+            watchdog.cancel()
+    return ProcessResult(process.returncode, pump.stderr_text(), time.perf_counter() - start,
+                         peak_rss, timed_out.is_set())
+
+
+def wait_with_usage(process):
+    """等待进程结束并返回其峰值内存（字节），无法获取时返回None"""
+    if os.name == 'nt':
+        process.wait()
+        return _windows_peak_rss(process)
+    # 只有这里等待和回收 run_process 启动的进程（kill_process_tree 只发送信号）
+    try:
+        # wait4 同时返回该子进程（含它等待过的子进程）的资源使用情况
+        _, status, usage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        # 已被其他代码回收，交给 Popen 处理退出码，不再统计内存
+        process.wait()
+        return None
+    if os.WIFSIGNALED(status):
+        process.returncode = -os.WTERMSIG(status)
+    else:
+        process.returncode = os.WEXITSTATUS(status)
+    # Linux 上 ru_maxrss 的单位为KB，macOS 上为字节
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+
+def _windows_peak_rss(process):
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    try:
+        ok = ctypes.windll.psapi.GetProcessMemoryInfo(
+            wintypes.HANDLE(int(process._handle)), ctypes.byref(counters), counters.cb)
+    except (AttributeError, OSError):
+        return None
+    return counters.PeakWorkingSetSize if ok else None
+
+
+def process_group_kwargs():
+    """让子进程成为独立进程组的 Popen 参数，便于之后整体结束进程树"""
+    if os.name == 'nt':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+
+def kill_process_tree(process, timeout=5):
+    """结束进程及其所有子进程（pip 构建 wheel 时启动的编译进程等）
+
+    只发送信号，不等待也不回收进程（由 run_process 回收），可以在界面线程中直接调用。
+    """
+    if os.name == 'nt':
+        # taskkill /T 会连同子进程一起结束；在后台线程中执行，不阻塞调用方
+        threading.Thread(target=subprocess.run, args=(['taskkill', '/PID', str(process.pid), '/T', '/F'],),
+                         kwargs={'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL},
+                         daemon=True).start()
+        return
+    # 进程以独立会话启动，进程组ID即其PID；pip 本身已退出时组内的构建进程也要结束
+    if not _signal_group(process.pid, signal.SIGTERM):
+        return
+    # timeout 秒后进程组仍存在时强制结束
+    escalate = threading.Timer(timeout, _signal_group, args=(process.pid, signal.SIGKILL))
+    escalate.daemon = True
+    escalate.start()
+
+
+def _signal_group(pgid, sig):
+    """向进程组发送信号，进程组已不存在时返回False"""
+    try:
+        os.killpg(pgid, sig)
+    except (ProcessLookupError, PermissionError):
+        return False
+    return True
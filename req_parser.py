@@ -0,0 +1,383 @@
+import os
+import re
+import shlex
+from urllib.parse import urlparse
+
+from packaging.markers import InvalidMarker, Marker, UndefinedEnvironmentName
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.specifiers import SpecifierSet
+from packaging.version import InvalidVersion, Version
+
+from env_scanner import normalize_name
+
+# 行内注释：行首或空白之后的 # 开始
+_COMMENT_RE = re.compile(r'(^|\s+)#.*$')
+# 需求行尾部的单行选项，如 --hash=sha256:...
+_PER_REQ_OPTION_RE = re.compile(r'\s+--(hash|global-option|config-settings)(=|\s+)\S+')
+# URL 中的 #egg=包名
+_EGG_RE = re.compile(r'[#&]egg=([A-Za-z0-9_.\-\[\]]+)')
+
+# 需要额外参数的pip选项（短选项 -> 规范名称）
+_INCLUDE_OPTIONS = {
+    '-r': 'requirement', '--requirement': 'requirement',
+    '-c': 'constraint', '--constraint': 'constraint',
+}
+_EDITABLE_OPTIONS = {'-e', '--editable'}
+_VALUE_OPTIONS = {
+    '-i': 'index_url', '--index-url': 'index_url',
+    '--extra-index-url': 'extra_index_urls',
+    '-f': 'find_links', '--find-links': 'find_links',
+    '--trusted-host': 'trusted_hosts',
+}
+_VCS_PREFIXES = ('git+', 'hg+', 'svn+', 'bzr+')
+# URL 的协议部分；Windows 盘符只有一个字母，不会匹配
+_URL_SCHEME_RE = re.compile(r'^[A-Za-z][A-Za-z0-9+.\-]+:')
+
+# 已安装版本与版本要求的比较结果
+VERSION_OK = 'ok'
+VERSION_TOO_OLD = 'too_old'  # 只是版本过低，升级即可满足
+VERSION_MISMATCH = 'mismatch'  # 版本过高、被排除或无法解析
+# 版本过低时可以通过升级满足的运算符
+_LOWER_BOUND_OPERATORS = {'>', '>=', '~=', '==', '==='}
+
+
+def compare_version(specifier, version):
+    """判断已安装的版本是否满足版本要求，返回 VERSION_* 之一
+
+    预发布版本视为可以满足要求（已经装上了，说明用户接受）；
+    本地版本标签（如 +cu121）按 PEP 440 在比较时忽略。
+    """
+    if not str(specifier):
+        return VERSION_OK
+    try:
+        installed = Version(version)
+    except InvalidVersion:
+        return VERSION_MISMATCH
+    if specifier.contains(installed, prereleases=True):
+        return VERSION_OK
+    for spec in specifier:
+        if spec.contains(installed, prereleases=True):
+            continue
+        try:
+            target = Version(spec.version.rstrip('.*'))
+        except InvalidVersion:
+            return VERSION_MISMATCH
+        if spec.operator not in _LOWER_BOUND_OPERATORS or installed >= target:
+            return VERSION_MISMATCH
+    return VERSION_TOO_OLD
+
+
+class RequirementParseError(Exception):
+    """需求文件无法解析（如 include 循环或文件不存在）"""
+
+
+class ParsedRequirement:
+    """需求文件中的一条依赖
+
+    name/key 为包名及其规范化形式；url 为直接引用（git+、本地路径等），
+    此时 specifier 为空。marker 为 packaging 的 Marker 或 None。
+    """
+
+    def __init__(self, line, source, lineno, requirement=None, url=None,
+                 name=None, editable=False, constraint=False):
+        self.line = line
+        self.source = source
+        self.lineno = lineno
+        self.requirement = requirement
+        self.editable = editable
+        self.constraint = constraint
+        if requirement is not None:
+            self.name = requirement.name
+            self.extras = set(requirement.extras)
+            self.specifier = requirement.specifier
+            self.marker = requirement.marker
+            self.url = requirement.url
+        else:
+            self.name = name
+            self.extras = set()
+            self.specifier = SpecifierSet()
+            self.marker = None
+            self.url = url
+        self.key = normalize_name(self.name) if self.name else None
+
+    @property
+    def is_vcs(self):
+        return bool(self.url) and self.url.startswith(_VCS_PREFIXES)
+
+    def applies(self, marker_env=None):
+        """在目标解释器的环境标记下，该依赖是否需要安装"""
+        if self.marker is None:
+            return True
+        try:
+            return self.marker.evaluate(marker_env) if marker_env else self.marker.evaluate()
+        except UndefinedEnvironmentName:
+            return True
+
+    def compare_installed(self, version, marker_env=None):
+        """已安装版本是否满足要求；直接引用无法按版本比较，已安装即视为满足"""
+        if self.url:
+            return VERSION_OK
+        return compare_version(self.specifier, version)
+
+    def display_name(self):
+        if self.url and self.requirement is None:
+            return self.url
+        if self.extras:
+            return f"{self.name}[{','.join(sorted(self.extras))}]"
+        return self.name
+
+    def display_required(self):
+        """表格中显示的版本要求"""
+        if self.is_vcs:
+            required = "git仓库"
+        elif self.url:
+            required = "直接引用"
+        else:
+            required = str(self.specifier) or "任意"
+        if self.marker is not None:
+            required = f"{required} ; {self.marker}" if required != "任意" else f"; {self.marker}"
+        return required
+
+    def to_spec(self):
+        """生成传给pip的需求字符串"""
+        if self.requirement is not None:
+            return str(self.requirement)
+        return self.url
+
+    def install_args(self):
+        """pip install 的参数列表"""
+        if self.editable:
+            return ['-e', self.to_spec()]
+        return [self.to_spec()]
+
+    def local_path(self):
+        """本地路径形式的直接引用的绝对路径（相对路径相对所在需求文件的目录），其他依赖返回None"""
+        if self.requirement is not None or not self.url or _URL_SCHEME_RE.match(self.url):
+            return None
+        base_dir = os.path.dirname(self.source) if self.source else os.getcwd()
+        return os.path.abspath(os.path.join(base_dir, self.url))
+
+    def file_line(self):
+        """写入重新生成的需求文件中的一行
+
+        本地路径改为绝对路径，不随新文件所在的目录变化；pip 按 shell 规则拆分选项行，
+        -e 的值加引号，路径中的空格和反斜杠得以保留。
+        """
+        spec = self.local_path() or self.to_spec()
+        if self.editable:
+            return f'-e {shlex.quote(spec)}'
+        return spec
+
+    def __repr__(self):
+        return f'ParsedRequirement({self.to_spec()!r})'
+
+
+class RequirementsFile:
+    """一个需求文件（含 -r/-c 引入的文件）的解析结果"""
+
+    def __init__(self, path):
+        self.path = path
+        self.requirements = []
+        self.constraints = []
+        self.options = {
+            'index_url': None,
+            'extra_index_urls': [],
+            'find_links': [],
+            'trusted_hosts': [],
+            'other': [],
+        }
+        self.errors = []  # (文件, 行号, 说明)
+        self.files = []  # 参与解析的所有文件，用于缓存校验
+
+    def applicable(self, marker_env=None):
+        """只返回在目标环境中适用的依赖"""
+        return [req for req in self.requirements if req.applies(marker_env)]
+
+    def option_lines(self):
+        """文件中的pip选项（镜像、find-links等），重新生成需求文件时原样保留"""
+        lines = []
+        if self.options['index_url']:
+            lines.append(f"--index-url {self.options['index_url']}")
+        lines += [f'--extra-index-url {url}' for url in self.options['extra_index_urls']]
+        lines += [f'--find-links {shlex.quote(path)}' for path in self.options['find_links']]
+        lines += [f'--trusted-host {host}' for host in self.options['trusted_hosts']]
+        return lines + self.options['other']
+
+
+def iter_logical_lines(text):
+    """合并续行并去掉注释，产出 (起始行号, 逻辑行)"""
+    buffer = []
+    start = None
+    for lineno, raw in enumerate(text.splitlines(), 1):
+        if start is None:
+            start = lineno
+        line = raw.rstrip()
+        if line.endswith('\\'):
+            buffer.append(line[:-1])
+            continue
+        buffer.append(line)
+        logical = _COMMENT_RE.sub('', ' '.join(part.strip() for part in buffer)).strip()
+        buffer = []
+        if logical:
+            yield start, logical
+        start = None
+    if buffer:
+        logical = _COMMENT_RE.sub('', ' '.join(part.strip() for part in buffer)).strip()
+        if logical:
+            yield start, logical
+
+
+def _name_from_url(url):
+    """从直接引用的URL中推断包名：优先 #egg=，否则取路径最后一段"""
+    match = _EGG_RE.search(url)
+    if match:
+        return match.group(1).split('[')[0]
+    path = urlparse(url.split('+', 1)[-1]).path if '://' in url else url
+    base = os.path.basename(path.rstrip('/').split('@')[0])
+    if base.endswith('.whl'):
+        return base.split('-')[0]
+    for suffix in ('.git', '.zip', '.tar.gz', '.tgz'):
+        if base.endswith(suffix):
+            return base[:-len(suffix)]
+    return base or None
+
+
+def _is_direct_reference(line):
+    """是否为不带包名的直接引用（VCS链接、URL、本地路径或归档文件）"""
+    target = line.split(';', 1)[0].strip()
+    if target.startswith(_VCS_PREFIXES + ('.', '/', '\\')):
+        return True
+    # "name @ url" 是合法的 PEP 508 写法，交给 packaging 处理
+    if '://' in target and ' @ ' not in target and not re.match(r'^[A-Za-z0-9_.\-\[\], ]+@', target):
+        return True
+    return target.endswith(('.whl', '.zip', '.tar.gz')) or bool(re.match(r'^[A-Za-z]:[\\/]', target))
+
+
+def parse_requirement_line(line, source=None, lineno=0, editable=False, constraint=False):
+    """解析单个需求字符串，失败时抛出 InvalidRequirement"""
+    line = _PER_REQ_OPTION_RE.sub('', line).strip()
+    if editable or _is_direct_reference(line):
+        url, _, marker_text = line.partition(';')
+        url = url.strip()
+        req = ParsedRequirement(line, source, lineno, url=url, name=_name_from_url(url),
+                                editable=editable, constraint=constraint)
+        if marker_text.strip():
+            try:
+                req.marker = Marker(marker_text.strip())
+            except InvalidMarker as e:
+                raise InvalidRequirement(str(e))
+        return req
+    return ParsedRequirement(line, source, lineno, requirement=Requirement(line),
+                             constraint=constraint)
+
+
+def _split_option(line):
+    """把选项行拆成 (选项名, 值)，兼容 --opt=value 和 -o value 两种写法"""
+    if line.startswith('--') and '=' in line.split()[0]:
+        option, value = line.split('=', 1)
+        return option, value.strip()
+    parts = line.split(None, 1)
+    if len(parts) == 1 and not line.startswith('--') and len(line) > 2:
+        # -rfile 这种紧贴的写法
+        return line[:2], line[2:].strip()
+    return parts[0], parts[1].strip() if len(parts) > 1 else ''
+
+
+def _parse_into(result, path, constraint, chain, visited):
+    """chain 为当前引入链上的文件，引入链上的祖先才是循环引用；visited 记录已解析的文件，
+    多个文件引入同一个文件（菱形引入）时只解析一次
+    """
+    path = os.path.abspath(path)
+    key = os.path.normcase(path)
+    if key in chain:
+        result.errors.append((path, 0, '循环引用的需求文件'))
+        return
+    if (key, constraint) in visited:
+        return
+    visited.add((key, constraint))
+    chain.add(key)
+    try:
+        _parse_file(result, path, constraint, chain, visited)
+    finally:
+        chain.discard(key)
+
+
+def _parse_file(result, path, constraint, chain, visited):
+    try:
+        stat = os.stat(path)
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+    except OSError as e:
+        raise RequirementParseError(f'无法读取需求文件 {path}: {e}')
+    result.files.append((path, stat.st_mtime_ns, stat.st_size))
+    base_dir = os.path.dirname(path)
+
+    for lineno, line in iter_logical_lines(text):
+        if line.startswith('-'):
+            option, value = _split_option(line)
+            if option in _INCLUDE_OPTIONS:
+                include = value.strip('"\'')
+                if '://' in include:
+                    result.errors.append((path, lineno, f'不支持远程需求文件: {include}'))
+                    continue
+                include_path = include if os.path.isabs(include) else os.path.join(base_dir, include)
+                try:
+                    _parse_into(result, include_path,
+                                constraint or _INCLUDE_OPTIONS[option] == 'constraint', chain, visited)
+                except RequirementParseError as e:
+                    result.errors.append((path, lineno, str(e)))
+            elif option in _EDITABLE_OPTIONS:
+                _add_requirement(result, value.strip('"\''), path, lineno, editable=True, constraint=constraint)
+            elif option in _VALUE_OPTIONS:
+                name = _VALUE_OPTIONS[option]
+                if name == 'find_links':
+                    # 与 pip 相同，相对路径相对所在需求文件的目录
+                    value = value.strip('"\'')
+                    if '://' not in value and not os.path.isabs(value):
+                        value = os.path.normpath(os.path.join(base_dir, value))
+                if isinstance(result.options[name], list):
+                    result.options[name].append(value)
+                else:
+                    result.options[name] = value
+            else:
+                result.options['other'].append(line)
+            continue
+        _add_requirement(result, line, path, lineno, constraint=constraint)
+
+
+def _add_requirement(result, line, path, lineno, editable=False, constraint=False):
+    try:
+        req = parse_requirement_line(line, path, lineno, editable=editable, constraint=constraint)
+    except InvalidRequirement as e:
+        result.errors.append((path, lineno, f'无法解析 "{line}": {e}'))
+        return
+    (result.constraints if constraint else result.requirements).append(req)
+
+
+# 解析结果缓存：路径 -> RequirementsFile，按参与解析的所有文件的 mtime/大小校验
+_parse_cache = {}
+
+
+def _is_fresh(result):
+    for path, mtime, size in result.files:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_mtime_ns != mtime or stat.st_size != size:
+            return False
+    return True
+
+
+def parse_requirements(path, use_cache=True):
+    """解析需求文件（跟随 -r/-c 引入），结果按路径和 mtime 缓存"""
+    key = os.path.normcase(os.path.abspath(path))
+    if use_cache:
+        cached = _parse_cache.get(key)
+        if cached is not None and _is_fresh(cached):
+            return cached
+
+    result = RequirementsFile(os.path.abspath(path))
+    _parse_into(result, path, False, set(), set())
+    _parse_cache[key] = result
+    return result
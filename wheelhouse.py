@@ -0,0 +1,353 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app_paths import get_cache_dir
+from env_scanner import normalize_name
+from git_cache import wheel_tags
+from job_queue import Job
+from process_runner import kill_process_tree, run_process
+
+# 本地wheel仓库的默认容量上限
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+
+# 可以放入本地仓库的分发文件
+_DIST_SUFFIXES = ('.whl', '.tar.gz', '.zip', '.tar.bz2')
+
+
+def dist_file_key(filename):
+    """从分发文件名中取出 (规范化包名, 版本)：wheel 为 name-version-tags.whl，源码包为 name-version.tar.gz"""
+    if filename.endswith('.whl'):
+        parts = filename.split('-')
+        if len(parts) < 3:
+            return None
+        return normalize_name(parts[0]), parts[1]
+    for suffix in _DIST_SUFFIXES:
+        if filename.endswith(suffix):
+            name, sep, version = filename[:-len(suffix)].rpartition('-')
+            return (normalize_name(name), version) if sep else None
+    return None
+
+
+class Wheelhouse:
+    """本地wheel仓库
+
+    每次预取记录一份清单：目标解释器标签、需求列表以及 pip download 解析出的全部文件。
+    只要请求的需求是某份清单的子集且清单中的文件都还在，就可以离线安装。
+    文件按最近使用时间做LRU淘汰。
+    """
+
+    INDEX_NAME = 'wheelhouse.json'
+
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root or get_cache_dir('wheelhouse')
+        os.makedirs(self.root, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(self.root, self.INDEX_NAME)
+        self._lock = threading.Lock()
+
+    # ---- 索引读写 ----
+
+    def _load(self):
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data.setdefault('files', {})
+        data.setdefault('manifests', [])
+        data.setdefault('stats', {'hits': 0, 'misses': 0, 'prefetches': 0})
+        return data
+
+    def _save(self, data):
+        tmp_file = f'{self.index_file}.{os.getpid()}.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_file, self.index_file)
+
+    def _file_exists(self, filename):
+        return os.path.isfile(os.path.join(self.root, filename))
+
+    # ---- 查询 ----
+
+    def find_manifest(self, specs, target):
+        """查找能满足这组需求的预取清单"""
+        wanted = set(specs)
+        with self._lock:
+            data = self._load()
+        for manifest in reversed(data['manifests']):
+            if manifest['target'] != target or not wanted <= set(manifest['specs']):
+                continue
+            if all(self._file_exists(name) for name in manifest['files']):
+                return manifest
+        return None
+
+    def can_satisfy(self, specs, target):
+        return bool(specs) and bool(target) and self.find_manifest(specs, target) is not None
+
+    def missing_distributions(self, pins, tags=None):
+        """(包名, 版本) 中在仓库里没有对应分发文件的部分，不要求有预取清单
+
+        指定 tags（目标解释器支持的wheel标签）时只计入兼容的wheel，源码包总是可用。
+        """
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            names = []
+        supported = set(tags) if tags is not None else None
+        available = {
+            dist_file_key(name) for name in names
+            if supported is None or not name.endswith('.whl') or wheel_tags(name) & supported
+        }
+        return [(name, version) for name, version in pins if (normalize_name(name), version) not in available]
+
+    def install_args(self):
+        """离线安装使用的pip参数"""
+        return ['--no-index', '--find-links', self.root]
+
+    def record_use(self, specs, target, hit):
+        """记录一次安装是否命中本地仓库，命中时更新相关文件的使用时间"""
+        manifest = self.find_manifest(specs, target) if hit else None
+        with self._lock:
+            data = self._load()
+            if manifest is None:
+                data['stats']['misses'] += 1
+            else:
+                data['stats']['hits'] += 1
+                now = time.time()
+                for name in manifest['files']:
+                    info = data['files'].get(name)
+                    if info is not None:
+                        info['last_used'] = now
+                        info['hits'] = info.get('hits', 0) + 1
+            self._save(data)
+
+    def usage(self):
+        """本地仓库的使用统计"""
+        with self._lock:
+            data = self._load()
+        total = sum(info['size'] for info in data['files'].values())
+        return {
+            'path': self.root,
+            'files': len(data['files']),
+            'total_bytes': total,
+            'max_bytes': self.max_bytes,
+            'manifests': len(data['manifests']),
+            'hits': data['stats']['hits'],
+            'misses': data['stats']['misses'],
+            'prefetches': data['stats']['prefetches'],
+        }
+
+    # ---- 写入与淘汰 ----
+
+    def add_files(self, source_dir):
+        """把下载目录中的分发文件移入仓库，返回文件名列表（已存在的文件直接复用）"""
+        names = []
+        for name in os.listdir(source_dir):
+            if not name.endswith(_DIST_SUFFIXES):
+                continue
+            target = os.path.join(self.root, name)
+            if not os.path.exists(target):
+                os.replace(os.path.join(source_dir, name), target)
+            names.append(name)
+        return names
+
+    def record_prefetch(self, specs, target, files):
+        now = time.time()
+        with self._lock:
+            data = self._load()
+            for name in files:
+                info = data['files'].get(name)
+                if info is None:
+                    size = os.path.getsize(os.path.join(self.root, name))
+                    data['files'][name] = {'size': size, 'added': now, 'last_used': now, 'hits': 0}
+                else:
+                    info['last_used'] = now
+            # 相同目标和需求的旧清单被新清单取代
+            data['manifests'] = [
+                m for m in data['manifests']
+                if not (m['target'] == target and set(m['specs']) == set(specs))
+            ]
+            data['manifests'].append({
+                'target': target,
+                'specs': sorted(set(specs)),
+                'files': sorted(set(files)),
+                'created': now,
+            })
+            data['stats']['prefetches'] += 1
+            self._save(data)
+
+    def evict(self, max_bytes=None):
+        """按最近使用时间淘汰文件，直到总大小不超过上限；返回删除的文件名"""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        removed = []
+        with self._lock:
+            data = self._load()
+            # 丢弃已不存在的文件记录
+            for name in [n for n in data['files'] if not self._file_exists(n)]:
+                del data['files'][name]
+            total = sum(info['size'] for info in data['files'].values())
+            for name, info in sorted(data['files'].items(), key=lambda item: item[1]['last_used']):
+                if total <= limit:
+                    break
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except OSError:
+                    continue
+                total -= info['size']
+                del data['files'][name]
+                removed.append(name)
+            # 文件被淘汰后，引用它们的清单失效
+            if removed:
+                gone = set(removed)
+                data['manifests'] = [m for m in data['manifests'] if not gone & set(m['files'])]
+            self._save(data)
+        return removed
+
+
+def resolve_command(pip_cmd, specs, report_path, source_args=()):
+    """一次解析整组需求及其传递依赖的命令：只生成安装报告，不修改环境
+
+    --ignore-installed 使目标环境中已安装的包也出现在报告中，预取的文件才能覆盖全部依赖。
+    """
+    return (pip_cmd + ['install', '--dry-run', '--ignore-installed', '--prefer-binary', '--report', report_path]
+            + list(source_args) + list(specs))
+
+
+def report_urls(report):
+    """安装报告中需要下载的分发文件地址（VCS和本地目录不放入仓库）"""
+    urls = []
+    for entry in report.get('install', []):
+        info = entry.get('download_info', {})
+        if info.get('url') and 'vcs_info' not in info and 'dir_info' not in info:
+            urls.append(info['url'])
+    return urls
+
+
+def split_items(items, parts):
+    """把列表轮流分配到若干组，用于并行下载"""
+    parts = max(1, min(parts, len(items)))
+    return [items[i::parts] for i in range(parts)]
+
+
+class PrefetchJob(Job):
+    """把一组需求及其依赖预取到本地仓库
+
+    先用一次pip试运行整体解析（与安装时的解析结果一致，共享的依赖只出现一次），
+    再把解析出的文件分组，并行执行 pip download --no-deps。目标环境的pip低于22.2、
+    不支持安装报告时，退回到单个 pip download 整体解析并下载。
+    """
+
+    def __init__(self, wheelhouse, specs, pip_cmd, env_key, target, source_args=(), parallel=4, timeout=None,
+                 pip_version=None):
+        super().__init__(f"预取 {len(specs)} 个依赖", env_key, read_only=True)
+        self.wheelhouse = wheelhouse
+        self.specs = specs
+        self.pip_cmd = pip_cmd
+        self.target = target
+        self.source_args = list(source_args)
+        self.parallel = parallel
+        self.pip_version = pip_version
+        # 每个pip进程的超时（秒）
+        self.timeout = timeout
+        self.processes = []
+        self.process_seconds = 0.0
+        self.peak_rss = None
+        self._lock = threading.Lock()
+
+    def _run_pip(self, cmd, emit_output):
+        result = run_process(cmd, lambda lines: emit_output(self, lines), self.timeout, on_start=self._started)
+        with self._lock:
+            self.process_seconds += result.seconds
+            if result.peak_rss is not None:
+                self.peak_rss = max(self.peak_rss or 0, result.peak_rss)
+        if result.timed_out:
+            return f"pip 执行超过 {self.timeout} 秒，已结束"
+        if result.returncode != 0:
+            return result.stderr_text
+        return ''
+
+    def _resolve(self, emit_output):
+        """返回 (下载地址列表, 错误说明)"""
+        from install_plan import supports_report
+
+        if not supports_report(self.pip_version):
+            return None, ''
+        with tempfile.TemporaryDirectory(dir=self._partial_root()) as work_dir:
+            report_path = os.path.join(work_dir, 'report.json')
+            error = self._run_pip(resolve_command(self.pip_cmd, self.specs, report_path, self.source_args),
+                                  emit_output)
+            if error:
+                return None, error
+            try:
+                with open(report_path, 'r', encoding='utf-8') as f:
+                    return report_urls(json.load(f)), ''
+            except (OSError, ValueError) as e:
+                return None, f"无法读取pip生成的安装报告: {e}"
+
+    def _partial_root(self):
+        partial_root = os.path.join(self.wheelhouse.root, '.partial')
+        os.makedirs(partial_root, exist_ok=True)
+        return partial_root
+
+    def _download(self, args, emit_output, no_deps=False):
+        # 每组下载到独立的临时目录，避免多个pip同时写同一个文件
+        download_dir = tempfile.mkdtemp(dir=self._partial_root())
+        try:
+            if self.cancel_requested:
+                return False, [], ''
+            cmd = self.pip_cmd + ['download', '--prefer-binary', '-d', download_dir]
+            if no_deps:
+                cmd.append('--no-deps')
+            error = self._run_pip(cmd + self.source_args + list(args), emit_output)
+            if error:
+                return False, [], error
+            return True, self.wheelhouse.add_files(download_dir), ''
+        finally:
+            shutil.rmtree(download_dir, ignore_errors=True)
+
+    def run(self, emit_output):
+        urls, error = self._resolve(emit_output)
+        if self.cancel_requested:
+            return False, "已取消"
+        if error:
+            return False, f"解析依赖失败:\n{error}"
+        if urls is None:
+            results = [self._download(self.specs, emit_output)]
+        else:
+            # 每个文件只下载一次；试运行已把文件放入pip的缓存，下载时多数直接命中
+            chunks = split_items(urls, self.parallel)
+            with ThreadPoolExecutor(max_workers=len(chunks) or 1) as executor:
+                results = list(executor.map(lambda chunk: self._download(chunk, emit_output, no_deps=True),
+                                            chunks))
+
+        if self.cancel_requested:
+            return False, "已取消"
+        failed = [error for ok, _, error in results if not ok]
+        if failed:
+            return False, f"预取失败:\n{failed[0]}"
+
+        files = [name for _, names, _ in results for name in names]
+        self.wheelhouse.record_prefetch(self.specs, self.target, files)
+        removed = self.wheelhouse.evict()
+        message = f"已预取 {len(set(files))} 个文件"
+        if removed:
+            message += f"，按LRU淘汰 {len(removed)} 个旧文件"
+        return True, message
+
+    def _started(self, process):
+        with self._lock:
+            self.processes.append(process)
+        if self.cancel_requested:
+            kill_process_tree(process)
+
+    def cancel(self):
+        with self._lock:
+            self.cancel_requested = True
+            processes = list(self.processes)
+        for process in processes:
+            kill_process_tree(process)